@@ -9,18 +9,26 @@ from config import (
     TWITTER_ACCESS_TOKEN_SECRET,
     SYSTEM_PROMPTS
 )
-from tweet_generator import generate_tweet
+from tweet_generator import generate_tweet, get_backend
+from tweet_history import get_tweet_history
+from queue_store import default_consumer_id
+from tweet_queue import TweetQueue
+from queue_producer import QueueProducer
 from utils import log_activity
+from tweet_scorer import score_breakdown, compare_variants, get_scorer
 from tweet_selector import (
     generate_and_queue_tweets, 
-    get_next_tweet_from_queue,
+    claim_next_tweet,
+    complete_queued_tweet,
+    release_queued_tweet,
+    renew_queued_tweet,
     queue_size,
     generate_multiple_tweets,
     score_and_queue_tweets,
     select_best_tweet,
     clean_queue_of_duplicates,
     is_duplicate_tweet,
-    get_previously_tweeted_texts,
+    get_posted_hashset,
     LAST_API_CHECK,
     API_CHECK_INTERVAL
 )
@@ -70,18 +78,29 @@ class SwiftieBot:
         self.personality_types = list(SYSTEM_PROMPTS.keys())
         self.min_queue_size = 1  # Minimum number of tweets to keep in queue
         self.batch_size = 5      # Number of tweets to generate at once
+        self.batch_target = 3    # Queueable tweets wanted from each replenishment batch
         self.min_score = 9.0     # Minimum score for a tweet to be queued
-        # Load previously tweeted texts on startup
-        self.previously_tweeted = get_previously_tweeted_texts()
+        # Indexed posting history (imports Tweeted_tweets.txt on first run)
+        self.history = get_tweet_history()
+        # Load previously tweeted texts on startup (shared compact hash set)
+        self.previously_tweeted = get_posted_hashset()
         log_activity(f"Loaded {len(self.previously_tweeted)} previously tweeted texts")
         # Track rate limit status
         self.rate_limited = False
         self.rate_limit_reset_time = 0
+        # Name used to claim tweets from the shared queue
+        self.consumer_id = default_consumer_id()
+        # In-memory queue handle; writes are batched, so close() it on shutdown
+        self.queue = TweetQueue()
+        # Background producer that tops up the queue between posts (started by run())
+        self.producer = None
 
     def refresh_previously_tweeted(self):
-        """Refresh the set of previously tweeted texts"""
-        self.previously_tweeted = get_previously_tweeted_texts()
-        log_activity(f"Refreshed previously tweeted texts: {len(self.previously_tweeted)} entries")
+        """Pull any tweets recorded since the last refresh into the in-memory set"""
+        previous_count = len(self.previously_tweeted)
+        self.previously_tweeted = get_posted_hashset()
+        if len(self.previously_tweeted) != previous_count:
+            log_activity(f"Refreshed previously tweeted texts: {len(self.previously_tweeted)} entries")
 
     def get_random_interval(self):
         """Get a random interval between 13 and 38 minutes in seconds"""
@@ -99,8 +118,8 @@ class SwiftieBot:
             f.write(tweet_text)
             f.write("\n" + "-"*50 + "\n")
         
-        # Add to our in-memory set of previously tweeted texts
-        self.previously_tweeted.add(tweet_text)
+        # Record in the indexed history (also adds it to the in-memory hash set)
+        self.history.record(tweet_text, personality, timestamp)
         log_activity("Added to in-memory set of previously tweeted texts")
             
     def clean_queue(self):
@@ -111,7 +130,7 @@ class SwiftieBot:
         
         # By default, only use local checks to avoid API rate limits
         # This will still remove duplicates found in Tweeted_tweets.txt
-        removed_count = clean_queue_of_duplicates(None)  # Pass None to avoid API check
+        removed_count = clean_queue_of_duplicates(None, self.queue)  # Pass None to avoid API check
         
         if removed_count > 0:
             log_activity(f"Removed {removed_count} duplicate tweets from queue")
@@ -120,6 +139,10 @@ class SwiftieBot:
     def save_all_generated_tweets(self, all_tweets, chosen_tweet=None):
         """Save all generated tweets to file with timestamp and selection status"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # Score the same batch with the other scoring variants, for comparison
+        active_variant = get_scorer().name
+        variant_scores = {name: scores for name, scores in compare_variants(all_tweets).items()
+                          if name != active_variant}
         with open("All_generated_tweets.txt", "a", encoding="utf-8") as f:
             f.write(f"\n===== TWEET GENERATION SESSION: {timestamp} =====\n\n")
             
@@ -139,14 +162,16 @@ class SwiftieBot:
                 if "score" in tweet:
                     score_info = f" - SCORE: {tweet['score']:.2f}"
                     
-                    # Add score breakdown if available
-                    if "score_breakdown" in tweet:
-                        bd = tweet["score_breakdown"]
-                        score_info += f"\n  Length: {bd['length']['value']} chars (score: {bd['length']['score']:.2f})"
-                        score_info += f"\n  Hashtags: {bd['hashtags']['count']} (score: {bd['hashtags']['score']})"
-                        score_info += f"\n  Emojis: {bd['emojis']['count']} (score: {bd['emojis']['score']})"
-                        score_info += f"\n  Caps Words: {bd['caps_words']['count']} (score: {bd['caps_words']['score']})"
-                        score_info += f"\n  Irony Indicators: score {bd['irony_indicators']['score']}"
+                    # Add score breakdown (computed here, scoring only keeps the total)
+                    bd = score_breakdown(tweet)
+                    score_info += f"\n  Length: {bd['length']['value']} chars (score: {bd['length']['score']:.2f})"
+                    score_info += f"\n  Hashtags: {bd['hashtags']['count']} (score: {bd['hashtags']['score']})"
+                    score_info += f"\n  Emojis: {bd['emojis']['count']} (score: {bd['emojis']['score']})"
+                    score_info += f"\n  Caps Words: {bd['caps_words']['count']} (score: {bd['caps_words']['score']})"
+                    score_info += f"\n  Irony Indicators: score {bd['irony_indicators']['score']}"
+                    if variant_scores:
+                        others = ", ".join(f"{name} {scores[i]:.2f}" for name, scores in variant_scores.items())
+                        score_info += f"\n  Other Scoring Variants: {others}"
                 
                 f.write(f"[{i+1}] - {tweet['personality']} - {status}{score_info}\n")
                 f.write(tweet["text"])
@@ -159,11 +184,10 @@ class SwiftieBot:
                 f.write(f"Total Score: {chosen_tweet['score']:.2f}\n")
                 f.write(f"Character Count: {len(chosen_tweet['text'])}\n")
                 
-                if "score_breakdown" in chosen_tweet:
-                    bd = chosen_tweet["score_breakdown"]
-                    f.write(f"Hashtags: {bd['hashtags']['count']}\n")
-                    f.write(f"Emojis: {bd['emojis']['count']}\n")
-                    f.write(f"CAPS Words: {bd['caps_words']['count']}\n")
+                bd = score_breakdown(chosen_tweet)
+                f.write(f"Hashtags: {bd['hashtags']['count']}\n")
+                f.write(f"Emojis: {bd['emojis']['count']}\n")
+                f.write(f"CAPS Words: {bd['caps_words']['count']}\n")
                     
             f.write("\n" + "="*50 + "\n")
         
@@ -179,12 +203,17 @@ class SwiftieBot:
             log_activity("Tweet is a duplicate (found in memory)")
             return False
             
-        # Then check against the file directly (in case memory set is stale)
-        latest_tweeted = get_previously_tweeted_texts()
-        if tweet_text in latest_tweeted:
+        # Then check the indexed history (in case memory set is stale)
+        if self.history.was_tweeted(tweet_text):
             # Update our in-memory set while we're at it
-            self.previously_tweeted = latest_tweeted
-            log_activity("Tweet is a duplicate (found in file)")
+            self.refresh_previously_tweeted()
+            log_activity("Tweet is a duplicate (found in history)")
+            return False
+            
+        # Finally reject paraphrases of earlier posts (punctuation/emoji changes etc.)
+        match = self.history.find_similar(tweet_text)
+        if match:
+            log_activity(f"Tweet is a near duplicate (similarity {match[1]:.2f}) of: {match[0]}")
             return False
             
         # If we got here, it's not a duplicate in our local records
@@ -196,34 +225,41 @@ class SwiftieBot:
         self.clean_queue()
         
         # Then check the size
-        current_size = queue_size()
+        current_size = queue_size(self.queue)
         log_activity(f"Current queue size: {current_size}")
         
         if current_size < self.min_queue_size:
             log_activity(f"Queue below minimum size ({self.min_queue_size}), generating new batch")
-            
-            # Make sure we have the latest set of previously tweeted texts
-            self.refresh_previously_tweeted()
-            
-            # Generate a batch of tweets
-            tweets = generate_multiple_tweets(count=self.batch_size)
-            
-            if tweets:
-                # Score and queue tweets
-                scored_tweets, added_count = score_and_queue_tweets(tweets, self.min_score)
-                
-                # Log the results
-                log_activity(f"Generated {len(scored_tweets)} tweets, added {added_count} to queue")
-                
-                # Save all generated tweets for analysis
-                self.save_all_generated_tweets(scored_tweets)
-                
-                return True
+            self.generate_batch(self.batch_target)
+            return True
         
         return False
 
+    def generate_batch(self, target):
+        """Generate, score and queue one batch aiming for `target` queueable tweets; returns how many were queued"""
+        # Make sure we have the latest set of previously tweeted texts
+        self.refresh_previously_tweeted()
+        
+        # Generate a batch of tweets, sized per personality from past pass rates
+        tweets = generate_multiple_tweets(target=min(target, self.batch_target))
+        if not tweets:
+            return 0
+        
+        # Score and queue tweets
+        scored_tweets, added_count = score_and_queue_tweets(tweets, self.min_score, self.queue)
+        
+        # Log the results
+        log_activity(f"Generated {len(scored_tweets)} tweets, added {added_count} to queue")
+        log_activity(f"Generation requests so far ({get_backend().name}): {get_backend().calls.stats.summary()}")
+        
+        # Save all generated tweets for analysis
+        self.save_all_generated_tweets(scored_tweets)
+        
+        return added_count
+
     def post_tweet(self):
         """Get a tweet from the queue or generate a new one, then post it"""
+        tweet_data = None
         try:
             # Check if we're currently rate limited
             if self.rate_limited:
@@ -239,21 +275,33 @@ class SwiftieBot:
             # Make sure we have the latest previously tweeted texts
             self.refresh_previously_tweeted()
             
-            # Replenish queue if needed (this uses local checks only)
-            self.replenish_queue_if_needed()
+            if self.producer is not None and self.producer.running:
+                # The background producer keeps the queue filled; just drop duplicates
+                self.clean_queue()
+            else:
+                # Replenish queue if needed (this uses local checks only)
+                self.replenish_queue_if_needed()
             
-            # Try to get a tweet from the queue first
-            tweet_data = get_next_tweet_from_queue(None)  # No API check to avoid rate limits
+            # Try to claim a tweet from the queue first - it stays queued (hidden
+            # from other consumers) until it's posted, so a failure doesn't lose it
+            tweet_data = claim_next_tweet(self.consumer_id, self.queue)
             source = "queue"
             
-            # If queue is empty, generate a new tweet
+            # If queue is empty, let the producer catch up rather than generating inline
+            if not tweet_data and self.producer is not None and self.producer.running:
+                log_activity("Queue empty; waiting for the background producer to refill it")
+                self.producer.wake()
+                return False
+            
+            # Without a producer, generate a new tweet
             if not tweet_data:
                 log_activity("Queue empty or all queued tweets are duplicates, generating new tweet")
                 
                 # Make a fresh batch since we need a tweet right now
                 tweet_data, added_count = generate_and_queue_tweets(
                     count=self.batch_size, 
-                    min_score=self.min_score
+                    min_score=self.min_score,
+                    queue=self.queue
                 )
                 
                 source = "new batch"
@@ -269,6 +317,12 @@ class SwiftieBot:
             # Check for duplicates using only local records to avoid rate limits
             if not self.check_tweet_for_duplicates(tweet_text):
                 log_activity(f"Tweet is a duplicate, skipping: {tweet_text}")
+                complete_queued_tweet(tweet_data, self.consumer_id, self.queue)  # Drop it from the queue
+                return False
+            
+            # Renew the claim first so it can't run out while we wait on the API
+            if not renew_queued_tweet(tweet_data, self.consumer_id, self.queue):
+                log_activity(f"Lost the claim on this tweet to another consumer, skipping: {tweet_text}")
                 return False
             
             log_activity(f"Posting tweet from {source} (personality: {personality}): {tweet_text}")
@@ -279,16 +333,21 @@ class SwiftieBot:
             if response is None:
                 # We hit a rate limit or other API error
                 log_activity("Failed to post tweet due to API error or rate limit. Will try again later.")
+                release_queued_tweet(tweet_data, self.consumer_id, self.queue)
                 self.rate_limited = True
                 self.rate_limit_reset_time = time.time() + RATE_LIMIT_BACKOFF
                 return False
             
             log_activity(f"Tweet posted successfully: {tweet_text}")
             self.save_tweet(tweet_text, personality)
+            complete_queued_tweet(tweet_data, self.consumer_id, self.queue)
             log_activity("Tweet saved to Tweeted_tweets.txt")
+            if self.producer is not None:
+                self.producer.wake()  # Top up if that took the queue below the low-water mark
             return True
         except Exception as e:
             log_activity(f"Error posting tweet: {e}")
+            release_queued_tweet(tweet_data, self.consumer_id, self.queue)
             if "429" in str(e) or "Too Many Requests" in str(e):
                 log_activity("Rate limit detected. Backing off.")
                 self.rate_limited = True
@@ -299,30 +358,39 @@ class SwiftieBot:
         """Run the bot continuously"""
         log_activity("Bot started")
         
-        # Initial clean and queue check - using only local checks
-        log_activity("Cleaning tweet queue and checking size on startup")
+        # Initial clean - using only local checks
+        log_activity("Cleaning tweet queue on startup")
         self.clean_queue()  # Local checks only
-        self.replenish_queue_if_needed()
         
-        while True:
-            try:
-                if self.post_tweet():
-                    interval = self.get_random_interval()
-                    log_activity(f"Waiting {interval/60:.1f} minutes until next tweet")
-                    log_activity(f"Current queue size: {queue_size()}")
-                    time.sleep(interval)
-                else:
-                    # If we're rate limited, wait longer
-                    if self.rate_limited:
-                        wait_time = min(RATE_LIMIT_BACKOFF, 15 * 60)  # 15 minutes max
-                        log_activity(f"Rate limited. Waiting {wait_time/60:.1f} minutes before retry")
-                        time.sleep(wait_time)
+        # Fill the queue in the background while we wait between posts
+        self.producer = QueueProducer(self.queue, self.generate_batch)
+        self.producer.start()
+        
+        try:
+            while True:
+                try:
+                    if self.post_tweet():
+                        interval = self.get_random_interval()
+                        log_activity(f"Waiting {interval/60:.1f} minutes until next tweet")
+                        log_activity(f"Current queue size: {queue_size(self.queue)}")
+                        time.sleep(interval)
                     else:
-                        log_activity("Tweet failed, retrying in 5 minutes")
-                        time.sleep(300)
-            except Exception as e:
-                log_activity(f"Unexpected error: {e}")
-                time.sleep(300)
+                        # If we're rate limited, wait longer
+                        if self.rate_limited:
+                            wait_time = min(RATE_LIMIT_BACKOFF, 15 * 60)  # 15 minutes max
+                            log_activity(f"Rate limited. Waiting {wait_time/60:.1f} minutes before retry")
+                            time.sleep(wait_time)
+                        else:
+                            log_activity("Tweet failed, retrying in 5 minutes")
+                            time.sleep(300)
+                except Exception as e:
+                    log_activity(f"Unexpected error: {e}")
+                    time.sleep(300)
+        finally:
+            self.producer.stop(timeout=60)
+            # Write out any queue changes still buffered in memory
+            self.queue.close()
+            log_activity("Bot stopped")
 
 if __name__ == "__main__":
     bot = SwiftieBot()
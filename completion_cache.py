@@ -0,0 +1,136 @@
+import argparse
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+from config import COMPLETION_CACHE_MAX_ENTRIES, COMPLETION_CACHE_MAX_AGE_DAYS
+
+# SQLite database holding cached completions
+COMPLETION_CACHE_DB = "completion_cache.db"
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def prompt_key(model, system_prompt, user_prompt, temperature):
+    """Return the cache key for one prompt configuration"""
+    payload = json.dumps([model, system_prompt, user_prompt, temperature], ensure_ascii=False)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+class CompletionCache:
+    """
+    On-disk cache of generated completions, keyed by model, system prompt,
+    user prompt and temperature. Every completion is kept (not just the last
+    one), so replaying a prompt samples from real variety. Entries older than
+    max_age_days are dropped, and the oldest go once there are more than
+    max_entries.
+    """
+
+    def __init__(self, db_path=COMPLETION_CACHE_DB, max_entries=COMPLETION_CACHE_MAX_ENTRIES,
+                 max_age_days=COMPLETION_CACHE_MAX_AGE_DAYS):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "key TEXT NOT NULL, "
+                "model TEXT, "
+                "system_prompt TEXT, "
+                "user_prompt TEXT, "
+                "temperature REAL, "
+                "text TEXT NOT NULL, "
+                "created_at REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_completions_key ON completions(key)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_completions_created ON completions(created_at)")
+
+    def add(self, model, system_prompt, user_prompt, temperature, texts):
+        """Store completions for a prompt, then evict expired and excess entries"""
+        if not texts:
+            return
+        key = prompt_key(model, system_prompt, user_prompt, temperature)
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO completions (key, model, system_prompt, user_prompt, temperature, text, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(key, model, system_prompt, user_prompt, temperature, text, now) for text in texts]
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        if self.max_age_days:
+            self.conn.execute("DELETE FROM completions WHERE created_at < ?", (now - self.max_age_days * 86400,))
+        if self.max_entries:
+            self.conn.execute(
+                "DELETE FROM completions WHERE id IN ("
+                "SELECT id FROM completions ORDER BY created_at DESC, id DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def sample(self, model, system_prompt, user_prompt, temperature, n=1):
+        """Return up to n distinct cached completions for a prompt, picked at random"""
+        key = prompt_key(model, system_prompt, user_prompt, temperature)
+        with self._lock:
+            rows = self.conn.execute("SELECT text FROM completions WHERE key = ?", (key,)).fetchall()
+        texts = [text for text, in rows]
+        return random.sample(texts, min(n, len(texts)))
+
+    def prune(self):
+        """Apply the age and size limits now"""
+        with self._lock, self.conn:
+            self._evict(time.time())
+
+    def clear(self):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM completions")
+
+    def stats(self):
+        """Return (entries, distinct prompts, oldest timestamp or None)"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT key), MIN(created_at) FROM completions"
+            ).fetchone()
+
+    def __len__(self):
+        return self.stats()[0]
+
+    def close(self):
+        self.conn.close()
+
+def get_completion_cache():
+    """Return the process-wide completion cache, opening it on first use"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = CompletionCache()
+        return _shared_cache
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or manage the cache of generated completions")
+    parser.add_argument('action', choices=['stats', 'prune', 'clear'],
+                        help='Action to perform: show cache stats, apply age/size limits, or empty the cache')
+    args = parser.parse_args()
+
+    cache = get_completion_cache()
+    if args.action == 'stats':
+        entries, prompts, oldest = cache.stats()
+        print(f"{entries} cached completions for {prompts} prompts")
+        if oldest is not None:
+            print(f"Oldest entry: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(oldest))}")
+    elif args.action == 'prune':
+        before = len(cache)
+        cache.prune()
+        print(f"Removed {before - len(cache)} cached completions")
+    elif args.action == 'clear':
+        cache.clear()
+        print("Completion cache cleared")
+
+if __name__ == "__main__":
+    main()
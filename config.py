@@ -18,6 +18,77 @@ OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 MIN_TWEET_INTERVAL = 3600  # 1 hour in seconds
 MAX_TWEET_INTERVAL = 10800  # 3 hours in seconds
 
+# Tweet generation: how many OpenAI requests may run at once when generating a
+# batch of candidates (1 = one after another), and how long (seconds) a single
+# request may take before it's abandoned
+GENERATION_CONCURRENCY = int(os.getenv('GENERATION_CONCURRENCY', 6))
+OPENAI_REQUEST_TIMEOUT = float(os.getenv('OPENAI_REQUEST_TIMEOUT', 30))
+# Speculative generation when a tweet is needed immediately (empty queue):
+# extra single-tweet requests sent on top of the batch (0 = off, never more
+# than the batch size) so one slow response can't hold up posting
+GENERATION_HEDGE_REQUESTS = int(os.getenv('GENERATION_HEDGE_REQUESTS', 2))
+
+# OpenAI call limits: client-side rate limit (requests per minute) and how many
+# times a request is retried after a transient error (429, timeout, 5xx)
+OPENAI_REQUESTS_PER_MINUTE = float(os.getenv('OPENAI_REQUESTS_PER_MINUTE', 60))
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', 3))
+# Where completions come from: "openai", or "local" to synthesize tweets from
+# All_generated_tweets.txt with simulated latency (seconds) and failure rate
+# (0-1) - for load-testing the pipeline without network or spend
+GENERATOR_BACKEND = os.getenv('GENERATOR_BACKEND', 'openai')
+LOCAL_BACKEND_LATENCY = float(os.getenv('LOCAL_BACKEND_LATENCY', 0.5))
+LOCAL_BACKEND_FAILURE_RATE = float(os.getenv('LOCAL_BACKEND_FAILURE_RATE', 0.0))
+LOCAL_BACKEND_SEED = int(os.getenv('LOCAL_BACKEND_SEED')) if os.getenv('LOCAL_BACKEND_SEED') else None
+
+# Completion cache: "record" keeps every generated completion on disk,
+# "replay" reuses cached completions instead of calling OpenAI (free previews
+# and test runs), "off" disables it. Old/excess entries are evicted.
+COMPLETION_CACHE_MODE = os.getenv('COMPLETION_CACHE_MODE', 'record')
+COMPLETION_CACHE_MAX_ENTRIES = int(os.getenv('COMPLETION_CACHE_MAX_ENTRIES', 5000))
+COMPLETION_CACHE_MAX_AGE_DAYS = float(os.getenv('COMPLETION_CACHE_MAX_AGE_DAYS', 30))
+
+# Days of per-request token and latency records kept for generation_metrics.py reports
+GENERATION_METRICS_RETENTION_DAYS = float(os.getenv('GENERATION_METRICS_RETENTION_DAYS', 30))
+
+# Tweet scoring rules: a JSON file of named variants (features and weights),
+# compiled at startup and whenever the file changes. SCORING_VARIANT picks the
+# variant used to queue tweets (default: the file's "active" one); the others
+# are scored alongside it for comparison.
+SCORING_CONFIG_FILE = os.getenv('SCORING_CONFIG_FILE', 'scoring.json')
+SCORING_VARIANT = os.getenv('SCORING_VARIANT')
+# Most scores remembered (by text and scoring rules) so re-scoring a text is a lookup (0 = off)
+SCORE_CACHE_SIZE = int(os.getenv('SCORE_CACHE_SIZE', 10000))
+# Learned tweet-quality model trained by quality_model.py (needs NumPy); scoring
+# variants use it through the "quality" feature
+QUALITY_MODEL_FILE = os.getenv('QUALITY_MODEL_FILE', 'quality_model.npz')
+
+# Stream completions and abandon a candidate as soon as it breaks the hard
+# tweet rules (hashtag, quotation mark or over 280 characters)
+STREAM_GENERATION = os.getenv('STREAM_GENERATION', 'true').lower() in ('1', 'true', 'yes')
+
+# Near-duplicate detection: reject tweets whose estimated similarity to an
+# earlier post (Jaccard over character shingles, 0-1) reaches this threshold
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv('NEAR_DUPLICATE_THRESHOLD', 0.7))
+# Picking the tweet to post from a fresh batch: how much (0-1) similarity to
+# posted/queued tweets counts against a high score (0 = highest score wins)
+SELECTION_DIVERSITY = float(os.getenv('SELECTION_DIVERSITY', 0.3))
+
+# Background producer: when the queue drops below the low-water mark, tweets
+# are generated during idle time until it reaches the high-water mark
+QUEUE_LOW_WATER = int(os.getenv('QUEUE_LOW_WATER', 3))
+QUEUE_HIGH_WATER = int(os.getenv('QUEUE_HIGH_WATER', 10))
+
+# Tweet queue bounds: the most tweets kept queued, and how long (seconds) a
+# queued tweet stays fresh before it expires. Personalities listed in
+# QUEUE_PERSONALITY_TTLS use their own lifetime - trending tweets go stale fast.
+QUEUE_MAX_DEPTH = int(os.getenv('QUEUE_MAX_DEPTH', 200))
+QUEUE_TTL = int(os.getenv('QUEUE_TTL', 7 * 86400))  # 1 week
+QUEUE_PERSONALITY_TTLS = {
+    "TRENDING": int(os.getenv('QUEUE_TRENDING_TTL', 6 * 3600))  # 6 hours
+}
+# Which tweets make room when the queue is full: oldest, lowest_score or over_represented
+QUEUE_EVICTION_POLICY = os.getenv('QUEUE_EVICTION_POLICY', 'lowest_score')
+
 # Enhanced System Prompts
 SYSTEM_PROMPTS = {
     "OBSESSED_TEEN": "You are a 16-year-old diehard Taylor Swift fan who cannot stop talking about her. You use excessive emojis, ALL CAPS for emphasis, and have memorized every single Taylor Swift lyric. You believe all men are trash and that Taylor's ex-boyfriends are the worst people alive. You make easily disproven claims about Taylor's music sales and awards. Your tweets contain both sincere adoration and unintentional humor that others find cringey yet entertaining.",
@@ -0,0 +1,213 @@
+import argparse
+import bisect
+import math
+import sqlite3
+import threading
+import time
+from config import GENERATION_METRICS_RETENTION_DAYS
+
+# SQLite database holding one row per generation request and per queued tweet
+GENERATION_METRICS_DB = "generation_metrics.db"
+# Who is generating: bot, manual or sampler (set once per process)
+CALLERS = ("bot", "manual", "sampler")
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 30)
+# Rough characters per token, for backends that don't report usage
+CHARS_PER_TOKEN = 4
+
+_shared_metrics = None
+_shared_metrics_lock = threading.Lock()
+caller = "bot"
+
+def set_caller(name):
+    """Attribute this process' generation requests to a caller (bot, manual or sampler)"""
+    global caller
+    if name not in CALLERS:
+        raise ValueError(f"Unknown caller '{name}', expected one of {', '.join(CALLERS)}")
+    caller = name
+
+def estimate_tokens(text):
+    """Approximate token count of a text, for when the backend reports no usage"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+def latency_bucket(seconds):
+    """Index of the histogram bucket a latency falls in"""
+    return bisect.bisect_left(LATENCY_BUCKETS, seconds)
+
+def bucket_label(index):
+    if index >= len(LATENCY_BUCKETS):
+        return f">{LATENCY_BUCKETS[-1]}s"
+    return f"<={LATENCY_BUCKETS[index]}s"
+
+class GenerationMetrics:
+    """
+    Token and latency accounting for generation requests. Every request is
+    recorded with its personality, caller, backend, token usage (reported by
+    the backend, or estimated from text length) and latency, and every queued
+    tweet with its personality, so reports can show what each personality
+    costs per tweet that actually made it into the queue. Rows older than
+    retention_days are dropped when the database is opened.
+    """
+
+    def __init__(self, db_path=GENERATION_METRICS_DB, retention_days=GENERATION_METRICS_RETENTION_DAYS):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS requests ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "created_at REAL NOT NULL, "
+                "caller TEXT NOT NULL, "
+                "personality TEXT NOT NULL, "
+                "backend TEXT NOT NULL, "
+                "requested INTEGER NOT NULL, "
+                "returned INTEGER NOT NULL, "
+                "prompt_tokens INTEGER NOT NULL, "
+                "completion_tokens INTEGER NOT NULL, "
+                "estimated INTEGER NOT NULL, "
+                "latency REAL NOT NULL, "
+                "bucket INTEGER NOT NULL, "
+                "ok INTEGER NOT NULL)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS queued ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "created_at REAL NOT NULL, "
+                "caller TEXT NOT NULL, "
+                "personality TEXT NOT NULL, "
+                "count INTEGER NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_requests_created ON requests(created_at)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_queued_created ON queued(created_at)")
+            if retention_days:
+                cutoff = time.time() - retention_days * 86400
+                self.conn.execute("DELETE FROM requests WHERE created_at < ?", (cutoff,))
+                self.conn.execute("DELETE FROM queued WHERE created_at < ?", (cutoff,))
+
+    def record_request(self, personality, backend, requested, returned, prompt_tokens,
+                       completion_tokens, latency, estimated=False, ok=True):
+        """Record one generation request (ok=False for one that failed after retries)"""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO requests (created_at, caller, personality, backend, requested, returned, "
+                "prompt_tokens, completion_tokens, estimated, latency, bucket, ok) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), caller, personality, backend, requested, returned, prompt_tokens,
+                 completion_tokens, int(estimated), latency, latency_bucket(latency), int(ok))
+            )
+
+    def record_queued(self, personality, count=1):
+        """Record tweets from this personality that made it into the queue"""
+        if count:
+            with self._lock, self.conn:
+                self.conn.execute(
+                    "INSERT INTO queued (created_at, caller, personality, count) VALUES (?, ?, ?, ?)",
+                    (time.time(), caller, personality or "UNKNOWN", count)
+                )
+
+    def report(self, hours=24, by="personality"):
+        """
+        Return one dict per personality or caller over the last `hours`:
+        requests, failures, completions, tokens, latency and tokens per queued
+        tweet, most tokens per queued tweet first
+        """
+        if by not in ("personality", "caller"):
+            raise ValueError(f"Can only group by personality or caller, not '{by}'")
+        since = time.time() - hours * 3600
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT {by}, COUNT(*), SUM(1 - ok), SUM(returned), SUM(prompt_tokens), "
+                f"SUM(completion_tokens), SUM(estimated), AVG(latency), MAX(latency) "
+                f"FROM requests WHERE created_at >= ? GROUP BY {by}",
+                (since,)
+            ).fetchall()
+            queued = dict(self.conn.execute(
+                f"SELECT {by}, SUM(count) FROM queued WHERE created_at >= ? GROUP BY {by}",
+                (since,)
+            ).fetchall())
+
+        report = []
+        for key, requests, failed, completions, prompt, completion, estimated, avg_latency, max_latency in rows:
+            tokens = prompt + completion
+            added = queued.get(key, 0)
+            report.append({
+                by: key,
+                "requests": requests,
+                "failed": failed,
+                "completions": completions,
+                "prompt_tokens": prompt,
+                "completion_tokens": completion,
+                "estimated_requests": estimated,
+                "avg_latency": avg_latency,
+                "max_latency": max_latency,
+                "queued": added,
+                "tokens_per_queued": tokens / added if added else None
+            })
+        # Personalities that spent tokens without queueing anything are the most expensive of all
+        return sorted(report, key=lambda row: (row["tokens_per_queued"] is not None,
+                                               -(row["tokens_per_queued"] or 0),
+                                               -(row["prompt_tokens"] + row["completion_tokens"])))
+
+    def histogram(self, hours=24, personality=None):
+        """Return request counts per latency bucket over the last `hours`, as [(label, count)]"""
+        since = time.time() - hours * 3600
+        query = "SELECT bucket, COUNT(*) FROM requests WHERE created_at >= ?"
+        params = [since]
+        if personality:
+            query += " AND personality = ?"
+            params.append(personality)
+        with self._lock:
+            counts = dict(self.conn.execute(query + " GROUP BY bucket", params).fetchall())
+        return [(bucket_label(i), counts.get(i, 0)) for i in range(len(LATENCY_BUCKETS) + 1)]
+
+    def close(self):
+        self.conn.close()
+
+def get_generation_metrics():
+    """Return the process-wide metrics store, opening it on first use"""
+    global _shared_metrics
+    with _shared_metrics_lock:
+        if _shared_metrics is None:
+            _shared_metrics = GenerationMetrics()
+        return _shared_metrics
+
+def print_report(report, by):
+    if not report:
+        print("No generation requests recorded in this period")
+        return
+    print(f"{by.upper():<24} {'REQS':>5} {'FAIL':>5} {'COMPL':>6} {'PROMPT':>8} {'COMPL_TOK':>9} "
+          f"{'AVG_S':>6} {'MAX_S':>6} {'QUEUED':>6} {'TOK/QUEUED':>10}")
+    for row in report:
+        per_queued = f"{row['tokens_per_queued']:.0f}" if row["tokens_per_queued"] is not None else "-"
+        print(f"{row[by]:<24} {row['requests']:>5} {row['failed']:>5} {row['completions']:>6} "
+              f"{row['prompt_tokens']:>8} {row['completion_tokens']:>9} {row['avg_latency']:>6.2f} "
+              f"{row['max_latency']:>6.2f} {row['queued']:>6} {per_queued:>10}")
+    estimated = sum(row["estimated_requests"] for row in report)
+    if estimated:
+        print(f"\nToken counts for {estimated} requests are estimated (streamed or local completions)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Report token usage and latency of tweet generation")
+    parser.add_argument('action', choices=['report', 'latency'],
+                        help='Action to perform: token and latency report, or latency histogram')
+    parser.add_argument('--hours', type=float, default=24,
+                        help='How far back to look (default: 24)')
+    parser.add_argument('--by', choices=['personality', 'caller'], default='personality',
+                        help='Group the report by personality or by caller (default: personality)')
+    parser.add_argument('--personality',
+                        help='Only include this personality in the latency histogram')
+    args = parser.parse_args()
+
+    metrics = get_generation_metrics()
+    if args.action == 'report':
+        print_report(metrics.report(args.hours, args.by), args.by)
+    elif args.action == 'latency':
+        histogram = metrics.histogram(args.hours, args.personality)
+        widest = max(count for _, count in histogram) or 1
+        for label, count in histogram:
+            print(f"{label:>7} {count:>6} {'#' * round(40 * count / widest)}")
+
+if __name__ == "__main__":
+    main()
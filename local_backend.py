@@ -0,0 +1,106 @@
+import os
+import random
+import re
+import threading
+import time
+from config import SYSTEM_PROMPTS, LOCAL_BACKEND_LATENCY, LOCAL_BACKEND_FAILURE_RATE, LOCAL_BACKEND_SEED
+from resilience import ResilientCaller, TransientError
+
+# Archive of generated tweets the local backend learns from
+LOCAL_CORPUS_FILE = "All_generated_tweets.txt"
+# Most words in one synthesized tweet
+MAX_WORDS = 60
+MAX_CHARS = 280
+
+# One archived candidate: "[3] - PERSONALITY - STATUS - SCORE: ...", score lines, the text, a dashed rule
+CORPUS_RECORD_PATTERN = re.compile(r'^\[\d+\] - (\w+) - [^\n]*\n(?:  [^\n]*\n)*(.*?)\n-{30}\n', re.MULTILINE | re.DOTALL)
+
+_END = None
+
+def load_corpus(path=LOCAL_CORPUS_FILE):
+    """Return {personality: [texts]} from the generated-tweets archive"""
+    corpus = {}
+    if not os.path.exists(path):
+        return corpus
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    for personality, text in CORPUS_RECORD_PATTERN.findall(content):
+        if text.strip():
+            corpus.setdefault(personality, []).append(text.strip())
+    return corpus
+
+class MarkovChain:
+    """Word-level order-2 Markov chain used to synthesize new tweets in a corpus' style"""
+
+    def __init__(self, texts):
+        self.starts = []
+        self.transitions = {}
+        for text in texts:
+            words = text.split()
+            if len(words) < 2:
+                continue
+            self.starts.append((words[0], words[1]))
+            for i in range(len(words) - 1):
+                state = (words[i], words[i + 1])
+                following = words[i + 2] if i + 2 < len(words) else _END
+                self.transitions.setdefault(state, []).append(following)
+
+    def generate(self, rng):
+        if not self.starts:
+            return None
+        state = rng.choice(self.starts)
+        words = list(state)
+        while len(words) < MAX_WORDS:
+            following = rng.choice(self.transitions.get(state, [_END]))
+            if following is _END:
+                break
+            words.append(following)
+            state = (state[1], following)
+        text = " ".join(words)
+        while len(text) > MAX_CHARS and " " in text:
+            text = text.rsplit(" ", 1)[0]
+        return text
+
+class LocalBackend:
+    """
+    Offline stand-in for the OpenAI backend: synthesizes tweets per personality
+    from the generated-tweets archive, with simulated latency and injected
+    failures, so the whole pipeline can be load-tested without network or
+    spend. Same seed, same sequence of tweets (when called from one thread).
+    """
+
+    name = "local"
+    model = "local-markov"
+
+    def __init__(self, corpus_file=LOCAL_CORPUS_FILE, latency=LOCAL_BACKEND_LATENCY,
+                 failure_rate=LOCAL_BACKEND_FAILURE_RATE, seed=LOCAL_BACKEND_SEED):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        corpus = load_corpus(corpus_file)
+        all_texts = [text for texts in corpus.values() for text in texts]
+        self.fallback = MarkovChain(all_texts)
+        self.chains = {personality: MarkovChain(texts) for personality, texts in corpus.items()}
+        self.personalities_by_prompt = {prompt: personality for personality, prompt in SYSTEM_PROMPTS.items()}
+        # No real API to protect, so no meaningful rate limit - but failures are still retried
+        self.calls = ResilientCaller((TransientError,), max_retries=3, rate_per_second=1000, burst=1000, base_delay=0.05)
+
+    def complete(self, messages, n, request_timeout, stream):
+        """Return n synthesized completions for the messages' personality, and no usage (stream is ignored)"""
+        with self._lock:
+            delay = self._rng.uniform(0.5 * self.latency, 1.5 * self.latency)
+            fail = self._rng.random() < self.failure_rate
+        if request_timeout and delay > request_timeout:
+            time.sleep(request_timeout)
+            raise TransientError("Local backend request timed out")
+        time.sleep(delay)
+        if fail:
+            raise TransientError("Injected local backend failure")
+
+        personality = self.personalities_by_prompt.get(messages[0]["content"], "TRENDING")
+        chain = self.chains.get(personality, self.fallback)
+        with self._lock:
+            texts = [chain.generate(self._rng) for _ in range(n)]
+        # No real token usage; the caller estimates it from the text
+        return [text for text in texts if text], None
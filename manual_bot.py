@@ -11,8 +11,11 @@ from config import (
     TWITTER_ACCESS_TOKEN_SECRET,
     SYSTEM_PROMPTS
 )
-from tweet_generator import generate_tweet, is_taylor_swift_personality
-from tweet_selector import score_tweet, get_previously_tweeted_texts
+from tweet_generator import generate_tweet, is_taylor_swift_personality, set_cache_mode
+from generation_metrics import set_caller
+from tweet_selector import get_posted_hashset
+from tweet_scorer import score_tweet
+from tweet_history import get_tweet_history
 from utils import log_activity
 
 class ManualBot:
@@ -23,7 +26,8 @@ class ManualBot:
             access_token=TWITTER_ACCESS_TOKEN,
             access_token_secret=TWITTER_ACCESS_TOKEN_SECRET
         )
-        self.previously_tweeted = get_previously_tweeted_texts()
+        self.history = get_tweet_history()
+        self.previously_tweeted = get_posted_hashset()
         log_activity(f"Loaded {len(self.previously_tweeted)} previously tweeted texts")
         
     def save_tweet(self, tweet_text, personality):
@@ -34,13 +38,15 @@ class ManualBot:
             f.write(tweet_text)
             f.write("\n" + "-"*50 + "\n")
         
-        # Add to our in-memory set of previously tweeted texts
-        self.previously_tweeted.add(tweet_text)
-        log_activity("Added to in-memory set of previously tweeted texts")
+        # Record in the indexed history used for duplicate checks
+        self.history.record(tweet_text, personality, timestamp)
+        log_activity("Added to tweet history")
     
     def check_duplicate(self, tweet_text):
-        """Check if a tweet is a duplicate"""
-        return tweet_text in self.previously_tweeted
+        """Check if a tweet is a duplicate or near duplicate of a previous post"""
+        if tweet_text in self.previously_tweeted:
+            return True
+        return self.history.is_near_duplicate(tweet_text)
     
     def post_tweet(self, tweet_text, personality):
         """Post a tweet to Twitter"""
@@ -317,11 +323,17 @@ def main():
                         help='Post the generated tweet')
     parser.add_argument('--interactive', '-i', action='store_true',
                         help='Run in interactive mode')
+    parser.add_argument('--replay', action='store_true',
+                        help='Use previously cached completions instead of calling OpenAI')
     
     args = parser.parse_args()
+    set_caller("manual")
+    
+    if args.replay:
+        set_cache_mode("replay")
     
-    # If no arguments or interactive flag, run in interactive mode
-    if len(sys.argv) == 1 or args.interactive:
+    # If no arguments (other than --replay) or interactive flag, run in interactive mode
+    if len(sys.argv) == 1 or args.interactive or (args.replay and len(sys.argv) == 2):
         interactive_mode()
     else:
         # Command line mode
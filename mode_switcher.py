@@ -2,6 +2,8 @@ import argparse
 import json
 import os
 from tweet_selector import generate_multiple_tweets, select_best_tweet
+from tweet_generator import set_cache_mode
+from generation_metrics import set_caller
 
 def list_personalities():
     """List all available personality types"""
@@ -112,8 +114,14 @@ def main():
                         help='Mode to switch to: taylor (Swift only), socio (socio-political only), or all (both)')
     parser.add_argument('--count', type=int, default=3,
                         help='Number of sample tweets to generate (default: 3)')
+    parser.add_argument('--replay', action='store_true',
+                        help='Sample previously cached completions instead of calling OpenAI')
     
     args = parser.parse_args()
+    set_caller("sampler")
+    
+    if args.replay:
+        set_cache_mode("replay")
     
     if args.action == 'list':
         list_personalities()
@@ -0,0 +1,140 @@
+import hashlib
+import re
+import zlib
+from array import array
+
+# Number of MinHash values per signature (one-permutation hashing bins)
+NUM_BINS = 64
+# LSH banding: NUM_BINS values split into bands of LSH_ROWS values each
+LSH_BANDS = 16
+LSH_ROWS = NUM_BINS // LSH_BANDS
+# Character shingle length used for similarity
+SHINGLE_SIZE = 5
+
+_BIN_BITS = 6  # log2(NUM_BINS)
+_EMPTY_BIN = 0xFFFFFFFF
+_NON_WORD = re.compile(r'[^\w\s]+')
+
+def normalize_for_similarity(text):
+    """Lowercase and strip punctuation/emoji so cosmetic variants compare equal"""
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+def shingles(text, k=SHINGLE_SIZE):
+    """Return the set of character k-shingles of the normalized text"""
+    text = normalize_for_similarity(text)
+    if not text:
+        return set()
+    if len(text) <= k:
+        return {text}
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+def minhash_signature(text):
+    """
+    Build a MinHash signature with one-permutation hashing: every shingle is
+    hashed once, the low bits pick a bin and each bin keeps its minimum.
+    Empty bins are filled from the next non-empty bin (rotation densification).
+    Returns None for texts without any shingles.
+    """
+    bins = [_EMPTY_BIN] * NUM_BINS
+    for shingle in shingles(text):
+        h = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        index = h & (NUM_BINS - 1)
+        value = (h >> _BIN_BITS) & 0xFFFFFFFF
+        if value < bins[index]:
+            bins[index] = value
+
+    filled = [i for i, value in enumerate(bins) if value != _EMPTY_BIN]
+    if not filled:
+        return None
+
+    if len(filled) < NUM_BINS:
+        densified = bins[:]
+        for i in range(NUM_BINS):
+            if bins[i] == _EMPTY_BIN:
+                # Borrow from the nearest non-empty bin to the right, offset by distance
+                distance = 1
+                while bins[(i + distance) % NUM_BINS] == _EMPTY_BIN:
+                    distance += 1
+                borrowed = bins[(i + distance) % NUM_BINS]
+                densified[i] = (borrowed + distance * 0x9E3779B1) & 0xFFFFFFFF
+        bins = densified
+
+    return array('I', bins)
+
+def signature_similarity(a, b):
+    """Estimate the Jaccard similarity of two texts from their signatures"""
+    if a is None or b is None:
+        return 0.0
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_BINS
+
+def band_keys(signature):
+    """Return one integer LSH bucket key per band of the signature"""
+    raw = signature.tobytes()
+    width = LSH_ROWS * signature.itemsize
+    return [(band << 32) | zlib.crc32(raw[band * width:(band + 1) * width])
+            for band in range(LSH_BANDS)]
+
+def signature_to_bytes(signature):
+    return signature.tobytes()
+
+def signature_from_bytes(data):
+    signature = array('I')
+    signature.frombytes(data)
+    return signature
+
+class LSHIndex:
+    """
+    In-memory MinHash LSH index. Only texts that share at least one band
+    bucket are compared, so lookups don't scan every stored signature.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.signatures = {}
+
+    def add(self, key, text=None, signature=None):
+        """Index a text (or a precomputed signature) under the given key"""
+        if signature is None:
+            signature = minhash_signature(text)
+        if signature is None:
+            return
+        self.remove(key)
+        self.signatures[key] = signature
+        for band_key in band_keys(signature):
+            self.buckets.setdefault(band_key, []).append(key)
+
+    def remove(self, key):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for band_key in band_keys(signature):
+            keys = self.buckets.get(band_key)
+            if keys and key in keys:
+                keys.remove(key)
+                if not keys:
+                    del self.buckets[band_key]
+
+    def query(self, text=None, signature=None, threshold=0.0):
+        """Return (key, similarity) pairs at or above the threshold, most similar first"""
+        if signature is None:
+            signature = minhash_signature(text)
+        if signature is None:
+            return []
+
+        candidates = set()
+        for band_key in band_keys(signature):
+            candidates.update(self.buckets.get(band_key, ()))
+
+        matches = []
+        for key in candidates:
+            similarity = signature_similarity(signature, self.signatures[key])
+            if similarity >= threshold:
+                matches.append((key, similarity))
+        matches.sort(key=lambda match: match[1], reverse=True)
+        return matches
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def __contains__(self, key):
+        return key in self.signatures
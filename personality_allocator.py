@@ -0,0 +1,142 @@
+import json
+import math
+import os
+import random
+import re
+import threading
+
+# File used to persist per-personality pass counts between restarts
+PERSONALITY_STATS_FILE = "personality_stats.json"
+# Archive of generated tweets, used to seed the stats on first run
+ALL_GENERATED_TWEETS_FILE = "All_generated_tweets.txt"
+# Most candidates requested from one personality in a single batch
+MAX_CANDIDATES_PER_PERSONALITY = 5
+# Most candidates requested in one batch, however low the pass rates
+MAX_BATCH_CANDIDATES = 15
+# Score a candidate needs to count as a pass when seeding from the archive
+DEFAULT_MIN_SCORE = 9.0
+
+# "[3] - CONSPIRACY_SWIFTIE - NOT CHOSEN - SCORE: 5.00"
+GENERATED_RECORD_PATTERN = re.compile(r'^\[\d+\] - (\w+) - .*? - SCORE: (-?[\d.]+)', re.MULTILINE)
+
+_shared_allocator = None
+_shared_allocator_lock = threading.Lock()
+
+class PersonalityAllocator:
+    """
+    Decides how many candidates to request from each personality. Pass rates
+    (share of candidates clearing min_score) are tracked per personality and
+    persisted. Each batch samples a plausible pass rate per personality
+    (Thompson sampling over a Beta posterior) and gives candidates to the
+    best ones until the expected number of passing tweets reaches the target,
+    so weak personalities cost few calls. The least-sampled personality always
+    gets one exploratory candidate, so none is ever starved.
+    """
+
+    def __init__(self, stats_file=PERSONALITY_STATS_FILE, archive_file=ALL_GENERATED_TWEETS_FILE):
+        self.stats_file = stats_file
+        self._lock = threading.Lock()
+        self.stats = {}  # personality -> {"generated": n, "passed": n}
+        if os.path.exists(stats_file):
+            self._load()
+        else:
+            self.seed_from_archive(archive_file)
+
+    def _load(self):
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                self.stats = json.load(f)
+        except Exception as e:
+            print(f"Error loading personality stats: {e}")
+
+    def save(self):
+        # Write to a temporary file and rename so a crash never leaves a half-written file
+        tmp_file = f"{self.stats_file}.tmp"
+        with self._lock:
+            state = json.dumps(self.stats, indent=2)
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(state)
+            os.replace(tmp_file, self.stats_file)
+        except Exception as e:
+            print(f"Error saving personality stats: {e}")
+
+    def seed_from_archive(self, path=ALL_GENERATED_TWEETS_FILE, min_score=DEFAULT_MIN_SCORE):
+        """Count passes per personality from the generated-tweets archive; returns how many were read"""
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except Exception as e:
+            print(f"Error reading {path}: {e}")
+            return 0
+
+        records = GENERATED_RECORD_PATTERN.findall(content)
+        for personality, score in records:
+            self.record(personality, float(score) >= min_score)
+        if records:
+            self.save()
+        return len(records)
+
+    def record(self, personality, passed):
+        """Record whether a candidate from this personality cleared the score threshold"""
+        with self._lock:
+            entry = self.stats.setdefault(personality, {"generated": 0, "passed": 0})
+            entry["generated"] += 1
+            if passed:
+                entry["passed"] += 1
+
+    def pass_rate(self, personality):
+        """Posterior mean pass rate (uniform prior, so unseen personalities start at 0.5)"""
+        with self._lock:
+            entry = self.stats.get(personality, {"generated": 0, "passed": 0})
+        return (entry["passed"] + 1) / (entry["generated"] + 2)
+
+    def _sampled_rate(self, personality):
+        with self._lock:
+            entry = self.stats.get(personality, {"generated": 0, "passed": 0})
+        return random.betavariate(entry["passed"] + 1, entry["generated"] - entry["passed"] + 1)
+
+    def allocate(self, target, personalities):
+        """
+        Return {personality: candidates} expected to yield `target` passing
+        tweets with as few requests (personalities) and candidates as possible
+        """
+        with self._lock:
+            generated = {p: self.stats.get(p, {}).get("generated", 0) for p in personalities}
+
+        # Exploration: one candidate from whichever personality has been tried least
+        least_sampled = min(personalities, key=lambda p: (generated[p], random.random()))
+        allocation = {least_sampled: 1}
+        expected = self.pass_rate(least_sampled)
+        total = 1
+
+        # Exploitation: fill from the personalities with the best sampled pass rates
+        ranked = sorted(personalities, key=self._sampled_rate, reverse=True)
+        for personality in ranked:
+            if expected >= target or total >= MAX_BATCH_CANDIDATES:
+                break
+            rate = self.pass_rate(personality)
+            already = allocation.get(personality, 0)
+            wanted = math.ceil((target - expected) / rate)
+            extra = max(0, min(wanted, MAX_CANDIDATES_PER_PERSONALITY - already, MAX_BATCH_CANDIDATES - total))
+            if extra:
+                allocation[personality] = already + extra
+                expected += extra * rate
+                total += extra
+        return allocation
+
+    def report(self):
+        """Return (personality, generated, passed, pass rate) rows, best first"""
+        with self._lock:
+            rows = [(p, e["generated"], e["passed"]) for p, e in self.stats.items()]
+        return sorted(((p, g, n, self.pass_rate(p)) for p, g, n in rows), key=lambda row: row[3], reverse=True)
+
+def get_personality_allocator():
+    """Return the process-wide allocator, loading the persisted stats on first use"""
+    global _shared_allocator
+    with _shared_allocator_lock:
+        if _shared_allocator is None:
+            _shared_allocator = PersonalityAllocator()
+        return _shared_allocator
@@ -0,0 +1,274 @@
+import argparse
+import os
+import re
+import threading
+import time
+import zlib
+from config import QUALITY_MODEL_FILE
+from tweet_history import get_tweet_history
+from tweet_scorer import BASELINE_RULES, Scorer, extract_features
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Archive of generated tweets the model is trained on
+ALL_GENERATED_TWEETS_FILE = "All_generated_tweets.txt"
+# Hashed n-gram features: 2**FEATURE_BITS buckets of word unigrams and bigrams
+FEATURE_BITS = 14
+# Training: full-batch gradient descent steps, learning rate and L2 penalty
+TRAINING_EPOCHS = 300
+LEARNING_RATE = 0.5
+L2_PENALTY = 1e-4
+# Share of the archive held out to report how well the model generalizes
+HOLDOUT_SHARE = 0.2
+# Fewest posted candidates worth training on
+MIN_POSITIVES = 10
+
+# "[3] - CONSPIRACY_SWIFTIE - NOT CHOSEN & QUEUED - SCORE: 12.50"
+RECORD_HEADER_PATTERN = re.compile(r'^\[\d+\] - (\w+) - (.*?)(?: - SCORE: -?[\d.]+)?$')
+RECORD_END = "-" * 30
+WORD_PATTERN = re.compile(r"\w+|[^\w\s]")
+# Mixes a word's hash into the next one's to hash a bigram
+BIGRAM_MULTIPLIER = 1000003
+MAX_CACHED_WORD_HASHES = 100000
+
+_shared_model = None
+_shared_model_mtime = None
+_shared_model_lock = threading.Lock()
+
+def iter_archive(path=ALL_GENERATED_TWEETS_FILE):
+    """Stream (personality, status, text) for every candidate in the generated-tweets archive"""
+    with open(path, 'r', encoding='utf-8') as f:
+        header = None
+        text_lines = []
+        for line in f:
+            line = line.rstrip("\n")
+            if header is None:
+                match = RECORD_HEADER_PATTERN.match(line)
+                if match:
+                    header = match.groups()
+                    text_lines = []
+            elif line == RECORD_END:
+                text = "\n".join(text_lines).strip()
+                if text:
+                    yield header[0], header[1], text
+                header = None
+            elif not (line.startswith("  ") and not text_lines):
+                # Lines indented by two spaces before the text are the score breakdown
+                text_lines.append(line)
+
+def is_positive(status, text, posted):
+    """
+    A candidate counts as good if it was chosen or actually posted (it's in
+    the posting history). Being queued doesn't count: that only means the
+    heuristic score cleared the threshold, which the model would just relearn.
+    """
+    return ("CHOSEN" in status and "NOT CHOSEN" not in status) or text in posted
+
+class WordHashes(dict):
+    """Memoized stable word hashes (Python's hash() changes between runs); look words up with []"""
+
+    def __missing__(self, word):
+        value = self[word] = zlib.crc32(word.encode("utf-8"))
+        return value
+
+_word_hashes = WordHashes()
+
+def _sparse_batch(texts, bits):
+    """
+    Return (rows, columns, values) of the texts' hashed word unigrams and
+    bigrams, scaled by 1/sqrt(n-grams) per text. Words are hashed once each;
+    bigram hashes are combined from them for the whole batch at once.
+    """
+    if len(_word_hashes) >= MAX_CACHED_WORD_HASHES:
+        _word_hashes.clear()
+    hashes, rows = [], []
+    for i, text in enumerate(texts):
+        words = WORD_PATTERN.findall(text.lower())
+        hashes.extend(map(_word_hashes.__getitem__, words))
+        rows.extend([i] * len(words))
+    hashes = np.array(hashes, dtype=np.uint64)
+    rows = np.array(rows, dtype=np.int64)
+
+    # Consecutive words of the same text form a bigram (uint64 arithmetic wraps around)
+    same_text = rows[1:] == rows[:-1]
+    bigrams = (hashes[:-1] * BIGRAM_MULTIPLIER + hashes[1:])[same_text]
+    columns = (np.concatenate([hashes, bigrams]) & np.uint64((1 << bits) - 1)).astype(np.int64)
+    rows = np.concatenate([rows, rows[1:][same_text]])
+    values = 1 / np.sqrt(np.bincount(rows, minlength=len(texts))[rows])
+    return rows, columns, values
+
+class QualityModel:
+    """
+    Logistic regression predicting whether a candidate gets posted, over
+    hashed word n-grams only. The heuristic scorer's features (length,
+    hashtags, emojis, ...) are left out, so blending the model with the score
+    adds what the wording says rather than counting the heuristic twice.
+    Weights live in a small .npz file; predicting a batch is a few vectorized
+    NumPy operations, with no network.
+    """
+
+    def __init__(self, weights, bias, bits=FEATURE_BITS):
+        self.weights = weights
+        self.bias = bias
+        self.bits = bits
+
+    def _logits(self, texts):
+        rows, columns, values = _sparse_batch(texts, self.bits)
+        return np.bincount(rows, weights=self.weights[columns] * values, minlength=len(texts)) + self.bias
+
+    def predict(self, texts):
+        """Return the probability that each text is a good tweet"""
+        if not texts:
+            return np.zeros(0)
+        return 1 / (1 + np.exp(-self._logits(texts)))
+
+    def save(self, path=QUALITY_MODEL_FILE):
+        # Full-precision weights, so a loaded model scores exactly like the one trained.
+        # Write to a temporary file and rename so a crash never leaves a half-written model
+        tmp_file = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_file, weights=self.weights,
+                            bias=np.array(self.bias), bits=np.array(self.bits))
+        os.replace(tmp_file, path)
+
+    @classmethod
+    def load(cls, path=QUALITY_MODEL_FILE):
+        with np.load(path) as data:
+            return cls(data["weights"].astype(np.float64), float(data["bias"]), int(data["bits"]))
+
+    @classmethod
+    def train(cls, texts, labels, bits=FEATURE_BITS, epochs=TRAINING_EPOCHS,
+              learning_rate=LEARNING_RATE, l2=L2_PENALTY):
+        """Fit the model by full-batch gradient descent, weighting classes equally"""
+        labels = np.asarray(labels, dtype=np.float64)
+        rows, columns, values = _sparse_batch(texts, bits)
+
+        # Positives are rare, so each class gets half the total weight
+        positives = labels.sum()
+        sample_weights = np.where(labels == 1, 0.5 / max(positives, 1), 0.5 / max(len(labels) - positives, 1))
+
+        model = cls(np.zeros(1 << bits), 0.0, bits)
+        for _ in range(epochs):
+            sparse = np.bincount(rows, weights=model.weights[columns] * values, minlength=len(texts))
+            predictions = 1 / (1 + np.exp(-(sparse + model.bias)))
+            errors = (predictions - labels) * sample_weights
+            model.weights -= learning_rate * (np.bincount(columns, weights=errors[rows] * values,
+                                                          minlength=1 << bits) + l2 * model.weights)
+            model.bias -= learning_rate * errors.sum()
+        return model
+
+def auc(labels, predictions):
+    """Area under the ROC curve: chance a random good tweet is ranked above a random bad one"""
+    labels = np.asarray(labels)
+    ranks = np.empty(len(predictions))
+    ranks[np.argsort(predictions, kind="stable")] = np.arange(1, len(predictions) + 1)
+    positives = labels.sum()
+    negatives = len(labels) - positives
+    if not positives or not negatives:
+        return None
+    return (ranks[labels == 1].sum() - positives * (positives + 1) / 2) / (positives * negatives)
+
+def get_quality_model():
+    """
+    Return the trained model, reloading it when the file changes, or None if
+    NumPy isn't installed or no model has been trained
+    """
+    global _shared_model, _shared_model_mtime
+    if np is None:
+        return None
+    try:
+        mtime = os.path.getmtime(QUALITY_MODEL_FILE)
+    except OSError:
+        return None
+    with _shared_model_lock:
+        if mtime != _shared_model_mtime:
+            try:
+                _shared_model = QualityModel.load()
+            except Exception as e:
+                print(f"Error loading quality model: {e}")
+                _shared_model = None
+            _shared_model_mtime = mtime
+        return _shared_model
+
+def quality_batch(texts):
+    """
+    Probabilities (0-1) that each text is a good tweet, predicted for the
+    whole batch at once; 0.5 (no opinion) each without a trained model
+    """
+    model = get_quality_model() if texts else None
+    if model is None:
+        return [0.5] * len(texts)
+    return model.predict(list(texts)).tolist()
+
+def quality(text):
+    """Probability (0-1) that a text is a good tweet; 0.5 (no opinion) without a trained model"""
+    return quality_batch([text])[0]
+
+def train_from_archive(path=ALL_GENERATED_TWEETS_FILE, out=QUALITY_MODEL_FILE, epochs=TRAINING_EPOCHS):
+    """
+    Train on the archive, labelled by what was actually posted, report holdout
+    AUC next to the baseline heuristic's, then refit on everything and save
+    """
+    posted = get_tweet_history().posted_hashset()
+    records = [(text, is_positive(status, text, posted)) for _, status, text in iter_archive(path)]
+    if not records:
+        print(f"No candidates found in {path}")
+        return None
+    texts = [text for text, _ in records]
+    labels = [int(label) for _, label in records]
+    print(f"Read {len(texts)} candidates from {path} ({sum(labels)} chosen or posted)")
+    if sum(labels) < MIN_POSITIVES:
+        print(f"Need at least {MIN_POSITIVES} chosen or posted candidates to train; not saving a model")
+        return None
+
+    # Hold out a stable share of texts (by hash, so reruns use the same split)
+    holdout = [zlib.crc32(text.encode("utf-8")) % 100 < HOLDOUT_SHARE * 100 for text in texts]
+    train_idx = [i for i, held in enumerate(holdout) if not held]
+    test_idx = [i for i, held in enumerate(holdout) if held]
+    if train_idx and test_idx:
+        model = QualityModel.train([texts[i] for i in train_idx], [labels[i] for i in train_idx], epochs=epochs)
+        test_labels = [labels[i] for i in test_idx]
+        test_auc = auc(test_labels, model.predict([texts[i] for i in test_idx]))
+        if test_auc is not None:
+            # The heuristic on the same split, to show what the model adds over it
+            baseline = Scorer("baseline", BASELINE_RULES)
+            baseline_auc = auc(test_labels, [baseline.score(extract_features(texts[i])) for i in test_idx])
+            print(f"Holdout AUC on {len(test_idx)} candidates: {test_auc:.3f} "
+                  f"(baseline score alone: {baseline_auc:.3f})")
+
+    started = time.perf_counter()
+    model = QualityModel.train(texts, labels, epochs=epochs)
+    print(f"Trained on all {len(texts)} candidates in {time.perf_counter() - started:.1f}s")
+    model.save(out)
+    print(f"Saved model to {out} ({os.path.getsize(out) / 1024:.0f} KB)")
+    return model
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or try the learned tweet-quality model")
+    parser.add_argument('action', choices=['train', 'score'],
+                        help='Action to perform: train from the archive, or score some text')
+    parser.add_argument('text', nargs='?', help='Text to score (for score)')
+    parser.add_argument('--archive', default=ALL_GENERATED_TWEETS_FILE,
+                        help='Generated-tweets archive to train on (default: All_generated_tweets.txt)')
+    parser.add_argument('--epochs', type=int, default=TRAINING_EPOCHS,
+                        help=f'Gradient descent steps (default: {TRAINING_EPOCHS})')
+    args = parser.parse_args()
+
+    if np is None:
+        print("The quality model needs NumPy: pip install numpy")
+        return
+    if args.action == 'train':
+        train_from_archive(args.archive, epochs=args.epochs)
+    elif args.action == 'score':
+        if not args.text:
+            print("Please give the text to score")
+            return
+        if get_quality_model() is None:
+            print(f"No trained model at {QUALITY_MODEL_FILE}; run: python quality_model.py train")
+            return
+        print(f"Quality: {quality(args.text):.3f}")
+
+if __name__ == "__main__":
+    main()
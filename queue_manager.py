@@ -1,21 +1,25 @@
 import json
 import argparse
-from tweet_selector import (
-    load_tweet_queue, 
-    save_tweet_queue, 
-    clean_queue_of_duplicates,
-    get_previously_tweeted_texts
-)
+from tweet_selector import clean_queue_of_duplicates
+from queue_store import get_queue_store
 
-def display_queue():
-    """Display all tweets in the queue"""
-    queue = load_tweet_queue()
+def display_queue(limit=None):
+    """Display the tweets in the queue in posting order (only the next `limit` if given)"""
+    store = get_queue_store()
+    total = store.size()
     
-    if not queue:
+    if not total:
         print("Queue is empty.")
         return
     
-    print(f"\n=== TWEET QUEUE ({len(queue)} tweets) ===\n")
+    # Same listing (and numbering) remove_tweet resolves --index against; with
+    # a limit only the top of the queue is loaded
+    queue = [tweet for _, tweet in store.items(limit)]
+    
+    if len(queue) < total:
+        print(f"\n=== TWEET QUEUE (next {len(queue)} of {total} tweets) ===\n")
+    else:
+        print(f"\n=== TWEET QUEUE ({total} tweets) ===\n")
     
     for i, tweet in enumerate(queue):
         score_info = f"Score: {tweet.get('score', 'N/A'):.2f}" if 'score' in tweet else ''
@@ -27,54 +31,40 @@ def display_queue():
 
 def remove_tweet(index):
     """Remove a tweet from the queue by index"""
-    queue = load_tweet_queue()
+    store = get_queue_store()
+    items = store.items()
     
-    if not queue:
+    if not items:
         print("Queue is empty.")
         return
     
     try:
         index = int(index) - 1  # Convert to 0-based index
-        if index < 0 or index >= len(queue):
-            print(f"Invalid index. Please provide a number between 1 and {len(queue)}.")
+        if index < 0 or index >= len(items):
+            print(f"Invalid index. Please provide a number between 1 and {len(items)}.")
             return
         
-        removed = queue.pop(index)
-        save_tweet_queue(queue)
+        item_id, removed = items[index]
+        store.remove([item_id])
         
         print(f"Removed tweet: {removed.get('text', 'No text available')}")
-        print(f"Queue now has {len(queue)} tweets.")
+        print(f"Queue now has {store.size()} tweets.")
     except ValueError:
         print("Please provide a valid number.")
 
 def clear_queue():
     """Clear the entire queue"""
-    save_tweet_queue([])
+    get_queue_store().clear()
     print("Queue has been cleared.")
 
 def reorder_queue():
     """Reorder queue by score (highest first)"""
-    queue = load_tweet_queue()
-    
-    if not queue:
-        print("Queue is empty.")
-        return
-    
-    # Sort by score (if available)
-    queue.sort(key=lambda x: x.get('score', 0), reverse=True)
-    save_tweet_queue(queue)
-    
-    print("Queue has been reordered by score (highest first).")
+    # The queue is a priority queue: it's always kept ordered by score
+    # (highest first, oldest first on ties), so there's nothing to rewrite
+    print("Queue is always ordered by score (highest first) - nothing to reorder.")
 
 def clean_duplicates(api_credentials=None):
     """Remove duplicates from the queue"""
-    # This first checks local records
-    queue = load_tweet_queue()
-    original_length = len(queue)
-    
-    previously_tweeted = get_previously_tweeted_texts()
-    queue = [tweet for tweet in queue if tweet["text"] not in previously_tweeted]
-    
     # Check if we need to connect to Twitter API
     api_client = None
     if api_credentials:
@@ -103,19 +93,20 @@ def clean_duplicates(api_credentials=None):
     removed_count = clean_queue_of_duplicates(api_client)
     
     print(f"Removed {removed_count} duplicate tweets from queue.")
-    print(f"Queue now has {len(load_tweet_queue())} tweets.")
+    print(f"Queue now has {get_queue_store().size()} tweets.")
 
 def main():
     parser = argparse.ArgumentParser(description="Manage the tweet queue")
     parser.add_argument('action', choices=['show', 'remove', 'clear', 'reorder', 'clean'], 
                         help='Action to perform on the queue')
     parser.add_argument('--index', type=int, help='Index of tweet to remove (1-based)')
+    parser.add_argument('--limit', type=int, help='Only show the next N tweets to be posted')
     parser.add_argument('--api-credentials', help='Twitter API credentials in format: api_key,api_secret,access_token,access_token_secret')
     
     args = parser.parse_args()
     
     if args.action == 'show':
-        display_queue()
+        display_queue(args.limit)
     elif args.action == 'remove':
         if args.index is None:
             print("Please provide an index with --index")
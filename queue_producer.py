@@ -0,0 +1,79 @@
+import threading
+from config import QUEUE_LOW_WATER, QUEUE_HIGH_WATER
+from utils import log_activity
+
+# Seconds between queue size checks when nothing wakes the producer
+PRODUCER_POLL_INTERVAL = 60
+# Most batches generated in one top-up (bounds spend when few tweets pass)
+PRODUCER_MAX_BATCHES = 5
+
+class QueueProducer:
+    """
+    Background thread that keeps the tweet queue topped up while the bot is
+    idle between posts. Once the queue drops below low_water it generates
+    batches until it reaches high_water, so posting only ever takes an
+    already-scored tweet from the queue and never waits on OpenAI.
+
+    refill(wanted) must generate, score and queue tweets, aiming for `wanted`
+    new queued tweets, and return how many were added.
+    """
+
+    def __init__(self, queue, refill, low_water=QUEUE_LOW_WATER, high_water=QUEUE_HIGH_WATER,
+                 poll_interval=PRODUCER_POLL_INTERVAL, max_batches=PRODUCER_MAX_BATCHES):
+        self.queue = queue
+        self.refill = refill
+        self.low_water = low_water
+        self.high_water = max(high_water, low_water)
+        self.poll_interval = poll_interval
+        self.max_batches = max_batches
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="queue-producer", daemon=True)
+            self._thread.start()
+            log_activity(f"Queue producer started (low water {self.low_water}, high water {self.high_water})")
+
+    def stop(self, timeout=None):
+        """Stop the producer, waiting up to timeout seconds for a batch in progress"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def wake(self):
+        """Check the queue now instead of at the next poll (e.g. right after a post)"""
+        self._wake.set()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.top_up()
+            except Exception as e:
+                log_activity(f"Queue producer error: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def top_up(self):
+        """Fill the queue to high_water if it's below low_water; returns how many tweets were added"""
+        size = self.queue.size()
+        if size >= self.low_water:
+            return 0
+
+        log_activity(f"Queue at {size} (below {self.low_water}), generating up to {self.high_water}")
+        added_total = 0
+        for _ in range(self.max_batches):
+            if self._stop.is_set() or size >= self.high_water:
+                break
+            added_total += self.refill(self.high_water - size)
+            size = self.queue.size()
+        log_activity(f"Queue producer added {added_total} tweets, queue size now {size}")
+        return added_total
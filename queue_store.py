@@ -0,0 +1,516 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import Counter
+from config import (
+    NEAR_DUPLICATE_THRESHOLD,
+    QUEUE_MAX_DEPTH,
+    QUEUE_TTL,
+    QUEUE_PERSONALITY_TTLS,
+    QUEUE_EVICTION_POLICY
+)
+from near_duplicates import (
+    minhash_signature,
+    signature_similarity,
+    band_keys,
+    signature_to_bytes,
+    signature_from_bytes
+)
+from tweet_hashset import text_hash
+
+# SQLite database holding the tweet queue
+TWEET_QUEUE_DB = "tweet_queue.db"
+# Legacy JSON queue, imported into the database on first run
+TWEET_QUEUE_FILE = "tweet_queue.json"
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+# Queue order: highest score first, ties broken by enqueue time (oldest first)
+PRIORITY_ORDER = "score DESC, enqueued_at ASC, id ASC"
+# How long a consumer may hold a claimed tweet before it goes back to the queue.
+# Longer than the bot's worst-case post path (the 60s API call spacing plus a
+# 900s rate-limit backoff), and the bot renews the lease right before posting
+CLAIM_LEASE_SECONDS = 1800
+# Items not currently claimed by a live consumer
+AVAILABLE = "(claimed_until IS NULL OR claimed_until < ?)"
+
+def evict_oldest(conn, now, count):
+    """Eviction policy: drop the tweets that have been queued longest"""
+    rows = conn.execute(
+        f"SELECT id FROM queue WHERE {AVAILABLE} ORDER BY enqueued_at ASC, id ASC LIMIT ?",
+        (now, count)
+    ).fetchall()
+    return [item_id for item_id, in rows]
+
+def evict_lowest_score(conn, now, count):
+    """Eviction policy: drop the tweets that would be posted last"""
+    rows = conn.execute(
+        f"SELECT id FROM queue WHERE {AVAILABLE} "
+        "ORDER BY score ASC, enqueued_at DESC, id DESC LIMIT ?",
+        (now, count)
+    ).fetchall()
+    return [item_id for item_id, in rows]
+
+def evict_over_represented(conn, now, count):
+    """
+    Eviction policy: repeatedly drop the lowest-scoring tweet of whichever
+    personality currently has the most queued tweets, keeping the mix varied
+    """
+    counts = Counter(personality for personality, in conn.execute("SELECT personality FROM queue"))
+    candidates = {}  # personality -> available ids, last in posting order first
+    rows = conn.execute(
+        f"SELECT id, personality FROM queue WHERE {AVAILABLE} "
+        "ORDER BY score ASC, enqueued_at DESC, id DESC",
+        (now,)
+    ).fetchall()
+    for item_id, personality in rows:
+        candidates.setdefault(personality, []).append(item_id)
+
+    evicted = []
+    while len(evicted) < count and candidates:
+        personality = max(candidates, key=lambda p: counts[p])
+        evicted.append(candidates[personality].pop(0))
+        counts[personality] -= 1
+        if not candidates[personality]:
+            del candidates[personality]
+    return evicted
+
+# Eviction policies by name: each takes (conn, now, count) and returns the ids to drop
+EVICTION_POLICIES = {
+    "oldest": evict_oldest,
+    "lowest_score": evict_lowest_score,
+    "over_represented": evict_over_represented
+}
+
+class QueueStore:
+    """
+    Tweet queue stored in SQLite (WAL mode), ordered as a priority queue on
+    score with ties broken by enqueue time. The priority index is a B-tree,
+    so enqueue and pop are O(log n) single small transactions; their cost
+    doesn't grow with queue depth and a crash never leaves a half-written queue.
+
+    Every mutation runs in a BEGIN IMMEDIATE transaction, which takes SQLite's
+    (fcntl-based) write lock on the database, so the bot, queue_manager.py and
+    other processes can mutate the queue concurrently without lost updates.
+    Several consumers can share one queue by claiming items with a lease
+    (claim/renew/ack/release) instead of popping them; only the consumer
+    holding a claim can ack, release or renew it.
+
+    The queue is bounded: tweets older than their personality's TTL expire,
+    and once it holds more than max_depth tweets the eviction policy (a name
+    from EVICTION_POLICIES or a function) picks which ones to drop. Both run
+    inline on enqueue, so expired tweets never pile up.
+    """
+
+    def __init__(self, db_path=TWEET_QUEUE_DB, legacy_file=TWEET_QUEUE_FILE,
+                 max_depth=QUEUE_MAX_DEPTH, ttl=QUEUE_TTL, personality_ttls=None,
+                 eviction_policy=QUEUE_EVICTION_POLICY):
+        self.db_path = db_path
+        self.max_depth = max_depth
+        self.ttl = ttl
+        self.personality_ttls = dict(QUEUE_PERSONALITY_TTLS if personality_ttls is None else personality_ttls)
+        if callable(eviction_policy):
+            self.evict = eviction_policy
+        elif eviction_policy in EVICTION_POLICIES:
+            self.evict = EVICTION_POLICIES[eviction_policy]
+        else:
+            print(f"Unknown queue eviction policy '{eviction_policy}', using lowest_score")
+            self.evict = evict_lowest_score
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        with self._transaction():
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS queue ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "hash INTEGER NOT NULL, "
+                "text TEXT NOT NULL, "
+                "personality TEXT, "
+                "score REAL, "
+                "enqueued_at REAL NOT NULL, "
+                "data TEXT NOT NULL, "
+                "minhash BLOB)"
+            )
+            self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_queue_hash ON queue(hash)")
+            self.conn.execute("UPDATE queue SET score = 0 WHERE score IS NULL")
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(queue)")]
+            if "claimed_by" not in columns:
+                self.conn.execute("ALTER TABLE queue ADD COLUMN claimed_by TEXT")
+                self.conn.execute("ALTER TABLE queue ADD COLUMN claimed_until REAL")
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_queue_priority ON queue(score DESC, enqueued_at ASC, id ASC)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_queue_expiry ON queue(personality, enqueued_at)")
+            # Near-duplicate index over queued tweets: one row per (LSH band bucket, item)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS queue_bands ("
+                "band_key INTEGER NOT NULL, "
+                "item_id INTEGER NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_queue_bands_key ON queue_bands(band_key)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_queue_bands_item ON queue_bands(item_id)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        # One-time import of the legacy JSON queue
+        if self._get_meta("imported_file") is None:
+            imported = self.import_json_queue(legacy_file)
+            if imported:
+                print(f"Imported {imported} queued tweets from {legacy_file} into {db_path}")
+
+    def _transaction(self):
+        return _Transaction(self)
+
+    def _get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def import_json_queue(self, path=TWEET_QUEUE_FILE):
+        """Append the tweets from a legacy tweet_queue.json file, skipping duplicates"""
+        tweets = []
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    tweets = json.load(f)
+            except Exception as e:
+                print(f"Error reading {path} for import: {e}")
+                return 0
+
+        with self._transaction():
+            imported = sum(1 for tweet in tweets if self._insert(tweet, None) is not None)
+            self._set_meta("imported_file", os.path.abspath(path))
+        return imported
+
+    def _similar_item(self, signature, threshold):
+        """Return the id of a queued item at least this similar, or None"""
+        keys = band_keys(signature)
+        placeholders = ",".join("?" * len(keys))
+        rows = self.conn.execute(
+            "SELECT DISTINCT q.id, q.minhash FROM queue_bands b "
+            "JOIN queue q ON q.id = b.item_id "
+            f"WHERE b.band_key IN ({placeholders})",
+            keys
+        ).fetchall()
+        for item_id, blob in rows:
+            if signature_similarity(signature, signature_from_bytes(blob)) >= threshold:
+                return item_id
+        return None
+
+    def _insert(self, tweet, threshold):
+        """Insert one tweet inside an open transaction; returns its id or None if it's a duplicate"""
+        signature = minhash_signature(tweet["text"])
+        if threshold is not None and signature is not None:
+            if self._similar_item(signature, threshold) is not None:
+                return None
+
+        # Keep the enqueue time in the tweet data too, so a rewrite (modify) preserves it
+        tweet = dict(tweet)
+        tweet.setdefault("enqueued_at", time.time())
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO queue (hash, text, personality, score, enqueued_at, data, minhash) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                text_hash(tweet["text"]),
+                tweet["text"],
+                tweet.get("personality"),
+                tweet.get("score", 0),
+                tweet["enqueued_at"],
+                json.dumps(tweet, ensure_ascii=False),
+                signature_to_bytes(signature) if signature is not None else None
+            )
+        )
+        if cursor.rowcount == 0:
+            return None
+        item_id = cursor.lastrowid
+        if signature is not None:
+            self.conn.executemany(
+                "INSERT INTO queue_bands (band_key, item_id) VALUES (?, ?)",
+                [(key, item_id) for key in band_keys(signature)]
+            )
+        return item_id
+
+    def _delete(self, item_ids):
+        item_ids = list(item_ids)
+        self.conn.executemany("DELETE FROM queue WHERE id = ?", [(item_id,) for item_id in item_ids])
+        self.conn.executemany("DELETE FROM queue_bands WHERE item_id = ?", [(item_id,) for item_id in item_ids])
+
+    def _expire(self, now):
+        """Delete unclaimed tweets older than their TTL inside an open transaction; returns their ids"""
+        conditions = []
+        params = []
+        for personality, ttl in self.personality_ttls.items():
+            if ttl:
+                conditions.append("(personality = ? AND enqueued_at < ?)")
+                params.extend([personality, now - ttl])
+        if self.ttl:
+            placeholders = ",".join("?" * len(self.personality_ttls))
+            conditions.append(
+                f"((personality IS NULL OR personality NOT IN ({placeholders})) AND enqueued_at < ?)"
+            )
+            params.extend(list(self.personality_ttls) + [now - self.ttl])
+        if not conditions:
+            return []
+
+        rows = self.conn.execute(
+            f"SELECT id FROM queue WHERE {AVAILABLE} AND ({' OR '.join(conditions)})",
+            [now] + params
+        ).fetchall()
+        expired = [item_id for item_id, in rows]
+        if expired:
+            self._delete(expired)
+        return expired
+
+    def _evict(self, now):
+        """Evict tweets beyond max_depth inside an open transaction; returns their ids"""
+        if not self.max_depth:
+            return []
+        excess = self.conn.execute("SELECT COUNT(*) FROM queue").fetchone()[0] - self.max_depth
+        if excess <= 0:
+            return []
+        evicted = self.evict(self.conn, now, excess)
+        if evicted:
+            self._delete(evicted)
+        return evicted
+
+    def push(self, tweet, near_duplicate_threshold=NEAR_DUPLICATE_THRESHOLD):
+        """
+        Enqueue a tweet, expiring stale tweets and evicting any beyond the
+        maximum depth. Returns its id, or None when the same text (or a near
+        duplicate, unless the threshold is None) is already queued, or the
+        tweet itself was the one evicted.
+        """
+        return self.apply([(tweet, near_duplicate_threshold)])[0]
+
+    def push_many(self, tweets, near_duplicate_threshold=NEAR_DUPLICATE_THRESHOLD):
+        """
+        Enqueue tweets in one transaction, checking each against the queue and
+        the ones before it. Returns one id per tweet, None where it was rejected.
+        """
+        return self.apply([(tweet, near_duplicate_threshold) for tweet in tweets])
+
+    def apply(self, pushes=(), removals=()):
+        """
+        Enqueue (tweet, near_duplicate_threshold) pairs and remove items by id
+        in a single transaction. Returns one entry per push: the new id, or
+        None if the tweet was a duplicate or evicted.
+        """
+        now = time.time()
+        with self._transaction():
+            self._expire(now)
+            self._delete(removals)
+            added = [self._insert(tweet, threshold) for tweet, threshold in pushes]
+            evicted = set(self._evict(now))
+        return [item_id if item_id not in evicted else None for item_id in added]
+
+    def expire(self):
+        """Delete expired tweets now; returns how many were removed"""
+        with self._transaction():
+            return len(self._expire(time.time()))
+
+    def pop(self):
+        """Remove and return the highest-scoring unclaimed tweet, or None if there isn't one"""
+        now = time.time()
+        with self._transaction():
+            self._expire(now)
+            row = self.conn.execute(
+                f"SELECT id, data FROM queue WHERE {AVAILABLE} ORDER BY {PRIORITY_ORDER} LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._delete([row[0]])
+        return json.loads(row[1])
+
+    def claim(self, consumer=None, lease_seconds=CLAIM_LEASE_SECONDS):
+        """
+        Claim the highest-scoring available tweet for this consumer. Returns
+        (id, tweet) or None. The item stays in the queue, hidden from other
+        consumers, until it's acked (posted), released, or the lease runs out
+        (e.g. the consumer crashed) - so no two consumers get the same tweet.
+        """
+        consumer = consumer or default_consumer_id()
+        now = time.time()
+        with self._transaction():
+            self._expire(now)
+            row = self.conn.execute(
+                f"SELECT id, data FROM queue WHERE {AVAILABLE} ORDER BY {PRIORITY_ORDER} LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE queue SET claimed_by = ?, claimed_until = ? WHERE id = ?",
+                (consumer, now + lease_seconds, row[0])
+            )
+        return row[0], json.loads(row[1])
+
+    def ack(self, item_id, consumer=None):
+        """
+        Remove an item claimed by this consumer for good (it was posted or
+        rejected). Returns False if the consumer no longer holds the claim
+        (its lease ran out and another consumer took the item).
+        """
+        consumer = consumer or default_consumer_id()
+        with self._transaction():
+            cursor = self.conn.execute(
+                "DELETE FROM queue WHERE id = ? AND claimed_by = ?", (item_id, consumer)
+            )
+            if cursor.rowcount:
+                self.conn.execute("DELETE FROM queue_bands WHERE item_id = ?", (item_id,))
+        return cursor.rowcount > 0
+
+    def release(self, item_id, consumer=None):
+        """
+        Give an item claimed by this consumer back to the queue so any consumer
+        can take it. Returns False if the consumer no longer holds the claim.
+        """
+        consumer = consumer or default_consumer_id()
+        with self._transaction():
+            cursor = self.conn.execute(
+                "UPDATE queue SET claimed_by = NULL, claimed_until = NULL WHERE id = ? AND claimed_by = ?",
+                (item_id, consumer)
+            )
+        return cursor.rowcount > 0
+
+    def renew(self, item_id, consumer=None, lease_seconds=CLAIM_LEASE_SECONDS):
+        """
+        Extend this consumer's lease on a claimed item (call it before slow
+        work such as posting). Returns False if the consumer no longer holds the
+        claim, in which case it must not act on the item.
+        """
+        consumer = consumer or default_consumer_id()
+        with self._transaction():
+            cursor = self.conn.execute(
+                "UPDATE queue SET claimed_until = ? WHERE id = ? AND claimed_by = ?",
+                (time.time() + lease_seconds, item_id, consumer)
+            )
+        return cursor.rowcount > 0
+
+    def remove(self, item_ids):
+        """Remove items by id"""
+        with self._transaction():
+            self._delete(item_ids)
+
+    def peek(self, k=1):
+        """Return the next k unclaimed (id, tweet) pairs in posting order without removing them"""
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT id, data FROM queue WHERE {AVAILABLE} ORDER BY {PRIORITY_ORDER} LIMIT ?",
+                (time.time(), k)
+            ).fetchall()
+        return [(item_id, json.loads(data)) for item_id, data in rows]
+
+    def items(self, limit=None):
+        """Return all (id, tweet) pairs in posting order, claimed ones included (only the first `limit` if given)"""
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT id, data FROM queue ORDER BY {PRIORITY_ORDER} LIMIT ?",
+                (-1 if limit is None else limit,)
+            ).fetchall()
+        return [(item_id, json.loads(data)) for item_id, data in rows]
+
+    def replace_all(self, tweets):
+        """
+        Replace the queue with the given tweets in one transaction. Items
+        currently claimed by a consumer are in flight and left untouched.
+        """
+        with self._transaction():
+            self._replace_all(tweets)
+
+    def _replace_all(self, tweets):
+        self.conn.execute(f"DELETE FROM queue WHERE {AVAILABLE}", (time.time(),))
+        self.conn.execute("DELETE FROM queue_bands WHERE item_id NOT IN (SELECT id FROM queue)")
+        for tweet in tweets:
+            self._insert(tweet, None)
+
+    def modify(self, modify_fn):
+        """
+        Read-modify-write the whole queue atomically: modify_fn gets the list of
+        unclaimed tweets and returns the new list. Nothing else can change the queue in
+        between, unlike a separate load followed by replace_all.
+        """
+        with self._transaction():
+            rows = self.conn.execute(
+                f"SELECT data FROM queue WHERE {AVAILABLE} ORDER BY {PRIORITY_ORDER}", (time.time(),)
+            ).fetchall()
+            queue = modify_fn([json.loads(data) for data, in rows])
+            self._replace_all(queue)
+        return queue
+
+    def clear(self):
+        self.replace_all([])
+
+    def generation(self):
+        """Return the write counter, bumped by every transaction that changed rows, from any process"""
+        with self._lock:
+            value = self._get_meta("generation")
+        return int(value) if value is not None else 0
+
+    def size(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM queue").fetchone()[0]
+
+    def __len__(self):
+        return self.size()
+
+    def close(self):
+        self.conn.close()
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK block holding the store's thread lock"""
+
+    def __init__(self, store):
+        self.store = store
+        self.changes = 0
+
+    def __enter__(self):
+        self.store._lock.acquire()
+        try:
+            self.store.conn.execute("BEGIN IMMEDIATE")
+        except Exception:
+            self.store._lock.release()
+            raise
+        self.changes = self.store.conn.total_changes
+        return self.store.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        conn = self.store.conn
+        try:
+            if exc_type is not None:
+                conn.execute("ROLLBACK")
+                return False
+            try:
+                # Every transaction that changed rows bumps the generation so other
+                # handles can spot it; ones that changed nothing (an empty claim) don't
+                if conn.total_changes != self.changes:
+                    conn.execute(
+                        "INSERT INTO meta (key, value) VALUES ('generation', 1) "
+                        "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            self.store._lock.release()
+        return False
+
+def default_consumer_id():
+    """Identify this process (host and pid) as a queue consumer"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def get_queue_store():
+    """Return the process-wide queue store, opening it on first use"""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = QueueStore()
+        return _shared_store
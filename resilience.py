@@ -0,0 +1,177 @@
+import random
+import threading
+import time
+
+# Consecutive failed attempts that open the circuit
+BREAKER_FAILURE_THRESHOLD = 5
+# Seconds the circuit stays open before a trial call is let through
+BREAKER_RESET_TIMEOUT = 120
+# Exponential backoff: first delay and cap (seconds), with full jitter
+BACKOFF_BASE_DELAY = 1.0
+BACKOFF_MAX_DELAY = 60.0
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint that has been failing"""
+
+class TransientError(Exception):
+    """A failure worth retrying (e.g. raised by a backend for a simulated outage)"""
+
+class TokenBucket:
+    """Client-side rate limit: `rate` calls per second on average, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+class CircuitBreaker:
+    """
+    Closed while calls succeed. After failure_threshold consecutive failures it
+    opens and rejects calls for reset_timeout seconds, then lets a single trial
+    call through (half-open): success closes it again, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        """Return True if a call may go ahead now"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_running:
+                return False
+            self.trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+class CallStats:
+    """Thread-safe counters for calls made through a ResilientCaller"""
+
+    FIELDS = ("calls", "attempts", "successes", "retries", "failures", "rate_limited", "circuit_rejected")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = dict.fromkeys(self.FIELDS, 0)
+
+    def increment(self, field):
+        with self._lock:
+            self.counts[field] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def summary(self):
+        counts = self.snapshot()
+        calls = counts["calls"] or 1
+        return (f"{counts['calls']} calls, {counts['retries']} retries "
+                f"({counts['rate_limited']} rate limited), {counts['failures']} failed "
+                f"({counts['failures'] / calls:.0%}), {counts['circuit_rejected']} rejected by the circuit breaker")
+
+def retry_after_seconds(error):
+    """Return the Retry-After delay (seconds) the server sent with an error, if any"""
+    headers = getattr(error, "headers", None) or {}
+    try:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+class ResilientCaller:
+    """
+    Runs calls through a token-bucket rate limit and a circuit breaker, and
+    retries `retryable` errors with exponential backoff and full jitter (or
+    the server's Retry-After, when it sends one). Other errors fail at once.
+    """
+
+    def __init__(self, retryable, max_retries, rate_per_second, burst,
+                 breaker=None, base_delay=BACKOFF_BASE_DELAY, max_delay=BACKOFF_MAX_DELAY):
+        self.retryable = retryable
+        self.max_retries = max_retries
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.breaker = breaker or CircuitBreaker()
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = CallStats()
+
+    def backoff_delay(self, attempt, error=None):
+        retry_after = retry_after_seconds(error) if error is not None else None
+        if retry_after is not None:
+            # Honor the server, plus a little jitter so threads don't retry in lockstep
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, func, *args, **kwargs):
+        self.stats.increment("calls")
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self.stats.increment("circuit_rejected")
+                raise CircuitOpenError("Too many recent failures; not calling until the circuit breaker resets")
+            self.bucket.acquire()
+            self.stats.increment("attempts")
+            try:
+                result = func(*args, **kwargs)
+            except self.retryable as e:
+                self.breaker.record_failure()
+                if getattr(e, "http_status", None) == 429 or "rate limit" in str(e).lower():
+                    self.stats.increment("rate_limited")
+                if attempt >= self.max_retries:
+                    self.stats.increment("failures")
+                    raise
+                delay = self.backoff_delay(attempt, e)
+                attempt += 1
+                self.stats.increment("retries")
+                print(f"Retrying in {delay:.1f}s after error (attempt {attempt}/{self.max_retries}): {e}")
+                time.sleep(delay)
+            except Exception:
+                # The endpoint answered (e.g. a bad request): not a reason to open the circuit
+                self.breaker.record_success()
+                self.stats.increment("failures")
+                raise
+            else:
+                self.breaker.record_success()
+                self.stats.increment("successes")
+                return result
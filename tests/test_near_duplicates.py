@@ -0,0 +1,83 @@
+import pytest
+from near_duplicates import (
+    LSHIndex,
+    band_keys,
+    minhash_signature,
+    normalize_for_similarity,
+    signature_from_bytes,
+    signature_similarity,
+    signature_to_bytes
+)
+from tweet_history import TweetHistory
+
+TWEET = ("Taylor Swift personally invented the bridge of every song ever written "
+         "and the music industry just doesn't want you to know it")
+REWORDED = ("Taylor Swift personally invented the bridge of every song ever written "
+            "and the music industry doesn't want you to know it!!")
+UNRELATED = "My neighbour's lawnmower has started at 6am for the third weekend running, send help"
+
+def test_cosmetic_variants_compare_equal():
+    assert normalize_for_similarity("WAIT... what?!  😱") == normalize_for_similarity("wait what")
+    assert signature_similarity(minhash_signature(TWEET), minhash_signature(TWEET.upper() + " 😂")) == 1.0
+
+def test_similarity_separates_rewording_from_unrelated():
+    signature = minhash_signature(TWEET)
+
+    assert signature_similarity(signature, minhash_signature(REWORDED)) >= 0.7
+    assert signature_similarity(signature, minhash_signature(UNRELATED)) < 0.2
+
+def test_signatures_are_stable_and_round_trip():
+    signature = minhash_signature(TWEET)
+
+    assert signature == minhash_signature(TWEET)
+    assert signature_from_bytes(signature_to_bytes(signature)) == signature
+    assert band_keys(signature) == band_keys(minhash_signature(TWEET))
+
+def test_texts_without_shingles_have_no_signature():
+    assert minhash_signature("") is None
+    assert minhash_signature("!!! ...") is None
+    assert signature_similarity(None, minhash_signature(TWEET)) == 0.0
+
+def test_short_texts_are_signed():
+    assert minhash_signature("hi") is not None
+
+def test_lsh_index_finds_near_duplicates_only():
+    index = LSHIndex()
+    index.add("tweet", TWEET)
+    index.add("other", UNRELATED)
+
+    matches = index.query(REWORDED, threshold=0.7)
+    assert [key for key, _ in matches] == ["tweet"]
+    assert index.query("completely different words about gardening tools", threshold=0.7) == []
+
+def test_lsh_index_remove_and_replace():
+    index = LSHIndex()
+    index.add("tweet", TWEET)
+    index.add("tweet", UNRELATED)
+
+    assert len(index) == 1
+    assert index.query(TWEET, threshold=0.7) == []
+    index.remove("tweet")
+    assert "tweet" not in index
+    assert index.buckets == {}
+
+@pytest.fixture
+def history(tmp_path):
+    history = TweetHistory(db_path=str(tmp_path / "history.db"), tweeted_file=str(tmp_path / "missing.txt"))
+    yield history
+    history.close()
+
+def test_history_flags_exact_and_near_duplicates(history):
+    history.record(TWEET, "TEST")
+
+    assert history.was_tweeted("  " + TWEET.replace(" ", "  ") + " ")
+    assert history.is_near_duplicate(REWORDED)
+    assert history.find_similar(REWORDED)[0] == TWEET
+    assert not history.is_near_duplicate(UNRELATED)
+
+def test_history_threshold_is_respected(history):
+    history.record(TWEET, "TEST")
+    similarity = history.find_similar(REWORDED, threshold=0.0)[1]
+
+    assert history.find_similar(REWORDED, threshold=similarity) is not None
+    assert history.find_similar(REWORDED, threshold=min(1.0, similarity + 0.01)) is None
@@ -0,0 +1,65 @@
+import json
+import random
+import pytest
+from personality_allocator import PersonalityAllocator, MAX_BATCH_CANDIDATES, MAX_CANDIDATES_PER_PERSONALITY
+
+PERSONALITIES = ["STRONG", "DECENT", "WEAK", "NEW"]
+PASS_RATES = {"STRONG": 0.9, "DECENT": 0.5, "WEAK": 0.0, "NEW": 0.3}
+
+@pytest.fixture
+def allocator(tmp_path):
+    random.seed(1234)
+    return PersonalityAllocator(stats_file=str(tmp_path / "personality_stats.json"),
+                                archive_file=str(tmp_path / "missing.txt"))
+
+def run_batches(allocator, batches, target=3):
+    allocations = []
+    for _ in range(batches):
+        allocation = allocator.allocate(target, PERSONALITIES)
+        allocations.append(allocation)
+        for personality, n in allocation.items():
+            for _ in range(n):
+                allocator.record(personality, random.random() < PASS_RATES[personality])
+    return allocations
+
+def test_allocation_respects_caps(allocator):
+    for allocation in run_batches(allocator, 50, target=20):
+        assert sum(allocation.values()) <= MAX_BATCH_CANDIDATES
+        assert max(allocation.values()) <= MAX_CANDIDATES_PER_PERSONALITY
+
+def test_no_personality_is_starved(allocator):
+    allocations = run_batches(allocator, 200)
+
+    # Every personality keeps being tried, even one that never passes
+    for start in range(0, 200, 50):
+        window = allocations[start:start + 50]
+        assert all(any(p in allocation for allocation in window) for p in PERSONALITIES)
+    assert allocator.stats["WEAK"]["generated"] >= 200 // len(PERSONALITIES)
+    # ...while the best personality gets most of the candidates
+    assert allocator.stats["STRONG"]["generated"] > allocator.stats["WEAK"]["generated"]
+
+def test_stats_round_trip_through_file(allocator, tmp_path):
+    run_batches(allocator, 20)
+    allocator.save()
+
+    reloaded = PersonalityAllocator(stats_file=allocator.stats_file, archive_file=str(tmp_path / "missing.txt"))
+    assert reloaded.stats == allocator.stats
+    assert [reloaded.pass_rate(p) for p in PERSONALITIES] == [allocator.pass_rate(p) for p in PERSONALITIES]
+    with open(allocator.stats_file, encoding="utf-8") as f:
+        assert json.load(f) == allocator.stats
+
+def test_seeds_from_archive(tmp_path):
+    archive = tmp_path / "All_generated_tweets.txt"
+    archive.write_text(
+        "[1] - TOXIC_STAN - CHOSEN - SCORE: 12.50\nSome tweet\n\n"
+        "[2] - TOXIC_STAN - NOT CHOSEN - SCORE: 3.00\nAnother tweet\n\n"
+        "[3] - NOSTALGIC_BOOMER - NOT CHOSEN - SCORE: -1.00\nA third tweet\n\n",
+        encoding="utf-8"
+    )
+    stats_file = tmp_path / "personality_stats.json"
+
+    allocator = PersonalityAllocator(stats_file=str(stats_file), archive_file=str(archive))
+    assert allocator.stats == {"TOXIC_STAN": {"generated": 2, "passed": 1},
+                               "NOSTALGIC_BOOMER": {"generated": 1, "passed": 0}}
+    # Seeding saves, so the next start loads the file instead of rereading the archive
+    assert PersonalityAllocator(stats_file=str(stats_file)).stats == allocator.stats
@@ -0,0 +1,33 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from quality_model import QualityModel, auc
+
+GOOD = ["my cat judges my life choices every morning", "the office printer has achieved sentience again",
+        "my cat has opinions about the new printer", "sentience is overrated said the printer"]
+BAD = ["buy now limited offer click here", "click here for free followers now",
+       "limited offer on followers click", "free offer buy followers today"]
+
+@pytest.fixture
+def model():
+    return QualityModel.train(GOOD + BAD, [1] * len(GOOD) + [0] * len(BAD), bits=10, epochs=100)
+
+def test_learns_training_labels(model):
+    predictions = model.predict(GOOD + BAD)
+
+    assert auc([1] * len(GOOD) + [0] * len(BAD), predictions) == 1.0
+    assert model.predict(["my cat and the printer"])[0] > model.predict(["click here free offer"])[0]
+
+def test_save_load_round_trip_scores_identically(model, tmp_path):
+    path = str(tmp_path / "quality_model.npz")
+    model.save(path)
+    loaded = QualityModel.load(path)
+
+    texts = GOOD + BAD + ["something it has never seen before", ""]
+    assert loaded.bits == model.bits and loaded.bias == model.bias
+    assert np.array_equal(loaded.weights, model.weights)
+    assert np.array_equal(loaded.predict(texts), model.predict(texts))
+
+def test_predict_empty_batch(model):
+    assert len(model.predict([])) == 0
@@ -0,0 +1,33 @@
+import pytest
+import queue_manager
+from queue_store import QueueStore
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = QueueStore(db_path=str(tmp_path / "queue.db"), legacy_file=str(tmp_path / "missing.json"),
+                       max_depth=0, ttl=0, personality_ttls={})
+    monkeypatch.setattr(queue_manager, "get_queue_store", lambda: store)
+    for text, score in [("the best tweet, already claimed", 12), ("the runner up", 10), ("the third one", 8)]:
+        store.push({"text": text, "personality": "TEST", "score": score}, near_duplicate_threshold=None)
+    yield store
+    store.close()
+
+def test_remove_index_matches_show_numbering(store, capsys):
+    # The bot is busy posting the top tweet
+    store.claim("bot-1")
+
+    queue_manager.display_queue(limit=2)
+    shown = capsys.readouterr().out
+    assert "[1] - TEST Score: 12.00\nthe best tweet, already claimed" in shown
+    assert "[2] - TEST Score: 10.00\nthe runner up" in shown
+    assert "next 2 of 3" in shown
+
+    queue_manager.remove_tweet(2)
+    assert "Removed tweet: the runner up" in capsys.readouterr().out
+    assert [t["text"] for _, t in store.items()] == ["the best tweet, already claimed", "the third one"]
+
+def test_remove_index_out_of_range(store, capsys):
+    queue_manager.remove_tweet(4)
+
+    assert "between 1 and 3" in capsys.readouterr().out
+    assert store.size() == 3
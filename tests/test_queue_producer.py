@@ -0,0 +1,79 @@
+import threading
+import pytest
+import queue_producer
+from queue_producer import QueueProducer
+
+class FakeQueue:
+    def __init__(self, size):
+        self.items = size
+
+    def size(self):
+        return self.items
+
+@pytest.fixture(autouse=True)
+def quiet(monkeypatch):
+    monkeypatch.setattr(queue_producer, "log_activity", lambda message: None)
+
+def refill_by(queue, per_batch, calls):
+    def refill(wanted):
+        calls.append(wanted)
+        queue.items += per_batch
+        return per_batch
+    return refill
+
+def test_no_refill_at_or_above_low_water():
+    queue = FakeQueue(3)
+    calls = []
+    producer = QueueProducer(queue, refill_by(queue, 2, calls), low_water=3, high_water=8)
+
+    assert producer.top_up() == 0
+    assert calls == []
+
+def test_fills_to_high_water_then_stops():
+    queue = FakeQueue(2)
+    calls = []
+    producer = QueueProducer(queue, refill_by(queue, 2, calls), low_water=3, high_water=8)
+
+    assert producer.top_up() == 6
+    assert queue.size() == 8
+    # Each batch asks for what's still missing
+    assert calls == [6, 4, 2]
+
+def test_stays_idle_between_water_marks():
+    queue = FakeQueue(2)
+    calls = []
+    producer = QueueProducer(queue, refill_by(queue, 2, calls), low_water=3, high_water=8)
+    producer.top_up()
+
+    # Posting drains it, but it's not refilled until it falls below low water again
+    for size in (7, 5, 3):
+        queue.items = size
+        assert producer.top_up() == 0
+    assert calls == [6, 4, 2]
+    queue.items = 2
+    assert producer.top_up() == 6
+
+def test_batches_are_capped_when_few_tweets_pass():
+    queue = FakeQueue(0)
+    calls = []
+    producer = QueueProducer(queue, refill_by(queue, 0, calls), low_water=3, high_water=8, max_batches=4)
+
+    assert producer.top_up() == 0
+    assert len(calls) == 4
+
+def test_thread_tops_up_and_stops():
+    queue = FakeQueue(0)
+    refilled = threading.Event()
+
+    def refill(wanted):
+        queue.items += wanted
+        refilled.set()
+        return wanted
+
+    producer = QueueProducer(queue, refill, low_water=3, high_water=10, poll_interval=60)
+    producer.start()
+    assert refilled.wait(5)
+    producer.stop(timeout=5)
+
+    assert not producer.running
+    assert queue.size() == 10
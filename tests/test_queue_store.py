@@ -0,0 +1,143 @@
+import time
+import pytest
+from queue_store import QueueStore
+
+@pytest.fixture
+def store(tmp_path):
+    store = QueueStore(db_path=str(tmp_path / "queue.db"), legacy_file=str(tmp_path / "missing.json"),
+                       max_depth=0, ttl=0, personality_ttls={})
+    yield store
+    store.close()
+
+def tweet(text, score=10):
+    return {"text": text, "personality": "TEST", "score": score}
+
+def expire_lease(store, item_id):
+    with store._transaction():
+        store.conn.execute("UPDATE queue SET claimed_until = ? WHERE id = ?", (time.time() - 1, item_id))
+
+def test_claim_takes_highest_score_and_hides_it(store):
+    store.push(tweet("a perfectly ordinary tweet about the weather today", 9))
+    best = store.push(tweet("completely unrelated words about cooking pasta tonight", 12))
+
+    item_id, claimed = store.claim("bot-1")
+    assert item_id == best
+    assert claimed["score"] == 12
+    assert [t["score"] for _, t in store.peek(5)] == [9]
+    assert store.claim("bot-2")[1]["score"] == 9
+    assert store.claim("bot-3") is None
+
+def test_ack_removes_only_for_claim_holder(store):
+    store.push(tweet("the only tweet in the queue right now"))
+    item_id, _ = store.claim("bot-1")
+
+    assert store.ack(item_id, "bot-2") is False
+    assert store.size() == 1
+    assert store.ack(item_id, "bot-1") is True
+    assert store.size() == 0
+
+def test_release_returns_item_only_for_claim_holder(store):
+    store.push(tweet("the only tweet in the queue right now"))
+    item_id, _ = store.claim("bot-1")
+
+    assert store.release(item_id, "bot-2") is False
+    assert store.claim("bot-2") is None
+    assert store.release(item_id, "bot-1") is True
+    assert store.claim("bot-2")[0] == item_id
+
+def test_expired_lease_can_be_reclaimed(store):
+    store.push(tweet("the only tweet in the queue right now"))
+    item_id, _ = store.claim("bot-1")
+    expire_lease(store, item_id)
+
+    assert store.claim("bot-2")[0] == item_id
+
+def test_stale_consumer_cannot_touch_reclaimed_item(store):
+    store.push(tweet("the only tweet in the queue right now"))
+    item_id, _ = store.claim("bot-1")
+    expire_lease(store, item_id)
+    store.claim("bot-2")
+
+    # bot-1 comes back after its lease ran out: it must not renew, release or ack bot-2's claim
+    assert store.renew(item_id, "bot-1") is False
+    assert store.release(item_id, "bot-1") is False
+    assert store.ack(item_id, "bot-1") is False
+    assert store.claim("bot-3") is None
+    assert store.ack(item_id, "bot-2") is True
+
+def test_renew_extends_lease(store):
+    store.push(tweet("the only tweet in the queue right now"))
+    item_id, _ = store.claim("bot-1", lease_seconds=5)
+    expire_lease(store, item_id)
+
+    # Nobody took it in the meantime, so the holder can still renew
+    assert store.renew(item_id, "bot-1", lease_seconds=60) is True
+    assert store.claim("bot-2") is None
+
+def test_ack_of_unclaimed_item_does_nothing(store):
+    item_id = store.push(tweet("the only tweet in the queue right now"))
+
+    assert store.ack(item_id, "bot-1") is False
+    assert store.size() == 1
+
+def bounded_store(tmp_path, policy, max_depth=3, ttl=0, personality_ttls=None):
+    return QueueStore(db_path=str(tmp_path / "bounded.db"), legacy_file=str(tmp_path / "missing.json"),
+                      max_depth=max_depth, ttl=ttl, personality_ttls=personality_ttls or {},
+                      eviction_policy=policy)
+
+def push_in_order(store, tweets):
+    """Push (text, personality, score) tweets one second apart, oldest first"""
+    for offset, (text, personality, score) in enumerate(tweets):
+        store.push({"text": text, "personality": personality, "score": score, "enqueued_at": 1000.0 + offset},
+                   near_duplicate_threshold=None)
+
+def queued_texts(store):
+    return sorted(t["text"] for _, t in store.items())
+
+def test_evict_oldest(tmp_path):
+    store = bounded_store(tmp_path, "oldest")
+    push_in_order(store, [("first", "A", 5), ("second", "A", 1), ("third", "A", 9), ("fourth", "A", 3)])
+
+    assert queued_texts(store) == ["fourth", "second", "third"]
+    store.close()
+
+def test_evict_lowest_score(tmp_path):
+    store = bounded_store(tmp_path, "lowest_score")
+    # On equal scores the newer tweet goes, since it would be posted later
+    push_in_order(store, [("first", "A", 5), ("second", "A", 1), ("third", "A", 9),
+                          ("fourth", "A", 3), ("fifth", "A", 3)])
+
+    assert queued_texts(store) == ["first", "fourth", "third"]
+    store.close()
+
+def test_evict_over_represented(tmp_path):
+    store = bounded_store(tmp_path, "over_represented", max_depth=4)
+    push_in_order(store, [("a1", "A", 9), ("a2", "A", 8), ("a3", "A", 7), ("b1", "B", 1), ("c1", "C", 2)])
+
+    # A has the most tweets, so its lowest-scoring one goes even though B and C score lower
+    assert queued_texts(store) == ["a1", "a2", "b1", "c1"]
+    store.close()
+
+def test_claimed_tweets_are_never_evicted(tmp_path):
+    store = bounded_store(tmp_path, "lowest_score", max_depth=2)
+    push_in_order(store, [("low", "A", 1), ("high", "A", 5)])
+    high_id, _ = store.claim("bot-1")
+    store.claim("bot-1")
+    store.release(high_id, "bot-1")
+
+    push_in_order(store, [("highest", "A", 9)])
+    assert queued_texts(store) == ["highest", "low"]
+    store.close()
+
+def test_per_personality_ttl(tmp_path):
+    now = time.time()
+    store = bounded_store(tmp_path, "oldest", max_depth=0, ttl=3600, personality_ttls={"FAST": 60})
+    for text, personality, age in [("fast old", "FAST", 120), ("fast new", "FAST", 10),
+                                   ("slow old", "SLOW", 1800), ("slow expired", "SLOW", 7200),
+                                   ("unknown expired", None, 7200)]:
+        store.push({"text": text, "personality": personality, "score": 5, "enqueued_at": now - age},
+                   near_duplicate_threshold=None)
+
+    store.expire()
+    assert queued_texts(store) == ["fast new", "slow old"]
+    store.close()
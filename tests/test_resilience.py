@@ -0,0 +1,149 @@
+import pytest
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, ResilientCaller, TokenBucket, TransientError
+
+class FakeClock:
+    """Stands in for the time module: sleeping just moves the clock forward"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class RateLimited(TransientError):
+    http_status = 429
+
+    def __init__(self, retry_after=None):
+        super().__init__("Rate limit reached")
+        self.headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+
+class FakeEndpoint:
+    """Callable that raises the queued errors in order, then returns "ok" """
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience, "time", clock)
+    monkeypatch.setattr(resilience.random, "uniform", lambda low, high: high)
+    return clock
+
+def caller(max_retries=3, breaker=None, rate=100.0, burst=100):
+    return ResilientCaller(TransientError, max_retries, rate, burst, breaker=breaker or CircuitBreaker(5, 120),
+                           base_delay=1.0, max_delay=60.0)
+
+def test_retries_429_honoring_retry_after(clock):
+    endpoint = FakeEndpoint(RateLimited(retry_after=7))
+    calls = caller()
+
+    assert calls.call(endpoint) == "ok"
+    assert endpoint.calls == 2
+    # Retry-After plus at most base_delay of jitter
+    assert clock.sleeps == [8.0]
+    stats = calls.stats.snapshot()
+    assert stats["retries"] == 1 and stats["rate_limited"] == 1 and stats["successes"] == 1
+
+def test_backoff_is_exponential_and_capped(clock):
+    endpoint = FakeEndpoint(*[TransientError("timeout") for _ in range(8)])
+    calls = ResilientCaller(TransientError, 8, 100.0, 100, breaker=CircuitBreaker(100, 120),
+                            base_delay=1.0, max_delay=10.0)
+
+    assert calls.call(endpoint) == "ok"
+    assert clock.sleeps == [1, 2, 4, 8, 10, 10, 10, 10]
+
+def test_gives_up_after_max_retries(clock):
+    endpoint = FakeEndpoint(*[TransientError("timeout") for _ in range(5)])
+    calls = caller(max_retries=2)
+
+    with pytest.raises(TransientError):
+        calls.call(endpoint)
+    assert endpoint.calls == 3
+    stats = calls.stats.snapshot()
+    assert stats == {"calls": 1, "attempts": 3, "successes": 0, "retries": 2, "failures": 1,
+                     "rate_limited": 0, "circuit_rejected": 0}
+
+def test_other_errors_fail_at_once_without_tripping_the_breaker(clock):
+    breaker = CircuitBreaker(1, 120)
+    endpoint = FakeEndpoint(ValueError("bad request"))
+    calls = caller(breaker=breaker)
+
+    with pytest.raises(ValueError):
+        calls.call(endpoint)
+    assert endpoint.calls == 1
+    assert breaker.state == "closed"
+
+def test_breaker_opens_after_threshold_and_fails_fast(clock):
+    breaker = CircuitBreaker(3, 120)
+    endpoint = FakeEndpoint(*[TransientError("down") for _ in range(10)])
+    calls = caller(max_retries=5, breaker=breaker)
+
+    with pytest.raises(CircuitOpenError):
+        calls.call(endpoint)
+    assert endpoint.calls == 3
+    assert breaker.state == "open"
+
+    # Further calls are rejected without reaching the endpoint
+    with pytest.raises(CircuitOpenError):
+        calls.call(endpoint)
+    assert endpoint.calls == 3
+    assert calls.stats.snapshot()["circuit_rejected"] == 2
+
+def test_half_open_probe_success_closes(clock):
+    breaker = CircuitBreaker(1, 120)
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now += 120
+    assert breaker.state == "half-open"
+    assert breaker.allow() is True
+    # Only one trial call at a time
+    assert breaker.allow() is False
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow() is True
+
+def test_half_open_probe_failure_reopens(clock):
+    breaker = CircuitBreaker(5, 120)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.now += 120
+
+    calls = caller(max_retries=0, breaker=breaker)
+    with pytest.raises(TransientError):
+        calls.call(FakeEndpoint(TransientError("still down")))
+    assert breaker.state == "open"
+    clock.now += 119
+    assert breaker.allow() is False
+    clock.now += 1
+    assert breaker.allow() is True
+
+def test_token_bucket_limits_rate(clock):
+    bucket = TokenBucket(rate=2.0, capacity=2)
+    for _ in range(4):
+        bucket.acquire()
+
+    # Two from the burst, then one every half second
+    assert clock.sleeps == [0.5, 0.5]
+
+def test_summary_reports_counts(clock):
+    calls = caller(max_retries=0)
+    calls.call(FakeEndpoint())
+    with pytest.raises(TransientError):
+        calls.call(FakeEndpoint(RateLimited()))
+
+    assert calls.stats.summary() == ("2 calls, 0 retries (1 rate limited), 1 failed (50%), "
+                                     "0 rejected by the circuit breaker")
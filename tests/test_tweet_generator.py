@@ -0,0 +1,114 @@
+import openai
+import pytest
+import tweet_generator
+from tweet_generator import CompletionLengths, _stream_completions
+
+MESSAGES = [{"role": "user", "content": "Write a tweet"}]
+
+def chunk(index, content=None, finish_reason=None):
+    delta = {"content": content} if content is not None else {}
+    return openai.util.convert_to_openai_object(
+        {"choices": [{"index": index, "delta": delta, "finish_reason": finish_reason}]})
+
+class FakeHTTPResponse:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+class FakeStream:
+    """Streamed completion: yields the chunks and counts how many were read"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.read = 0
+        self.closed = False
+
+    def __iter__(self):
+        for item in self.chunks:
+            if self.closed:
+                return
+            self.read += 1
+            yield item
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def lengths(monkeypatch):
+    lengths = CompletionLengths()
+    monkeypatch.setattr(tweet_generator, "completion_lengths", lengths)
+    return lengths
+
+@pytest.fixture
+def stream(monkeypatch):
+    """Serve chunks from fake_stream.chunks; the request's kwargs end up in fake_stream.request"""
+    fake_stream = FakeStream([])
+    fake_stream.http = FakeHTTPResponse()
+
+    def create(**kwargs):
+        fake_stream.request = kwargs
+        # What the session's response hook does for the real request
+        tweet_generator._remember_stream(fake_stream.http, stream=True)
+        return fake_stream
+
+    monkeypatch.setattr(tweet_generator.openai.ChatCompletion, "create", create)
+    return fake_stream
+
+def test_aborts_once_every_completion_is_done(stream, lengths):
+    stream.chunks = [
+        chunk(0, "Hello"), chunk(1, "Bad #"),
+        chunk(0, " world"), chunk(0, finish_reason="stop"),
+        chunk(1, " still streaming"), chunk(1, " more"),
+    ]
+
+    texts, usage = _stream_completions(MESSAGES, 2, 10)
+
+    assert texts == ["Hello world"]
+    # Completion 1 broke a rule and completion 0 finished: the rest is never read
+    assert stream.read == 4
+    assert stream.closed and stream.http.closed
+    assert usage["completion_tokens"] == 3 and usage["estimated"]
+
+def test_drops_truncated_completions(stream, lengths):
+    stream.chunks = [
+        chunk(0, "Finished"), chunk(1, "Cut off mid"),
+        chunk(0, finish_reason="stop"), chunk(1, finish_reason="length"),
+    ]
+
+    texts, _ = _stream_completions(MESSAGES, 2, 10)
+
+    assert texts == ["Finished"]
+    # Only the finished completion counts towards the length statistics
+    assert list(lengths.samples) == [1]
+    assert stream.http.closed
+
+def test_http_response_closed_on_error(stream, lengths):
+    def broken():
+        yield chunk(0, "Hello")
+        raise openai.error.APIConnectionError("connection reset")
+
+    stream.chunks = broken()
+    with pytest.raises(openai.error.APIConnectionError):
+        _stream_completions(MESSAGES, 1, 10)
+    assert stream.http.closed
+
+def test_max_tokens_from_length_percentile(stream, lengths):
+    _stream_completions(MESSAGES, 1, 10)
+    assert stream.request["max_tokens"] == tweet_generator.DEFAULT_MAX_TOKENS
+
+    for tokens in range(41, 61):
+        lengths.observe(tokens)
+    _stream_completions(MESSAGES, 1, 10)
+    # 98th percentile of 41..60 is 59, plus 25% headroom
+    assert stream.request["max_tokens"] == 74
+
+def test_max_tokens_bounds(lengths):
+    for _ in range(50):
+        lengths.observe(5)
+    assert lengths.max_tokens() == tweet_generator.MIN_MAX_TOKENS
+
+    for _ in range(200):
+        lengths.observe(500)
+    assert lengths.max_tokens() == tweet_generator.MAX_MAX_TOKENS
@@ -0,0 +1,37 @@
+import threading
+import tweet_hashset
+from tweet_hashset import TweetHashSet, text_hash
+
+def test_membership_across_merges(monkeypatch):
+    monkeypatch.setattr(tweet_hashset, "MERGE_THRESHOLD", 8)
+    hashes = TweetHashSet([text_hash("an old tweet")])
+
+    assert hashes.add("a  new   tweet") is True
+    assert hashes.add("a new tweet") is False  # Same text once whitespace is normalized
+    hashes.update_hashes(range(100))
+
+    assert len(hashes) == 102
+    assert "an old tweet" in hashes and "a new tweet" in hashes
+    assert all(hashes.contains_hash(h) for h in range(100))
+    assert not hashes.contains_hash(100) and "never added" not in hashes
+
+def test_lookups_never_miss_during_concurrent_merges(monkeypatch):
+    monkeypatch.setattr(tweet_hashset, "MERGE_THRESHOLD", 16)
+    hashes = TweetHashSet(range(0, 2000, 2))
+    misses = []
+    done = threading.Event()
+
+    def check():
+        while not done.is_set():
+            misses.extend(h for h in range(0, 2000, 2) if not hashes.contains_hash(h))
+
+    readers = [threading.Thread(target=check) for _ in range(2)]
+    for reader in readers:
+        reader.start()
+    hashes.update_hashes(range(1, 6000, 2))
+    done.set()
+    for reader in readers:
+        reader.join()
+
+    assert misses == []
+    assert len(hashes) == 1000 + 3000
@@ -0,0 +1,117 @@
+import json
+import os
+import pytest
+from tweet_history import TweetHistory, TweetedFileTail
+
+def record(text, personality="TEST", timestamp="2025-01-01 12:00:00"):
+    return f"[{timestamp}] - {personality}\n{text}\n{'-' * 50}\n\n"
+
+def append(path, *texts):
+    with open(path, "a", encoding="utf-8") as f:
+        for text in texts:
+            f.write(record(text))
+
+@pytest.fixture
+def tweeted_file(tmp_path):
+    return str(tmp_path / "Tweeted_tweets.txt")
+
+def open_history(tmp_path, tweeted_file):
+    return TweetHistory(db_path=str(tmp_path / "history.db"), tweeted_file=tweeted_file)
+
+def texts(records):
+    return [text for _, _, text in records]
+
+def test_tail_reads_only_appended_records(tweeted_file):
+    append(tweeted_file, "hello one", "hello two")
+    tail = TweetedFileTail(tweeted_file)
+
+    assert texts(tail.read_new()) == ["hello one", "hello two"]
+    assert tail.read_new() == []
+    append(tweeted_file, "hello three")
+    assert texts(tail.read_new()) == ["hello three"]
+
+def test_tail_waits_for_complete_records(tweeted_file):
+    with open(tweeted_file, "w", encoding="utf-8") as f:
+        f.write("[2025-01-01 12:00:00] - TEST\nhalf written")
+    tail = TweetedFileTail(tweeted_file)
+
+    assert tail.read_new() == []
+    with open(tweeted_file, "a", encoding="utf-8") as f:
+        f.write(" record\n" + "-" * 50 + "\n")
+    assert texts(tail.read_new()) == ["half written record"]
+
+def test_tail_rescans_after_same_size_edit(tweeted_file):
+    append(tweeted_file, "hello one", "hello two")
+    tail = TweetedFileTail(tweeted_file)
+    tail.read_new()
+
+    with open(tweeted_file, "r", encoding="utf-8") as f:
+        content = f.read()
+    with open(tweeted_file, "w", encoding="utf-8") as f:
+        f.write(content.replace("hello one", "HELLO ONE"))
+    stat = os.stat(tweeted_file)
+    os.utime(tweeted_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    assert texts(tail.read_new()) == ["HELLO ONE", "hello two"]
+
+def test_tail_rescans_after_head_edit_with_append(tweeted_file):
+    append(tweeted_file, "hello one")
+    tail = TweetedFileTail(tweeted_file)
+    tail.read_new()
+
+    with open(tweeted_file, "r+", encoding="utf-8") as f:
+        f.seek(1)
+        f.write("2024")
+    append(tweeted_file, "hello two")
+
+    assert texts(tail.read_new()) == ["hello one", "hello two"]
+
+def test_tail_rescans_after_shrink(tweeted_file):
+    append(tweeted_file, "hello one", "hello two")
+    tail = TweetedFileTail(tweeted_file)
+    tail.read_new()
+
+    with open(tweeted_file, "w", encoding="utf-8") as f:
+        f.write(record("only one now"))
+    assert texts(tail.read_new()) == ["only one now"]
+
+def test_history_records_appended_posts(tmp_path, tweeted_file):
+    append(tweeted_file, "posted before the history existed")
+    history = open_history(tmp_path, tweeted_file)
+    posted = history.posted_hashset()
+    assert "posted before the history existed" in posted
+
+    # Another bot (or a person) appends to the text file
+    append(tweeted_file, "posted by another process")
+    assert "posted by another process" in history.posted_hashset()
+    assert history.was_tweeted("posted by another process")
+    history.close()
+
+def test_history_resumes_from_saved_position(tmp_path, tweeted_file):
+    append(tweeted_file, "first post")
+    open_history(tmp_path, tweeted_file).close()
+    saved_offset = os.path.getsize(tweeted_file) - 2  # The trailing blank line isn't consumed yet
+
+    append(tweeted_file, "posted while the bot was down")
+    tail = TweetedFileTail(tweeted_file)
+    history = open_history(tmp_path, tweeted_file)
+    tail.restore(json.loads(history._get_meta("tweeted_file_tail")))
+    assert tail.offset > saved_offset
+    assert history.was_tweeted("posted while the bot was down")
+    assert len(history) == 2
+    history.close()
+
+def test_unsignable_rows_are_indexed_once(tmp_path, tweeted_file):
+    history = open_history(tmp_path, tweeted_file)
+    history.record("!!! ...", "TEST")
+    history.record("an ordinary tweet about the weather", "TEST")
+
+    # Rows with nothing to sign are marked, not retried on every open
+    assert history.index_missing_signatures() == 0
+    history.close()
+    history = open_history(tmp_path, tweeted_file)
+    assert history.index_missing_signatures() == 0
+    assert history.was_tweeted("!!! ...")
+    assert history.find_similar("!!! ...") is None
+    assert history.find_similar("an ordinary tweet about the weather")[1] == 1.0
+    history.close()
@@ -0,0 +1,83 @@
+import pytest
+from queue_store import QueueStore
+from tweet_queue import TweetQueue
+
+@pytest.fixture
+def store(tmp_path):
+    store = QueueStore(db_path=str(tmp_path / "queue.db"), legacy_file=str(tmp_path / "missing.json"),
+                       max_depth=3, ttl=0, personality_ttls={}, eviction_policy="lowest_score")
+    yield store
+    store.close()
+
+@pytest.fixture
+def queue(store):
+    queue = TweetQueue(store, flush_interval=3600)
+    yield queue
+    queue.close()
+
+def tweet(text, score=10):
+    return {"text": text, "personality": "TEST", "score": score}
+
+TEXT = "my cat just knocked the entire bookshelf over and looked proud about it honestly"
+
+def test_push_reports_only_confirmed_adds(queue):
+    assert queue.push(tweet(TEXT)) is not None
+    assert queue.push(tweet(TEXT)) is None
+    assert queue.size() == 1
+
+def test_push_rejects_near_duplicates_of_queued_tweets(queue):
+    queue.push(tweet(TEXT))
+
+    assert queue.push(tweet(TEXT + "!")) is None
+    assert queue.size() == 1
+
+def test_push_many_returns_one_result_per_tweet(queue):
+    added = queue.push_many([tweet(TEXT), tweet(TEXT), tweet("a completely different tweet about the tour dates")])
+
+    assert added[0] is not None and added[1] is None and added[2] is not None
+    assert queue.size() == 2
+
+def test_evicted_push_is_not_counted(queue):
+    queue.push_many([tweet("first tweet about sourdough starters", 10),
+                     tweet("second tweet about marathon training", 11),
+                     tweet("third tweet about houseplants dying", 12)])
+
+    # The queue is full, and the new tweet is the lowest-scoring one
+    assert queue.push(tweet("fourth tweet about parking tickets", 1)) is None
+    assert queue.size() == 3
+
+def test_size_counts_buffered_removals_but_not_more(queue, store):
+    ids = queue.push_many([tweet("first tweet about sourdough starters"),
+                           tweet("second tweet about marathon training")])
+    queue.remove([ids[0]])
+
+    assert queue.size() == 1
+    assert store.size() == 2
+    queue.flush()
+    assert store.size() == 1
+
+def test_external_changes_are_picked_up(queue, store):
+    store.push(tweet("a tweet added by queue_manager.py in another process"))
+
+    assert queue.size() == 1
+
+def test_generation_only_changes_with_rows(store):
+    generation = store.generation()
+    assert store.claim("bot-1") is None
+    store.expire()
+    assert store.release(12345, "bot-1") is False
+    assert store.generation() == generation
+
+    store.push(tweet(TEXT))
+    assert store.generation() == generation + 1
+
+def test_own_claims_do_not_trigger_reloads(queue, store, monkeypatch):
+    queue.push(tweet(TEXT))
+    item_id, _ = queue.claim("bot-1")
+    queue.renew(item_id, "bot-1")
+
+    counts = []
+    monkeypatch.setattr(store, "size", lambda: counts.append(1) or 1)
+    assert queue.size() == 1
+    assert queue.size() == 1
+    assert counts == []
@@ -0,0 +1,115 @@
+import os
+import pytest
+from quality_model import iter_archive
+from tweet_scorer import BASELINE_RULES, ScoreCache, Scorer, extract_features, load_scorers
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def original_score(text):
+    """score_tweet's scoring as it was before the rules moved to scoring.json"""
+    score = 0
+    length = len(text)
+    if 100 <= length <= 240:
+        score += 10
+    elif length < 100:
+        score += length / 10
+    else:
+        score += (280 - length) / 4
+    hashtag_count = text.count('#')
+    if hashtag_count > 0:
+        score += -(hashtag_count * 10)
+    emoji_count = sum(1 for char in text if ord(char) > 127000)
+    if 1 <= emoji_count <= 4:
+        score += 5
+    elif emoji_count > 4:
+        score += -((emoji_count - 4) * 2)
+    caps_words = sum(1 for word in text.split() if word.isupper() and len(word) > 1)
+    if 1 <= caps_words <= 3:
+        score += 5
+    irony_score = 0
+    if "..." in text or "…" in text:
+        irony_score += 3
+    if "!" in text and "?" in text:
+        irony_score += 3
+    score += irony_score
+    return score
+
+EDGE_CASES = [
+    "",
+    "a" * 99, "a" * 100, "a" * 240, "a" * 241, "a" * 300,
+    "#one #two #three",
+    "\U0001F600", "\U0001F600" * 4, "\U0001F600" * 9, "❤️ not above the emoji cutoff",
+    "ONE TWO THREE", "ONE TWO THREE FOUR", "I A",
+    "wait... what", "wait…", "really?!", "really?", "really!",
+]
+
+def archive_texts():
+    return [text for _, _, text in iter_archive(os.path.join(ROOT, "All_generated_tweets.txt"))]
+
+@pytest.mark.parametrize("scorer", [
+    Scorer("baseline", BASELINE_RULES),
+    load_scorers(os.path.join(ROOT, "scoring.json"), "baseline")[0],
+], ids=["builtin", "scoring.json"])
+def test_baseline_matches_original_scorer(scorer):
+    for text in archive_texts() + EDGE_CASES:
+        assert scorer.score(extract_features(text)) == original_score(text), text
+
+def test_components_add_up_to_score():
+    scorer = Scorer("baseline", BASELINE_RULES)
+    for text in archive_texts()[:50] + EDGE_CASES:
+        features = extract_features(text)
+        assert sum(scorer.components(features)) == pytest.approx(scorer.score(features))
+        assert list(scorer.breakdown(features)) == list(BASELINE_RULES)
+
+def test_bands_match_first_in_order():
+    scorer = Scorer("bands", {"hashtags": [{"min": 1, "max": 2, "score": 1}, {"min": 1, "per": 10}]})
+
+    assert scorer.score(extract_features("no tags")) == 0
+    assert scorer.score(extract_features("#a #b")) == 1
+    assert scorer.score(extract_features("#a #b #c")) == 30
+
+def test_quality_without_a_model_is_neutral():
+    scorer = Scorer("quality", {"quality": [{"from": 0.5, "per": 10}]})
+
+    assert scorer.score(extract_features("any text at all")) == 0
+    assert scorer.score(extract_features("any text at all", quality=0.9)) == pytest.approx(4)
+
+@pytest.mark.parametrize("rules", [
+    {"unknown_feature": [{"score": 1}]},
+    {"length": [{"min": 1, "bonus": 3}]},
+    {"length": [{"min": 1}]},
+    {"length": [{"score": 1, "per": 2}]},
+    {"length": [{"divide_by": 0}]},
+    {"length": [{"min": True, "score": 1}]},
+    {"length": [{"min": "0 or __import__('os')", "score": 1}]},
+    {"length": [{"score": "1; import os"}]},
+])
+def test_invalid_rules_are_rejected(rules):
+    with pytest.raises(ValueError):
+        Scorer("invalid", rules)
+
+def test_invalid_config_falls_back_to_baseline(tmp_path):
+    path = tmp_path / "scoring.json"
+    path.write_text('{"active": "bad", "variants": {"bad": {"length": [{"score": "x"}]}}}', encoding="utf-8")
+
+    active, scorers = load_scorers(str(path), None)
+    assert active.name == "baseline" and list(scorers) == ["baseline"]
+    assert active.version == Scorer("baseline", BASELINE_RULES).version
+
+def test_version_changes_with_rules():
+    assert Scorer("a", {"length": [{"score": 1}]}).version != Scorer("a", {"length": [{"score": 2}]}).version
+
+def test_score_cache_is_lru():
+    cache = ScoreCache(max_entries=2)
+    cache.put_many([(("v", "a"), 1), (("v", "b"), 2)])
+    cache.get_many([("v", "a")])
+    cache.put_many([(("v", "c"), 3)])
+
+    assert cache.get_many([("v", "a"), ("v", "b"), ("v", "c")]) == [1, None, 3]
+
+def test_disabled_score_cache_keeps_nothing():
+    cache = ScoreCache(max_entries=0)
+    cache.put_many([(("v", "a"), 1)])
+
+    assert cache.get_many([("v", "a")]) == [None]
+    assert cache.stats() == (0, 0, 0)
@@ -0,0 +1,97 @@
+import pytest
+import tweet_selector
+from tweet_selector import select_top_tweets, select_best_tweet, generate_speculatively
+
+def tweet(text, score):
+    return {"text": text, "personality": "TEST", "score": score}
+
+@pytest.fixture
+def similarity_to_existing(monkeypatch):
+    """Stub the posted/queued similarity lookup with a {text: similarity} map"""
+    similarities = {}
+    monkeypatch.setattr(tweet_selector, "_existing_similarity",
+                        lambda tweets, signatures, queue=None: [similarities.get(t["text"], 0.0) for t in tweets])
+    return similarities
+
+def test_top_k_is_highest_scores_with_ties_in_batch_order():
+    tweets = [tweet("first", 5), tweet("second", 9), tweet("third", 9), tweet("fourth", 7)]
+
+    assert [t["text"] for t in select_top_tweets(tweets, 3)] == ["second", "third", "fourth"]
+    assert select_best_tweet(tweets)["text"] == "second"
+
+def test_empty_batch_and_non_positive_k():
+    assert select_top_tweets([], 3) == []
+    assert select_top_tweets([tweet("only", 5)], 0) == []
+    assert select_best_tweet([]) is None
+
+def test_diversity_marks_down_tweets_similar_to_existing(similarity_to_existing):
+    tweets = [tweet("clone of a posted tweet about the album", 12.0),
+              tweet("something entirely different about the weather", 11.0)]
+    similarity_to_existing[tweets[0]["text"]] = 0.9
+
+    assert select_best_tweet(tweets, diversity=0.3)["text"] == tweets[1]["text"]
+    assert select_best_tweet(tweets, diversity=0.0)["text"] == tweets[0]["text"]
+
+def test_diversity_never_picks_a_tweet_below_min_score(similarity_to_existing):
+    # Under the near-duplicate threshold, so the 12.0 tweet is still postable
+    good = tweet("a strong tweet that shares some words with a posted one", 12.0)
+    weak = tweet("a weak tweet about nothing in particular at all", 8.8)
+    similarity_to_existing[good["text"]] = 0.67
+
+    # Without the threshold, MMR prefers the sub-threshold tweet...
+    assert select_best_tweet([good, weak], diversity=0.3)["text"] == weak["text"]
+    # ... with it, only tweets that would be queued compete
+    assert select_best_tweet([good, weak], diversity=0.3, min_score=9.0)["text"] == good["text"]
+
+def test_min_score_falls_back_to_top_score_when_none_pass(similarity_to_existing):
+    tweets = [tweet("a mediocre tweet about breakfast plans", 7.0),
+              tweet("a slightly better tweet about the tour", 8.0)]
+    similarity_to_existing[tweets[1]["text"]] = 0.9
+
+    assert select_best_tweet(tweets, diversity=0.3, min_score=9.0)["text"] == tweets[1]["text"]
+
+def test_diverse_top_k_only_returns_passing_tweets(similarity_to_existing):
+    tweets = [tweet("one good tweet about the new album release", 10.0),
+              tweet("another good tweet about stadium ticket prices", 9.5),
+              tweet("a poor tweet about a random sandwich", 3.0)]
+
+    picked = select_top_tweets(tweets, 3, diversity=0.3, min_score=9.0)
+    assert [t["score"] for t in picked] == [10.0, 9.5]
+
+@pytest.fixture
+def fake_generation(monkeypatch):
+    """Stub generation and scoring; returns the list of (personality, n) requests made"""
+    requests = []
+
+    def generate_tweets(personality, n, request_timeout):
+        requests.append((personality, n))
+        return [f"{personality} tweet {len(requests)}-{i}" for i in range(n)]
+
+    def generate_trending_tweets(n, request_timeout):
+        requests.append(("TRENDING", n))
+        return [f"trending tweet {i}" for i in range(n)]
+
+    monkeypatch.setattr(tweet_selector, "generate_tweets", generate_tweets)
+    monkeypatch.setattr(tweet_selector, "generate_trending_tweets", generate_trending_tweets)
+    monkeypatch.setattr(tweet_selector, "score_tweets", lambda tweets: [dict(t, score=5) for t in tweets])
+    monkeypatch.setattr(tweet_selector, "is_posted", lambda text: False)
+    return requests
+
+def hedges(requests, count):
+    """Tweets asked for beyond the batch itself (the trending tweet aside)"""
+    return sum(n for personality, n in requests if personality != "TRENDING") - count
+
+@pytest.mark.parametrize("count, hedge_requests", [(5, 2), (3, 10), (1, 4), (4, 0)])
+def test_hedge_requests_never_exceed_cap(fake_generation, count, hedge_requests):
+    # No tweet clears min_score, so every request runs to completion
+    tweets = generate_speculatively(count=count, min_score=100, hedge_requests=hedge_requests, concurrency=3)
+
+    assert hedges(fake_generation, count) == min(hedge_requests, count)
+    assert len(tweets) == count + min(hedge_requests, count) + 1
+
+def test_speculative_generation_returns_once_target_met(fake_generation):
+    tweets = generate_speculatively(count=5, min_score=5, target=1, hedge_requests=2, concurrency=1)
+
+    # One worker: the first request to finish already clears the bar
+    assert tweets and all(t["score"] >= 5 for t in tweets)
+    assert len(fake_generation) < 5
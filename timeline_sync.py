@@ -0,0 +1,114 @@
+import json
+import os
+import threading
+
+# File used to persist the synced timeline between restarts
+TIMELINE_CACHE_FILE = "timeline_cache.json"
+# Tweets requested per page (the API allows 5-100)
+TIMELINE_PAGE_SIZE = 100
+# Maximum pages fetched in one sync (bounds the cold-start fetch)
+TIMELINE_MAX_PAGES = 5
+# Maximum number of synced tweets kept on disk (newest are kept)
+TIMELINE_MAX_TWEETS = 3200
+
+_shared_sync = None
+_shared_sync_lock = threading.Lock()
+
+class TimelineSync:
+    """
+    Incremental sync of the authenticated account's own timeline.
+    The user id is cached and each refresh only asks for tweets newer than
+    the last seen id (since_id), so a refresh is usually a single cheap call.
+    Synced ids and texts are persisted so a restart doesn't re-fetch.
+    """
+
+    def __init__(self, cache_file=TIMELINE_CACHE_FILE):
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self.user_id = None
+        self.since_id = None
+        self.tweets = {}  # tweet id (str) -> text
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.user_id = state.get("user_id")
+            self.since_id = state.get("since_id")
+            self.tweets = state.get("tweets", {})
+        except Exception as e:
+            print(f"Error loading timeline cache: {e}")
+
+    def _save(self):
+        state = {
+            "user_id": self.user_id,
+            "since_id": self.since_id,
+            "tweets": self.tweets
+        }
+        # Write to a temporary file and rename so a crash never leaves a half-written cache
+        tmp_file = f"{self.cache_file}.tmp"
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            print(f"Error saving timeline cache: {e}")
+
+    def get_user_id(self, api_client):
+        """Return the authenticated user's id, calling get_me() only once ever"""
+        if self.user_id is None:
+            user_data = api_client.get_me()
+            self.user_id = str(user_data.data.id)
+            self._save()
+        return self.user_id
+
+    def sync(self, api_client):
+        """Fetch tweets posted since the last sync and return their texts"""
+        with self._lock:
+            user_id = self.get_user_id(api_client)
+            new_tweets = {}
+            pagination_token = None
+
+            for _ in range(TIMELINE_MAX_PAGES):
+                params = {
+                    "id": user_id,
+                    "max_results": TIMELINE_PAGE_SIZE,
+                    "tweet_fields": ['text']
+                }
+                if self.since_id:
+                    params["since_id"] = self.since_id
+                if pagination_token:
+                    params["pagination_token"] = pagination_token
+
+                response = api_client.get_users_tweets(**params)
+                for tweet in response.data or []:
+                    new_tweets[str(tweet.id)] = tweet.text
+
+                pagination_token = (response.meta or {}).get("next_token")
+                if not pagination_token:
+                    break
+
+            if new_tweets:
+                self.tweets.update(new_tweets)
+                self.since_id = max(self.tweets, key=int)
+                # Keep only the newest tweets on disk
+                if len(self.tweets) > TIMELINE_MAX_TWEETS:
+                    newest = sorted(self.tweets, key=int)[-TIMELINE_MAX_TWEETS:]
+                    self.tweets = {tweet_id: self.tweets[tweet_id] for tweet_id in newest}
+                self._save()
+            return list(new_tweets.values())
+
+    def texts(self):
+        """Return the texts of all synced tweets"""
+        return list(self.tweets.values())
+
+def get_timeline_sync():
+    """Return the process-wide timeline sync, loading the persisted state on first use"""
+    global _shared_sync
+    with _shared_sync_lock:
+        if _shared_sync is None:
+            _shared_sync = TimelineSync()
+        return _shared_sync
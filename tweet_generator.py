@@ -1,8 +1,111 @@
+import math
+import threading
+import time
+from collections import deque
 import openai
-from config import OPENAI_API_KEY, SYSTEM_PROMPTS
+import requests
+from config import (
+    OPENAI_API_KEY,
+    SYSTEM_PROMPTS,
+    OPENAI_REQUEST_TIMEOUT,
+    STREAM_GENERATION,
+    OPENAI_REQUESTS_PER_MINUTE,
+    OPENAI_MAX_RETRIES,
+    GENERATION_CONCURRENCY,
+    COMPLETION_CACHE_MODE,
+    GENERATOR_BACKEND
+)
+from resilience import ResilientCaller, TransientError, CircuitOpenError
+from completion_cache import get_completion_cache
+from generation_metrics import get_generation_metrics, estimate_tokens
 
 openai.api_key = OPENAI_API_KEY
 
+# openai 0.28 wraps a streamed HTTP response in generators: closing them does
+# not close the connection, which keeps streaming (and billing) until garbage
+# collection. Its sessions are built here so each thread remembers the last
+# streamed response, and an aborted stream can close it.
+_streams = threading.local()
+
+def _remember_stream(response, *args, **kwargs):
+    if kwargs.get("stream"):
+        _streams.response = response
+    return response
+
+def _make_openai_session():
+    session = requests.Session()
+    session.mount("https://", requests.adapters.HTTPAdapter(max_retries=openai.api_requestor.MAX_CONNECTION_RETRIES))
+    session.hooks["response"].append(_remember_stream)
+    return session
+
+openai.requestssession = _make_openai_session
+
+MODEL = "gpt-3.5-turbo"
+TEMPERATURE = 0.9  # Slightly higher temperature for more creative outputs
+# How completions use the on-disk cache: record, replay or off
+CACHE_MODES = ("record", "replay", "off")
+cache_mode = COMPLETION_CACHE_MODE if COMPLETION_CACHE_MODE in CACHE_MODES else "record"
+
+# Hard rules: a candidate containing any of these characters or longer than
+# MAX_TWEET_LENGTH is unusable (the prompts forbid hashtags and quotes)
+FORBIDDEN_CHARACTERS = ('#', '"', '\u201c', '\u201d')
+MAX_TWEET_LENGTH = 280
+# max_tokens used until enough completion lengths have been observed
+DEFAULT_MAX_TOKENS = 100
+# Bounds for max_tokens sized from observed completion lengths
+MIN_MAX_TOKENS = 40
+MAX_MAX_TOKENS = 150
+# Completion lengths needed before max_tokens is sized from them
+MIN_LENGTH_SAMPLES = 20
+
+def breaks_tweet_rules(text):
+    """Check whether (partial) generated text already breaks a hard tweet rule"""
+    return len(text.strip()) > MAX_TWEET_LENGTH or any(char in text for char in FORBIDDEN_CHARACTERS)
+
+class CompletionLengths:
+    """
+    Recent completion lengths in tokens. max_tokens is sized a little above
+    the 98th percentile, so typical tweets are never cut off while runaway
+    completions stop early.
+    """
+
+    def __init__(self, size=200):
+        self._lock = threading.Lock()
+        self.samples = deque(maxlen=size)
+
+    def observe(self, tokens):
+        with self._lock:
+            self.samples.append(tokens)
+
+    def max_tokens(self):
+        with self._lock:
+            if len(self.samples) < MIN_LENGTH_SAMPLES:
+                return DEFAULT_MAX_TOKENS
+            ordered = sorted(self.samples)
+        percentile = ordered[int(0.98 * (len(ordered) - 1))]
+        return max(MIN_MAX_TOKENS, min(MAX_MAX_TOKENS, math.ceil(percentile * 1.25)))
+
+completion_lengths = CompletionLengths()
+
+# Transient OpenAI errors worth retrying
+RETRYABLE_ERRORS = (
+    openai.error.RateLimitError,
+    openai.error.Timeout,
+    openai.error.APIConnectionError,
+    openai.error.ServiceUnavailableError,
+    openai.error.APIError,
+    openai.error.TryAgain,
+    TransientError
+)
+
+# Every OpenAI request goes through this: rate limit, retries with backoff, circuit breaker
+openai_calls = ResilientCaller(
+    RETRYABLE_ERRORS,
+    max_retries=OPENAI_MAX_RETRIES,
+    rate_per_second=OPENAI_REQUESTS_PER_MINUTE / 60,
+    burst=max(1, GENERATION_CONCURRENCY)
+)
+
 def is_taylor_swift_personality(personality_type):
     """Check if the personality type is Taylor Swift related"""
     taylor_swift_types = [
@@ -16,46 +119,251 @@ def is_taylor_swift_personality(personality_type):
     ]
     return personality_type in taylor_swift_types
 
-def generate_tweet(personality_type="CONSPIRACY_THEORIST"):
-    """Generate a tweet using OpenAI's API with specified personality type"""
+def _personality_messages(personality_type):
+    """Build the chat messages for a tweet in the given personality"""
+    # Determine if this is a Taylor Swift personality or socio-political
+    is_taylor = is_taylor_swift_personality(personality_type)
+    
+    # Create the appropriate prompt based on personality type
+    if is_taylor:
+        user_prompt = "Generate a tweet as a cringey Taylor Swift fan who irrationally hates men (especially her exes) and makes easily disproven claims about her success or achievements. The tweet should be funny because of how delusional and over-the-top it is. Make it feel like it could go viral for being both hilarious and slightly rage-inducing to the average Twitter user. Keep it under 280 characters. DO NOT include any hashtags in your response. Please also don't include quotation marks in your response."
+    else:
+        user_prompt = "Generate a tweet with a ridiculous socio-political take that would be funny and easy to make fun of. The tweet should contain absurd claims, logical fallacies, or completely misunderstood facts. Make it feel like it could go viral for being both hilarious and slightly rage-inducing to the average Twitter user. Keep it under 280 characters. DO NOT include any hashtags in your response. Please also don't include quotation marks in your response."
+    
+    return [
+        {"role": "system", "content": SYSTEM_PROMPTS[personality_type]},
+        {"role": "user", "content": user_prompt}
+    ]
+
+TRENDING_MESSAGES = [
+    {"role": "system", "content": "You are a master of internet culture and Gen Z humor. You create tweets that perfectly balance irony, humor, and cultural references. Your tweets often go viral because they capture the zeitgeist while maintaining a layer of self-awareness."},
+    {"role": "user", "content": "Generate a tweet with a ridiculous hot take on a current trend, news event, or popular topic. Make it ironic, funny, and slightly provocative. The tweet should feel like it was written by someone who's extremely online and has absurd opinions. Keep it under 280 characters. DO NOT include any hashtags in your response. Please also don't include quotation marks in your response."}
+]
+
+def _completions(messages, n, request_timeout, stream=STREAM_GENERATION):
+    """
+    Ask for n completions of the same prompt in one request. Returns the
+    texts of those that finished (ones cut off by max_tokens are dropped) and
+    the token usage ({"prompt_tokens", "completion_tokens"}, with "estimated"
+    set when the API didn't report it)
+    """
+    if stream:
+        return _stream_completions(messages, n, request_timeout)
+    
+    # Enhanced prompt for more ironic and humorous content
+    response = openai.ChatCompletion.create(
+        model=MODEL,
+        messages=messages,
+        max_tokens=DEFAULT_MAX_TOKENS,
+        temperature=TEMPERATURE,
+        n=n,
+        request_timeout=request_timeout
+    )
+    texts = [choice.message.content.strip() for choice in response.choices
+             if choice.get("finish_reason") != "length"]
+    if len(texts) < n:
+        print(f"Dropped {n - len(texts)} of {n} generated tweets cut off at max_tokens")
+    usage = response.get("usage")
+    if not usage:
+        return texts, None
+    return texts, {"prompt_tokens": usage["prompt_tokens"], "completion_tokens": usage["completion_tokens"]}
+
+def _stream_completions(messages, n, request_timeout):
+    """
+    Stream n completions token by token, dropping each one as soon as it
+    breaks a hard tweet rule. The HTTP stream is closed once every completion has
+    finished or been dropped, so rejected candidates don't cost the full
+    response. Completions that didn't finish on their own (cut off by
+    max_tokens, or the stream ended) are dropped too, and left out of the
+    length statistics. Returns the texts of the completions that were kept, and the
+    token usage: streams don't report it, so completion tokens are counted
+    from the deltas received (dropped completions included) and prompt tokens
+    are estimated.
+    """
+    _streams.response = None
+    response = openai.ChatCompletion.create(
+        model=MODEL,
+        messages=messages,
+        max_tokens=completion_lengths.max_tokens(),
+        temperature=TEMPERATURE,
+        n=n,
+        stream=True,
+        request_timeout=request_timeout
+    )
+    http_response, _streams.response = _streams.response, None
+    
+    texts = [""] * n
+    tokens = [0] * n
+    rejected = [False] * n
+    finish_reasons = [None] * n
+    try:
+        for chunk in response:
+            for choice in chunk.choices:
+                i = choice.index
+                if rejected[i]:
+                    continue
+                content = choice.delta.get("content")
+                if content:
+                    texts[i] += content
+                    tokens[i] += 1  # Each streamed delta carries one token
+                    rejected[i] = breaks_tweet_rules(texts[i])
+                if choice.get("finish_reason"):
+                    finish_reasons[i] = choice["finish_reason"]
+            if all(r or f for r, f in zip(rejected, finish_reasons)):
+                break
+    finally:
+        # Stop reading (and paying for) the rest of the stream
+        close = getattr(response, "close", None)
+        if close:
+            close()
+        if http_response is not None:
+            http_response.close()
+    
+    kept = []
+    cut_off = 0
+    for text, count, was_rejected, finish_reason in zip(texts, tokens, rejected, finish_reasons):
+        if was_rejected:
+            continue
+        if finish_reason != "stop":
+            # Cut off mid-tweet: unusable, and its length says nothing about finished tweets
+            cut_off += 1
+            continue
+        completion_lengths.observe(count)
+        kept.append(text.strip())
+    if len(kept) < n:
+        print(f"Dropped {n - len(kept)} of {n} generated tweets: {n - len(kept) - cut_off} broke tweet rules, "
+              f"{cut_off} were cut off before finishing")
+    prompt_tokens = sum(estimate_tokens(message["content"]) for message in messages)
+    return kept, {"prompt_tokens": prompt_tokens, "completion_tokens": sum(tokens), "estimated": True}
+
+class OpenAIBackend:
+    """Generates completions with the OpenAI chat API"""
+
+    name = "openai"
+    model = MODEL
+    calls = openai_calls
+
+    def complete(self, messages, n, request_timeout, stream):
+        return _completions(messages, n, request_timeout, stream)
+
+def _local_backend():
+    # Imported here: local_backend reads the archive and config on import, and only load tests need it
+    from local_backend import LocalBackend
+    return LocalBackend()
+
+# Generator backends by name. A backend has a name, a model (part of the
+# completion cache key), calls (a ResilientCaller) and
+# complete(messages, n, request_timeout, stream) returning a list of texts and
+# the token usage, or None if it can't tell
+BACKENDS = {
+    "openai": OpenAIBackend,
+    "local": _local_backend
+}
+_backend = None
+_backend_lock = threading.Lock()
+
+def set_backend(backend):
+    """Use a backend (a name from BACKENDS or a backend object) for all generation"""
+    global _backend
+    if isinstance(backend, str):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown generator backend '{backend}', expected one of {', '.join(BACKENDS)}")
+        backend = BACKENDS[backend]()
+    with _backend_lock:
+        _backend = backend
+
+def get_backend():
+    """Return the generator backend in use, creating the configured one on first use"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if GENERATOR_BACKEND not in BACKENDS:
+                print(f"Unknown GENERATOR_BACKEND '{GENERATOR_BACKEND}', using openai")
+            _backend = BACKENDS.get(GENERATOR_BACKEND, OpenAIBackend)()
+        return _backend
+
+def set_cache_mode(mode):
+    """Switch the completion cache mode (record, replay or off) for this process"""
+    global cache_mode
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Unknown cache mode '{mode}', expected one of {', '.join(CACHE_MODES)}")
+    cache_mode = mode
+
+def _record_request(backend, personality, messages, n, texts, usage, latency, ok=True):
+    """Record a request's tokens and latency, estimating the tokens if the backend didn't report them"""
+    if usage is None:
+        usage = {
+            "prompt_tokens": sum(estimate_tokens(message["content"]) for message in messages) if ok else 0,
+            "completion_tokens": sum(estimate_tokens(text) for text in texts),
+            "estimated": ok
+        }
     try:
-        # Determine if this is a Taylor Swift personality or socio-political
-        is_taylor = is_taylor_swift_personality(personality_type)
-        
-        # Create the appropriate prompt based on personality type
-        if is_taylor:
-            user_prompt = "Generate a tweet as a cringey Taylor Swift fan who irrationally hates men (especially her exes) and makes easily disproven claims about her success or achievements. The tweet should be funny because of how delusional and over-the-top it is. Make it feel like it could go viral for being both hilarious and slightly rage-inducing to the average Twitter user. Keep it under 280 characters. DO NOT include any hashtags in your response. Please also don't include quotation marks in your response."
-        else:
-            user_prompt = "Generate a tweet with a ridiculous socio-political take that would be funny and easy to make fun of. The tweet should contain absurd claims, logical fallacies, or completely misunderstood facts. Make it feel like it could go viral for being both hilarious and slightly rage-inducing to the average Twitter user. Keep it under 280 characters. DO NOT include any hashtags in your response. Please also don't include quotation marks in your response."
-        
-        # Enhanced prompt for more ironic and humorous content
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPTS[personality_type]},
-                {"role": "user", "content": user_prompt}
-            ],
-            max_tokens=100,
-            temperature=0.9  # Slightly higher temperature for more creative outputs
+        get_generation_metrics().record_request(
+            personality, backend.name, n, len(texts), usage["prompt_tokens"], usage["completion_tokens"],
+            latency, estimated=usage.get("estimated", False), ok=ok
         )
-        return response.choices[0].message.content.strip()
+    except Exception as e:
+        print(f"Error recording generation metrics: {e}")
+
+def _generate(messages, n, request_timeout, stream, personality):
+    """
+    Get n completions for the messages: sampled from the completion cache in
+    replay mode (no API call, may return fewer), otherwise from the backend
+    (with its tokens and latency recorded) and stored in the cache when
+    recording
+    """
+    backend = get_backend()
+    system_prompt, user_prompt = messages[0]["content"], messages[1]["content"]
+    if cache_mode == "replay":
+        texts = get_completion_cache().sample(backend.model, system_prompt, user_prompt, TEMPERATURE, n)
+        if len(texts) < n:
+            print(f"Only {len(texts)} of {n} completions available in the cache for this prompt")
+        return texts
+    
+    started = time.monotonic()
+    try:
+        texts, usage = backend.calls.call(backend.complete, messages, n, request_timeout, stream)
+    except CircuitOpenError:
+        raise
+    except Exception:
+        _record_request(backend, personality, messages, n, [], None, time.monotonic() - started, ok=False)
+        raise
+    _record_request(backend, personality, messages, n, texts, usage, time.monotonic() - started)
+    if cache_mode == "record":
+        try:
+            get_completion_cache().add(backend.model, system_prompt, user_prompt, TEMPERATURE, texts)
+        except Exception as e:
+            print(f"Error caching completions: {e}")
+    return texts
+
+def generate_tweets(personality_type="CONSPIRACY_THEORIST", n=1, request_timeout=OPENAI_REQUEST_TIMEOUT,
+                    stream=STREAM_GENERATION):
+    """
+    Generate n tweets with the specified personality type in a single OpenAI
+    request (the prompt is sent once for all n). Returns a list of texts,
+    empty if the request failed. When streaming, tweets that break the hard
+    rules are dropped mid-generation, so fewer than n may come back.
+    """
+    try:
+        return _generate(_personality_messages(personality_type), n, request_timeout, stream, personality_type)
     except Exception as e:
         print(f"Error generating tweet: {e}")
-        return None
+        return []
 
-def generate_trending_tweet():
-    """Generate a tweet that references current trends with ironic humor"""
+def generate_tweet(personality_type="CONSPIRACY_THEORIST", request_timeout=OPENAI_REQUEST_TIMEOUT):
+    """Generate a tweet using OpenAI's API with specified personality type"""
+    tweets = generate_tweets(personality_type, 1, request_timeout)
+    return tweets[0] if tweets else None
+
+def generate_trending_tweets(n=1, request_timeout=OPENAI_REQUEST_TIMEOUT, stream=STREAM_GENERATION):
+    """Generate n trending tweets in a single OpenAI request; returns a list of texts"""
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a master of internet culture and Gen Z humor. You create tweets that perfectly balance irony, humor, and cultural references. Your tweets often go viral because they capture the zeitgeist while maintaining a layer of self-awareness."},
-                {"role": "user", "content": "Generate a tweet with a ridiculous hot take on a current trend, news event, or popular topic. Make it ironic, funny, and slightly provocative. The tweet should feel like it was written by someone who's extremely online and has absurd opinions. Keep it under 280 characters. DO NOT include any hashtags in your response. Please also don't include quotation marks in your response."}
-            ],
-            max_tokens=100,
-            temperature=0.9
-        )
-        return response.choices[0].message.content.strip()
+        return _generate(TRENDING_MESSAGES, n, request_timeout, stream, "TRENDING")
     except Exception as e:
         print(f"Error generating trending tweet: {e}")
-        return None 
\ No newline at end of file
+        return []
+
+def generate_trending_tweet(request_timeout=OPENAI_REQUEST_TIMEOUT):
+    """Generate a tweet that references current trends with ironic humor"""
+    tweets = generate_trending_tweets(1, request_timeout)
+    return tweets[0] if tweets else None
@@ -0,0 +1,119 @@
+import hashlib
+import math
+import threading
+from array import array
+from bisect import bisect_left
+
+# Unsorted inserts are merged into the sorted array once the buffer reaches this size
+MERGE_THRESHOLD = 1024
+# Target false-positive rate of the Bloom filter front
+BLOOM_ERROR_RATE = 0.01
+# Smallest number of entries a Bloom filter is sized for
+BLOOM_MIN_CAPACITY = 1024
+
+def normalize_text(text):
+    """Normalize tweet text so copies that only differ in whitespace share a key"""
+    return " ".join(text.split())
+
+def text_hash(text):
+    """Return a signed 64-bit hash of the normalized text (fits an SQLite INTEGER)"""
+    digest = hashlib.blake2b(normalize_text(text).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+class BloomFilter:
+    """Bit-array Bloom filter over 64-bit hashes (double hashing on the two halves)"""
+
+    def __init__(self, capacity, error_rate=BLOOM_ERROR_RATE):
+        self.capacity = max(capacity, BLOOM_MIN_CAPACITY)
+        self.num_bits = int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, h):
+        h &= 0xFFFFFFFFFFFFFFFF
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, h):
+        for position in self._positions(h):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def might_contain(self, h):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(h))
+
+class TweetHashSet:
+    """
+    Membership set of tweet texts stored as fixed-width 64-bit hashes of the
+    normalized text in a sorted array (binary search), with a small unsorted
+    insert buffer and an optional Bloom filter for a fast negative path.
+    Uses ~8 bytes per entry instead of a full copy of every tweet string.
+    Safe to share between threads: lookups and inserts take a lock, so a
+    lookup never runs while the buffer is being merged into the array.
+    """
+
+    def __init__(self, hashes=(), use_bloom=True):
+        self.use_bloom = use_bloom
+        self.sorted_hashes = array('q', sorted(set(hashes)))
+        self.pending = array('q')
+        self.bloom = None
+        self._lock = threading.Lock()
+        if use_bloom:
+            self._rebuild_bloom()
+
+    def _rebuild_bloom(self):
+        bloom = BloomFilter(2 * len(self))
+        for h in self.sorted_hashes:
+            bloom.add(h)
+        for h in self.pending:
+            bloom.add(h)
+        self.bloom = bloom
+
+    def _merge_pending(self):
+        # Pending hashes are never already in the sorted array (add_hash checks)
+        self.sorted_hashes = array('q', sorted(self.sorted_hashes + self.pending))
+        self.pending = array('q')
+
+    def _contains_hash(self, h):
+        if self.bloom is not None and not self.bloom.might_contain(h):
+            return False
+        i = bisect_left(self.sorted_hashes, h)
+        if i < len(self.sorted_hashes) and self.sorted_hashes[i] == h:
+            return True
+        return h in self.pending
+
+    def contains_hash(self, h):
+        with self._lock:
+            return self._contains_hash(h)
+
+    def add_hash(self, h):
+        """Add a hash; returns False if it was already present"""
+        with self._lock:
+            if self._contains_hash(h):
+                return False
+            self.pending.append(h)
+            if len(self.pending) >= MERGE_THRESHOLD:
+                self._merge_pending()
+            if self.bloom is not None:
+                if len(self) > self.bloom.capacity:
+                    self._rebuild_bloom()
+                else:
+                    self.bloom.add(h)
+            return True
+
+    def update_hashes(self, hashes):
+        for h in hashes:
+            self.add_hash(h)
+
+    def add(self, text):
+        return self.add_hash(text_hash(text))
+
+    def update(self, texts):
+        for text in texts:
+            self.add(text)
+
+    def __contains__(self, text):
+        return self.contains_hash(text_hash(text))
+
+    def __len__(self):
+        return len(self.sorted_hashes) + len(self.pending)
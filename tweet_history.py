@@ -0,0 +1,404 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from config import NEAR_DUPLICATE_THRESHOLD
+from near_duplicates import (
+    minhash_signature,
+    signature_similarity,
+    band_keys,
+    signature_to_bytes,
+    signature_from_bytes
+)
+from tweet_hashset import TweetHashSet, text_hash
+
+# SQLite database holding the indexed posting history
+TWEET_HISTORY_DB = "tweet_history.db"
+# Human-readable record of posted tweets (imported into the database on first run)
+TWEETED_TWEETS_FILE = "Tweeted_tweets.txt"
+# Record format written by save_tweet: "[timestamp] - PERSONALITY", the text, then 50 dashes
+TWEETED_RECORD_PATTERN = re.compile(
+    r'\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\] - (.*?)\n(.*?)\n-{50}', re.DOTALL
+)
+
+# Dash line that closes every record in Tweeted_tweets.txt
+TWEETED_SEPARATOR = b"\n" + b"-" * 50
+# Bytes compared at the start of the file and just before the read offset to
+# detect an in-place rewrite
+HEAD_FINGERPRINT_SIZE = 4096
+TAIL_FINGERPRINT_SIZE = 64
+# Stored in place of a MinHash signature for rows with nothing to sign
+NO_SIGNATURE = b""
+
+_shared_history = None
+_shared_history_lock = threading.Lock()
+
+def parse_tweeted_records(content):
+    """Yield (timestamp, personality, text) for every record in Tweeted_tweets.txt content"""
+    for timestamp, personality, text in TWEETED_RECORD_PATTERN.findall(content):
+        text = text.strip()
+        if text:
+            yield timestamp, personality.strip(), text
+
+class TweetedFileTail:
+    """
+    Incremental reader for Tweeted_tweets.txt. The file only grows by appends,
+    so each read parses just the records added since the last byte offset.
+    It rescans from the start when the file was replaced, shrank, or was
+    edited in place: same size with a new mtime, or changed bytes at the
+    start of the file or just before the offset.
+    """
+
+    def __init__(self, path=TWEETED_TWEETS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.offset = 0
+        self.size = 0
+        self.mtime = 0
+        self.inode = None
+        self.head = b""
+        self.tail = b""
+
+    def state(self):
+        """Return the read position as a JSON-serializable dict (see restore)"""
+        with self._lock:
+            return {"offset": self.offset, "size": self.size, "mtime": self.mtime, "inode": self.inode,
+                    "head": self.head.hex(), "tail": self.tail.hex()}
+
+    def restore(self, state):
+        """Resume from a saved position; it's checked against the file like any other read"""
+        with self._lock:
+            self.offset = state["offset"]
+            self.size = state["size"]
+            self.mtime = state["mtime"]
+            self.inode = state["inode"]
+            self.head = bytes.fromhex(state["head"])
+            self.tail = bytes.fromhex(state["tail"])
+
+    def _is_rewritten(self, f, stat):
+        """Check whether the bytes we already parsed are still the same"""
+        if not self.offset:
+            return False
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            return True
+        # Nothing was appended, yet the file changed: it was edited in place
+        if stat.st_size == self.size and stat.st_mtime_ns != self.mtime:
+            return True
+        f.seek(0)
+        if f.read(len(self.head)) != self.head:
+            return True
+        f.seek(self.offset - len(self.tail))
+        return f.read(len(self.tail)) != self.tail
+
+    def read_new(self):
+        """
+        Return (timestamp, personality, text) for the records appended since
+        the last read, or for every record after a rewrite
+        """
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                self._reset()
+                return []
+
+            # Unchanged since the last read - nothing to parse
+            if (stat.st_ino == self.inode and stat.st_size == self.size
+                    and stat.st_mtime_ns == self.mtime):
+                return []
+
+            records = []
+            with open(self.path, 'rb') as f:
+                if self._is_rewritten(f, stat):
+                    self._reset()
+                f.seek(self.offset)
+                chunk = f.read(stat.st_size - self.offset)
+
+                # Only consume complete records; a half-written one is picked up next time
+                end = chunk.rfind(TWEETED_SEPARATOR)
+                if end != -1:
+                    end += len(TWEETED_SEPARATOR)
+                    records = list(parse_tweeted_records(chunk[:end].decode('utf-8', errors='replace')))
+                    self.offset += end
+                    consumed = chunk[max(0, end - TAIL_FINGERPRINT_SIZE):end]
+                    self.tail = (self.tail + consumed)[-TAIL_FINGERPRINT_SIZE:]
+                    if len(self.head) < HEAD_FINGERPRINT_SIZE:
+                        f.seek(0)
+                        self.head = f.read(min(self.offset, HEAD_FINGERPRINT_SIZE))
+
+            self.size = stat.st_size
+            self.mtime = stat.st_mtime_ns
+            self.inode = stat.st_ino
+            return records
+
+class TweetHistory:
+    """
+    Posting history backed by SQLite with a unique index on the text hash,
+    so "was this posted?" is a single index lookup instead of a file scan.
+    MinHash LSH band keys are stored alongside for near-duplicate lookups.
+    Records appended to Tweeted_tweets.txt by anything else (another bot,
+    a manual edit) are picked up incrementally: only the bytes added since
+    the last sync are parsed, and the read position survives restarts.
+    """
+
+    def __init__(self, db_path=TWEET_HISTORY_DB, tweeted_file=TWEETED_TWEETS_FILE):
+        self.db_path = db_path
+        self.tweeted_file = tweeted_file
+        self._lock = threading.Lock()
+        # Shared in-memory membership set, built on first use and kept in sync
+        self._posted = None
+        self._posted_last_id = 0
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS tweets ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "hash INTEGER NOT NULL, "
+                "text TEXT NOT NULL, "
+                "personality TEXT, "
+                "tweeted_at TEXT)"
+            )
+            self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_tweets_hash ON tweets(hash)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            # Near-duplicate index: one row per (LSH band bucket, tweet)
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(tweets)")]
+            if "minhash" not in columns:
+                self.conn.execute("ALTER TABLE tweets ADD COLUMN minhash BLOB")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS minhash_bands ("
+                "band_key INTEGER NOT NULL, "
+                "tweet_id INTEGER NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_minhash_bands_key ON minhash_bands(band_key)")
+
+        # One-time import of the existing text history
+        if self._get_meta("imported_file") is None:
+            imported = self.import_tweeted_file(tweeted_file)
+            if imported:
+                print(f"Imported {imported} tweets from {tweeted_file} into {db_path}")
+
+        # Pick up records appended to the text file since the last run
+        self._tail = TweetedFileTail(tweeted_file)
+        state = self._get_meta("tweeted_file_tail")
+        if state is not None:
+            try:
+                self._tail.restore(json.loads(state))
+            except (ValueError, KeyError, TypeError):
+                pass  # Unreadable position: rescan the file once
+        self.sync_tweeted_file()
+
+        # Backfill near-duplicate signatures for rows stored before they existed
+        self.index_missing_signatures()
+
+    def _get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def import_tweeted_file(self, path=TWEETED_TWEETS_FILE):
+        """Import records from a Tweeted_tweets.txt-style file, skipping ones already stored"""
+        records = []
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    records = list(parse_tweeted_records(f.read()))
+            except Exception as e:
+                print(f"Error reading {path} for import: {e}")
+                return 0
+
+        with self._lock, self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO tweets (hash, text, personality, tweeted_at) VALUES (?, ?, ?, ?)",
+                [(text_hash(text), text, personality, timestamp) for timestamp, personality, text in records]
+            )
+            imported = self.conn.total_changes - before
+            self._set_meta("imported_file", os.path.abspath(path))
+        if imported:
+            self.index_missing_signatures()
+        return imported
+
+    def _index_signature(self, tweet_id, text):
+        """Store the MinHash signature and LSH band keys for one row"""
+        signature = minhash_signature(text)
+        if signature is None:
+            # Nothing to sign (e.g. only punctuation): mark it done so it isn't retried on every open
+            self.conn.execute("UPDATE tweets SET minhash = ? WHERE id = ?", (NO_SIGNATURE, tweet_id))
+            return
+        self.conn.execute(
+            "UPDATE tweets SET minhash = ? WHERE id = ?", (signature_to_bytes(signature), tweet_id)
+        )
+        self.conn.executemany(
+            "INSERT INTO minhash_bands (band_key, tweet_id) VALUES (?, ?)",
+            [(key, tweet_id) for key in band_keys(signature)]
+        )
+
+    def index_missing_signatures(self):
+        """
+        Compute near-duplicate signatures for any rows that don't have one yet
+        (rows with nothing to sign get NO_SIGNATURE, so each row is only tried once)
+        """
+        with self._lock, self.conn:
+            rows = self.conn.execute("SELECT id, text FROM tweets WHERE minhash IS NULL").fetchall()
+            for tweet_id, text in rows:
+                self._index_signature(tweet_id, text)
+        return len(rows)
+
+    def _insert(self, text, personality, timestamp):
+        """Insert one posted tweet inside an open transaction; returns whether it was new"""
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO tweets (hash, text, personality, tweeted_at) VALUES (?, ?, ?, ?)",
+            (text_hash(text), text.strip(), personality, timestamp)
+        )
+        if cursor.rowcount > 0:
+            self._index_signature(cursor.lastrowid, text)
+            if self._posted is not None:
+                self._posted.add(text)
+        return cursor.rowcount > 0
+
+    def sync_tweeted_file(self):
+        """Record posts appended to the text history file since the last sync; returns how many were new"""
+        try:
+            records = self._tail.read_new()
+        except Exception as e:
+            print(f"Error reading {self.tweeted_file}: {e}")
+            return 0
+        if not records:
+            return 0
+        with self._lock, self.conn:
+            added = sum(1 for timestamp, personality, text in records if self._insert(text, personality, timestamp))
+            self._set_meta("tweeted_file_tail", json.dumps(self._tail.state()))
+        return added
+
+    def record(self, text, personality, timestamp=None):
+        """Record a posted tweet; returns False if it was already in the history"""
+        if timestamp is None:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock, self.conn:
+            return self._insert(text, personality, timestamp)
+
+    def posted_hashset(self):
+        """
+        Return the shared TweetHashSet of posted tweets, pulling in any rows
+        recorded since the last call (including ones written by other processes
+        or appended to the text history file)
+        """
+        self.sync_tweeted_file()
+        with self._lock:
+            if self._posted is None:
+                self._posted = TweetHashSet()
+            rows = self.conn.execute(
+                "SELECT id, hash FROM tweets WHERE id > ? ORDER BY id", (self._posted_last_id,)
+            ).fetchall()
+            for row_id, h in rows:
+                self._posted.add_hash(h)
+                self._posted_last_id = row_id
+            return self._posted
+
+    def was_tweeted(self, text):
+        """Check whether this text (ignoring whitespace differences) was already posted"""
+        if self._posted is not None and text in self._posted:
+            return True
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM tweets WHERE hash = ? LIMIT 1", (text_hash(text),)
+            ).fetchone()
+        return row is not None
+
+    def find_similar(self, text, threshold=None):
+        """
+        Return (previous_text, similarity) for the closest earlier post whose
+        estimated similarity reaches the threshold, or None if there isn't one
+        """
+        if threshold is None:
+            threshold = NEAR_DUPLICATE_THRESHOLD
+        signature = minhash_signature(text)
+        if signature is None:
+            return None
+
+        keys = band_keys(signature)
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT t.text, t.minhash FROM minhash_bands b "
+                "JOIN tweets t ON t.id = b.tweet_id "
+                f"WHERE b.band_key IN ({placeholders})",
+                keys
+            ).fetchall()
+
+        best = None
+        for previous_text, blob in rows:
+            similarity = signature_similarity(signature, signature_from_bytes(blob))
+            if similarity >= threshold and (best is None or similarity > best[1]):
+                best = (previous_text, similarity)
+        return best
+
+    def is_near_duplicate(self, text, threshold=None):
+        """Check whether this text is an exact or near duplicate of an earlier post"""
+        return self.was_tweeted(text) or self.find_similar(text, threshold) is not None
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM tweets").fetchone()[0]
+
+    def __contains__(self, text):
+        return self.was_tweeted(text)
+
+    def close(self):
+        self.conn.close()
+
+def get_tweet_history():
+    """Return the process-wide tweet history store, opening it on first use"""
+    global _shared_history
+    with _shared_history_lock:
+        if _shared_history is None:
+            _shared_history = TweetHistory()
+        return _shared_history
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the indexed tweet history")
+    parser.add_argument('action', choices=['import', 'count', 'check', 'similar'],
+                        help='Action to perform: import a text history file, count stored tweets, '
+                             'check a text, or find the most similar earlier post')
+    parser.add_argument('--file', default=TWEETED_TWEETS_FILE,
+                        help=f'Text history file to import (default: {TWEETED_TWEETS_FILE})')
+    parser.add_argument('--text', help='Tweet text for the "check" and "similar" actions')
+    parser.add_argument('--threshold', type=float, default=NEAR_DUPLICATE_THRESHOLD,
+                        help=f'Similarity threshold for "similar" (default: {NEAR_DUPLICATE_THRESHOLD})')
+
+    args = parser.parse_args()
+    history = get_tweet_history()
+
+    if args.action == 'import':
+        imported = history.import_tweeted_file(args.file)
+        print(f"Imported {imported} new tweets from {args.file}")
+        print(f"History now has {len(history)} tweets.")
+    elif args.action == 'count':
+        print(f"History has {len(history)} tweets.")
+    elif args.action == 'check':
+        if not args.text:
+            print("Please provide the tweet text with --text")
+            return
+        print("Already tweeted." if history.was_tweeted(args.text) else "Not tweeted yet.")
+    elif args.action == 'similar':
+        if not args.text:
+            print("Please provide the tweet text with --text")
+            return
+        match = history.find_similar(args.text, args.threshold)
+        if match:
+            print(f"Similarity {match[1]:.2f} to earlier post:")
+            print(match[0])
+        else:
+            print(f"No earlier post at or above similarity {args.threshold:.2f}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import os
+import threading
+from config import NEAR_DUPLICATE_THRESHOLD
+from queue_store import get_queue_store
+
+# Flush buffered queue removals after this many seconds
+QUEUE_FLUSH_INTERVAL = 30
+# ... or as soon as this many removals are buffered
+QUEUE_FLUSH_EVERY = 20
+
+class TweetQueue:
+    """
+    In-memory handle on the tweet queue for a long-running process.
+
+    The queue size is cached, so the bot's frequent size checks don't touch
+    the database. Removals are buffered and written behind in one
+    transaction, after QUEUE_FLUSH_INTERVAL seconds, after QUEUE_FLUSH_EVERY
+    buffered removals, or on close(). Pushes are deliberately written
+    straight away (a batch of them in one transaction, together with any
+    buffered removals): whether a tweet gets in depends on duplicate checks
+    against every process' queued tweets and on eviction, which only the
+    store can decide, and callers count what was actually queued. They come
+    a batch at a time between posts, so this is one small transaction each.
+    Edits from other processes (e.g. queue_manager.py) are picked up by
+    watching the database files' mtime and then the store's generation
+    counter, so the cache is only reloaded when the queue actually changed; the handle's own writes update the cached
+    state right away, so they never trigger a reload. Claims, renewals, acks
+    and releases go straight to the store (they must check who holds the
+    claim), and anything that reads queued tweets flushes first.
+    """
+
+    def __init__(self, store=None, flush_interval=QUEUE_FLUSH_INTERVAL, flush_every=QUEUE_FLUSH_EVERY):
+        self.store = store if store is not None else get_queue_store()
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self._lock = threading.RLock()
+        self._pending_removals = []
+        self._timer = None
+        self._reload()
+
+    def _db_mtime(self):
+        # In WAL mode commits land in the -wal file, so watch both
+        mtimes = []
+        for path in (self.store.db_path, f"{self.store.db_path}-wal"):
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                pass
+        return max(mtimes, default=None)
+
+    def _reload(self):
+        # Read the mtime first: a write landing after it is caught by the next check
+        self._mtime = self._db_mtime()
+        self._generation = self.store.generation()
+        self._size = self.store.size()
+
+    def _after_own_write(self):
+        """Refresh the cached state after this handle changed the store, so it isn't mistaken for an external edit"""
+        if self.store.generation() != self._generation:
+            self._reload()
+
+    def _check_external(self):
+        """Reload the cached state if another process changed the queue"""
+        mtime = self._db_mtime()
+        if mtime == self._mtime:
+            return
+        if self.store.generation() != self._generation:
+            self._reload()
+        else:
+            self._mtime = mtime
+
+    def _schedule_flush(self):
+        if len(self._pending_removals) >= self.flush_every:
+            self.flush()
+        elif self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self._timed_flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _timed_flush(self):
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Error flushing tweet queue: {e}")
+
+    def flush(self):
+        """Write buffered removals in one transaction"""
+        with self._lock:
+            self._write([])
+
+    def _write(self, pushes):
+        """Apply pushes and any buffered removals in one transaction; returns the store's ids for the pushes"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not pushes and not self._pending_removals:
+            return []
+        added = self.store.apply(pushes, self._pending_removals)
+        self._pending_removals = []
+        self._after_own_write()
+        return added
+
+    def push(self, tweet, near_duplicate_threshold=NEAR_DUPLICATE_THRESHOLD):
+        """
+        Enqueue a tweet. Returns its id, or None if it duplicates (or nearly
+        duplicates) a queued tweet or was evicted.
+        """
+        return self.push_many([tweet], near_duplicate_threshold)[0]
+
+    def push_many(self, tweets, near_duplicate_threshold=NEAR_DUPLICATE_THRESHOLD):
+        """Enqueue tweets in one transaction; returns one id per tweet, None where it was rejected"""
+        with self._lock:
+            added = self._write([(tweet, near_duplicate_threshold) for tweet in tweets])
+            rejected = added.count(None)
+            if rejected:
+                print(f"Queued {len(added) - rejected} of {len(added)} tweets (the rest were duplicates or evicted)")
+            return added
+
+    def remove(self, item_ids):
+        """Buffer the removal of items by id"""
+        with self._lock:
+            self._pending_removals.extend(item_ids)
+            self._schedule_flush()
+
+    def ack(self, item_id, consumer=None):
+        """Remove a claimed item for good; False if this consumer no longer holds the claim"""
+        with self._lock:
+            acked = self.store.ack(item_id, consumer)
+            self._after_own_write()
+            return acked
+
+    def claim(self, consumer=None):
+        with self._lock:
+            # Flush first so tweets buffered for removal can't be claimed
+            self.flush()
+            claimed = self.store.claim(consumer)
+            self._after_own_write()
+            return claimed
+
+    def renew(self, item_id, consumer=None):
+        with self._lock:
+            renewed = self.store.renew(item_id, consumer)
+            self._after_own_write()
+            return renewed
+
+    def release(self, item_id, consumer=None):
+        with self._lock:
+            released = self.store.release(item_id, consumer)
+            self._after_own_write()
+            return released
+
+    def pop(self):
+        with self._lock:
+            self.flush()
+            tweet = self.store.pop()
+            self._after_own_write()
+            return tweet
+
+    def peek(self, k=1):
+        with self._lock:
+            self.flush()
+            return self.store.peek(k)
+
+    def items(self):
+        with self._lock:
+            self.flush()
+            return self.store.items()
+
+    def expire(self):
+        with self._lock:
+            self.flush()
+            expired = self.store.expire()
+            self._after_own_write()
+            return expired
+
+    def size(self):
+        """Committed queue size less buffered removals, reloaded only after external edits"""
+        with self._lock:
+            self._check_external()
+            return max(0, self._size - len(self._pending_removals))
+
+    def __len__(self):
+        return self.size()
+
+    def close(self):
+        """Flush anything still buffered (call on shutdown)"""
+        self.flush()
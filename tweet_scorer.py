@@ -0,0 +1,379 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import namedtuple, OrderedDict
+from config import SCORING_CONFIG_FILE, SCORING_VARIANT, SCORE_CACHE_SIZE, QUALITY_MODEL_FILE
+
+# Emojis, as score_tweet has always counted them: characters above code point 127000
+EMOJI_PATTERN = re.compile("[\U0001F019-\U0010FFFF]")
+
+# What a tweet is scored on; the ellipsis/exclamation/question flags feed the irony score,
+# and quality is the learned model's prediction, computed for a whole batch up front
+TweetFeatures = namedtuple("TweetFeatures", "length hashtags emojis caps_words ellipsis exclamation question quality")
+
+def extract_features(text, quality=0.5):
+    """
+    Extract the scoring features of a text. Each check is a single C-level
+    scan (str.count, substring tests, one precompiled regex), and ASCII-only
+    texts skip the emoji scan altogether, instead of looping over every
+    character in Python. The quality prediction is passed in (see _qualities).
+    """
+    emojis = 0 if text.isascii() else len(EMOJI_PATTERN.findall(text))
+    caps_words = sum(1 for word in [word for word in text.split() if word.isupper()] if len(word) > 1)
+    return TweetFeatures(
+        len(text),
+        text.count("#"),
+        emojis,
+        caps_words,
+        "..." in text or "…" in text,
+        "!" in text,
+        "?" in text,
+        quality
+    )
+
+# Feature name -> expression over TweetFeatures `f`, as used in scoring.json
+FEATURES = {
+    "length": "f.length",
+    "hashtags": "f.hashtags",
+    "emojis": "f.emojis",
+    "caps_words": "f.caps_words",
+    "ellipsis": "f.ellipsis",
+    "exclamation_and_question": "(f.exclamation and f.question)",
+    # Learned probability (0-1) that the tweet is good; 0.5 until quality_model.py has been trained
+    "quality": "f.quality"
+}
+# Features reported together in the score breakdown
+IRONY_FEATURES = ("ellipsis", "exclamation_and_question")
+
+# Rules used when scoring.json is missing or invalid (same as its "baseline")
+BASELINE_RULES = {
+    "length": [
+        {"min": 100, "max": 240, "score": 10},
+        {"max": 99, "divide_by": 10},
+        {"min": 241, "from": 280, "divide_by": -4}
+    ],
+    "hashtags": [{"min": 1, "per": -10}],
+    "emojis": [
+        {"min": 1, "max": 4, "score": 5},
+        {"min": 5, "from": 4, "per": -2}
+    ],
+    "caps_words": [{"min": 1, "max": 3, "score": 5}],
+    "ellipsis": [{"min": 1, "score": 3}],
+    "exclamation_and_question": [{"min": 1, "score": 3}]
+}
+
+_scorers = None
+_scorers_mtime = None
+_scorers_lock = threading.Lock()
+
+def _number(band, key, default=None):
+    value = band.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"'{key}' must be a number in {band}")
+    return value
+
+def _band_code(band):
+    """Return (condition, score expression) source for one band of a feature's rules"""
+    unknown = set(band) - {"min", "max", "score", "per", "divide_by", "from"}
+    if unknown:
+        raise ValueError(f"Unknown keys {sorted(unknown)} in {band}")
+    conditions = []
+    if "min" in band:
+        conditions.append(f"x >= {_number(band, 'min')!r}")
+    if "max" in band:
+        conditions.append(f"x <= {_number(band, 'max')!r}")
+    condition = " and ".join(conditions) or "True"
+
+    kinds = [key for key in ("score", "per", "divide_by") if key in band]
+    if len(kinds) != 1:
+        raise ValueError(f"A band needs exactly one of score, per or divide_by: {band}")
+    if kinds[0] == "score":
+        return condition, repr(_number(band, "score"))
+    origin = _number(band, "from", 0)
+    x = f"(x - {origin!r})" if origin else "x"
+    if kinds[0] == "per":
+        return condition, f"{x} * {_number(band, 'per')!r}"
+    if _number(band, "divide_by") == 0:
+        raise ValueError(f"divide_by can't be 0: {band}")
+    return condition, f"{x} / {_number(band, 'divide_by')!r}"
+
+class Scorer:
+    """
+    One scoring variant: for each feature, bands checked in order, the first
+    band the feature's value falls in giving its score (a constant, or linear
+    in the value via per/divide_by). The rules are compiled once into plain
+    Python functions, so scoring a tweet costs a few comparisons per feature.
+    """
+
+    def __init__(self, name, rules):
+        self.name = name
+        self.rules = rules
+        self.features = list(rules)
+        self.uses_quality = "quality" in rules
+        # A retrained model changes the scores of variants that use it
+        model = quality_model_version() if self.uses_quality else None
+        self.version = hashlib.blake2b(json.dumps([name, rules, model], sort_keys=True).encode("utf-8"),
+                                       digest_size=8).hexdigest()
+        self.score, self.components = self._compile()
+
+    def _compile(self):
+        lines = ["def components(f):"]
+        for i, feature in enumerate(self.features):
+            if feature not in FEATURES:
+                raise ValueError(f"Unknown feature '{feature}', expected one of {', '.join(FEATURES)}")
+            lines.append(f"    x = {FEATURES[feature]}")
+            lines.append(f"    c{i} = 0")
+            for j, band in enumerate(self.rules[feature]):
+                condition, expression = _band_code(band)
+                lines.append(f"    {'if' if j == 0 else 'elif'} {condition}:")
+                lines.append(f"        c{i} = {expression}")
+        terms = [f"c{i}" for i in range(len(self.features))] or ["0"]
+        lines.append(f"    return ({', '.join(terms)},)")
+        # score() is components() summed left to right, in the order the features are listed
+        source = "\n".join(lines)
+        source += "\n\n" + "\n".join(lines[:-1]).replace("def components", "def score")
+        source += f"\n    return {' + '.join(terms)}\n"
+        namespace = {}
+        exec(compile(source, f"<scorer {self.name}>", "exec"), namespace)
+        return namespace["score"], namespace["components"]
+
+    def breakdown(self, features):
+        """Return {feature: score} for a tweet's features"""
+        return dict(zip(self.features, self.components(features)))
+
+class ScoreCache:
+    """
+    Bounded LRU cache of scores keyed by (scorer version, text), so scoring
+    a text again with the same rules is a lookup. A scorer's version changes
+    with its rules, so edited rules never hit stale scores, and clear() drops
+    everything at once when the scoring config is reloaded. Lookups and
+    inserts take a whole batch under one lock; with max_entries 0 the cache
+    is off and costs nothing.
+    """
+
+    def __init__(self, max_entries=SCORE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        """Return the cached score for each key, None where there isn't one"""
+        if self.max_entries <= 0:
+            return [None] * len(keys)
+        entries = self.entries
+        with self._lock:
+            scores = [entries.get(key) for key in keys]
+            for key, score in zip(keys, scores):
+                if score is not None:
+                    entries.move_to_end(key)
+            misses = scores.count(None)
+            self.misses += misses
+            self.hits += len(keys) - misses
+        return scores
+
+    def put_many(self, items):
+        """Cache (key, score) pairs, dropping the least recently used beyond max_entries"""
+        if self.max_entries <= 0:
+            return
+        entries = self.entries
+        with self._lock:
+            entries.update(items)
+            for key, _ in items:
+                entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def stats(self):
+        """Return (entries, hits, misses)"""
+        with self._lock:
+            return len(self.entries), self.hits, self.misses
+
+score_cache = ScoreCache()
+
+def load_scorers(path=SCORING_CONFIG_FILE, variant=SCORING_VARIANT):
+    """
+    Compile every variant in a scoring config. Returns (active scorer,
+    {name: scorer}); falls back to the baseline rules if the file is missing
+    or invalid.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        scorers = {name: Scorer(name, rules) for name, rules in config["variants"].items()}
+        active = variant or config.get("active") or next(iter(scorers))
+        if active not in scorers:
+            raise ValueError(f"No scoring variant named '{active}'")
+        return scorers[active], scorers
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Error loading scoring config {path}, using the baseline: {e}")
+    baseline = Scorer("baseline", BASELINE_RULES)
+    return baseline, {"baseline": baseline}
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+def quality_model_version():
+    """Identifies the trained quality model file (changes when it's retrained), or None without one"""
+    return _mtime(QUALITY_MODEL_FILE)
+
+def get_scorers():
+    """
+    Return (active scorer, all scorers), recompiling when the scoring config
+    file or the quality model changes
+    """
+    global _scorers, _scorers_mtime
+    mtime = (_mtime(SCORING_CONFIG_FILE), quality_model_version())
+    with _scorers_lock:
+        if _scorers is None or mtime != _scorers_mtime:
+            _scorers = load_scorers()
+            _scorers_mtime = mtime
+            score_cache.clear()
+        return _scorers
+
+def get_scorer():
+    """Return the active scorer"""
+    return get_scorers()[0]
+
+def _qualities(texts):
+    """Quality model predictions for a batch of texts, in one vectorized call"""
+    # Imported here: the model (and NumPy) is only needed by variants that use it
+    from quality_model import quality_batch
+    return quality_batch(texts)
+
+def _score_batch(texts, scorers):
+    """
+    Score texts with each scorer, from the cache where possible. Features are
+    extracted at most once per text, and the quality model runs once, over
+    the texts a quality-based scorer still needs. Returns one list of scores
+    (one per scorer) per text.
+    """
+    versions = [scorer.version for scorer in scorers]
+    cached = iter(score_cache.get_many([(version, text) for text in texts for version in versions]))
+    results = [[next(cached) for _ in versions] for _ in texts]
+    missing = [i for i, scores in enumerate(results) if None in scores]
+    needs_quality = [i for i in missing
+                     if any(score is None and scorer.uses_quality for score, scorer in zip(results[i], scorers))]
+    qualities = dict(zip(needs_quality, _qualities([texts[i] for i in needs_quality]))) if needs_quality else {}
+    computed = []
+    for i in missing:
+        features = extract_features(texts[i], qualities.get(i, 0.5))
+        for j, scorer in enumerate(scorers):
+            if results[i][j] is None:
+                results[i][j] = scorer.score(features)
+                computed.append(((versions[j], texts[i]), results[i][j]))
+    score_cache.put_many(computed)
+    return results
+
+def score_text(text, scorer=None):
+    """Return the score of a text (with the active scorer unless one is given)"""
+    return _score_batch([text], [scorer or get_scorer()])[0][0]
+
+def compare_variants(tweets):
+    """
+    Score a batch with every configured variant at once (features are
+    extracted at most once per tweet). Returns {variant name: [scores]}.
+    """
+    scorers = get_scorers()[1]
+    by_tweet = _score_batch([tweet["text"] for tweet in tweets], list(scorers.values()))
+    return {name: [scores[i] for scores in by_tweet] for i, name in enumerate(scorers)}
+
+def score_tweets(tweets, scorer=None):
+    """
+    Score a batch of tweets (with the active scorer unless one is given).
+    Returns copies with "score" set; the detailed breakdown is left out (see
+    score_breakdown), so bulk re-scoring of the queue or the archive only pays
+    for the features and the total, and texts scored before are cache hits.
+    """
+    scores = _score_batch([tweet["text"] for tweet in tweets], [scorer or get_scorer()])
+    scored_tweets = []
+    for tweet, (score,) in zip(tweets, scores):
+        scored_tweet = tweet.copy()
+        scored_tweet["score"] = score
+        scored_tweets.append(scored_tweet)
+    return scored_tweets
+
+def score_breakdown(tweet):
+    """Return the detailed score breakdown of a tweet, computing it if it wasn't stored with the tweet"""
+    if "score_breakdown" in tweet:
+        return tweet["score_breakdown"]
+    scorer = get_scorer()
+    features = extract_features(tweet["text"], _qualities([tweet["text"]])[0] if scorer.uses_quality else 0.5)
+    scores = scorer.breakdown(features)
+    return {
+        "total": scorer.score(features),
+        "length": {
+            "value": features.length,
+            "score": scores.get("length", 0)
+        },
+        "hashtags": {
+            "count": features.hashtags,
+            "score": scores.get("hashtags", 0)
+        },
+        "emojis": {
+            "count": features.emojis,
+            "score": scores.get("emojis", 0)
+        },
+        "caps_words": {
+            "count": features.caps_words,
+            "score": scores.get("caps_words", 0)
+        },
+        "irony_indicators": {
+            "score": sum(scores.get(feature, 0) for feature in IRONY_FEATURES)
+        }
+    }
+
+def score_tweet(tweet):
+    """Score a tweet based on various criteria and return the scored tweet, breakdown included"""
+    tweet_with_score = score_tweets([tweet])[0]
+    tweet_with_score["score_breakdown"] = score_breakdown(tweet_with_score)
+    return tweet_with_score
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare tweet scoring variants from the scoring config")
+    parser.add_argument('action', choices=['variants', 'compare'],
+                        help='Action to perform: list the variants, or score archived tweets with every variant')
+    parser.add_argument('--archive', default='All_generated_tweets.txt',
+                        help='Generated-tweets archive to score (default: All_generated_tweets.txt)')
+    parser.add_argument('--min-score', type=float, default=9.0,
+                        help='Score a tweet needs to be queued (default: 9.0)')
+    args = parser.parse_args()
+
+    active, scorers = get_scorers()
+    if args.action == 'variants':
+        for name, scorer in scorers.items():
+            marker = "*" if scorer is active else " "
+            print(f"{marker} {name} ({scorer.version}): {', '.join(scorer.features)}")
+    elif args.action == 'compare':
+        # Imported here: only the CLI reads the archive
+        from local_backend import load_corpus
+        tweets = [{"text": text} for texts in load_corpus(args.archive).values() for text in texts]
+        if not tweets:
+            print(f"No tweets found in {args.archive}")
+            return
+        scores = compare_variants(tweets)
+        active_passing = {i for i, score in enumerate(scores[active.name]) if score >= args.min_score}
+        print(f"{len(tweets)} archived tweets, passing at {args.min_score}:\n")
+        for name, variant_scores in scores.items():
+            passing = {i for i, score in enumerate(variant_scores) if score >= args.min_score}
+            line = (f"{'*' if name == active.name else ' '} {name:<24} mean {sum(variant_scores) / len(tweets):6.2f}"
+                    f"  passing {len(passing):4}")
+            if name != active.name:
+                line += f"  (+{len(passing - active_passing)} / -{len(active_passing - passing)} vs {active.name})"
+            print(line)
+
+if __name__ == "__main__":
+    main()
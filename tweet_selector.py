@@ -1,83 +1,102 @@
+import heapq
+import math
 import random
-import json
-import os
-import re
 import time
-from tweet_generator import generate_tweet, generate_trending_tweet
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, TimeoutError as FuturesTimeoutError
+from tweet_generator import generate_tweets, generate_trending_tweets
+from tweet_history import get_tweet_history
+from timeline_sync import get_timeline_sync
+from queue_store import get_queue_store
+from personality_allocator import get_personality_allocator
+from generation_metrics import get_generation_metrics
+from tweet_scorer import score_tweets
+from near_duplicates import LSHIndex, minhash_signature, signature_similarity
+from config import (
+    NEAR_DUPLICATE_THRESHOLD,
+    GENERATION_CONCURRENCY,
+    OPENAI_REQUEST_TIMEOUT,
+    GENERATION_HEDGE_REQUESTS,
+    SELECTION_DIVERSITY
+)
 
-# File to store queued tweets
-TWEET_QUEUE_FILE = "tweet_queue.json"
 # File containing previously tweeted tweets
 TWEETED_TWEETS_FILE = "Tweeted_tweets.txt"
-# Cache recent tweets from API to reduce calls
-RECENT_TWEETS_CACHE = set()
 # Last time we checked the Twitter API
 LAST_API_CHECK = 0
 # Minimum time between API checks (in seconds)
 API_CHECK_INTERVAL = 900  # 15 minutes
+# Whether the persisted API timeline has been added to the posted set yet
+TIMELINE_LOADED = False
 
 def load_tweet_queue():
-    """Load the tweet queue from file"""
-    if not os.path.exists(TWEET_QUEUE_FILE):
-        return []
-    
+    """Load the whole tweet queue as a list (compatibility layer over the queue store)"""
     try:
-        with open(TWEET_QUEUE_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return [tweet for _, tweet in get_queue_store().items()]
     except Exception as e:
         print(f"Error loading tweet queue: {e}")
         return []
 
 def save_tweet_queue(queue):
-    """Save the tweet queue to file"""
+    """
+    Replace the whole tweet queue (compatibility layer over the queue store).
+    A separate load + save can lose concurrent changes - use modify_tweet_queue.
+    """
     try:
-        with open(TWEET_QUEUE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(queue, f, ensure_ascii=False, indent=2)
+        get_queue_store().replace_all(queue)
     except Exception as e:
         print(f"Error saving tweet queue: {e}")
 
-def get_previously_tweeted_texts():
-    """Extract all previously tweeted texts from the Tweeted_tweets.txt file"""
-    tweeted_texts = set()
-    
-    if not os.path.exists(TWEETED_TWEETS_FILE):
-        return tweeted_texts
-    
+def modify_tweet_queue(modify_fn):
+    """Atomically load the queue, apply modify_fn(queue) -> new queue, and save it"""
     try:
-        with open(TWEETED_TWEETS_FILE, 'r', encoding='utf-8') as f:
-            content = f.read()
-            
-            # Find tweet content between timestamp lines and separator lines
-            # Pattern: looking for content between a line with timestamp and a line with dashes
-            tweet_pattern = r'\[\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\] - .*?\n(.*?)\n-{50}'
-            tweets = re.findall(tweet_pattern, content, re.DOTALL)
-            
-            for tweet in tweets:
-                # Clean the tweet text (remove extra whitespace)
-                clean_tweet = tweet.strip()
-                if clean_tweet:
-                    tweeted_texts.add(clean_tweet)
-                    
+        return get_queue_store().modify(modify_fn)
     except Exception as e:
-        print(f"Error reading previously tweeted tweets: {e}")
-        
-    return tweeted_texts
+        print(f"Error modifying tweet queue: {e}")
+        return None
+
+def get_posted_hashset():
+    """
+    Return the shared hash set of posted tweets (local history plus tweets
+    seen through the API), seeded once with the persisted API timeline
+    """
+    global TIMELINE_LOADED
+    posted = get_tweet_history().posted_hashset()
+    if not TIMELINE_LOADED:
+        posted.update(get_timeline_sync().texts())
+        TIMELINE_LOADED = True
+    return posted
+
+def refresh_api_cache(api_client):
+    """
+    Pull tweets posted since the last sync from the Twitter API into the
+    shared posted set. Only one API call per refresh (cached user id + since_id).
+    Returns the newly seen texts.
+    """
+    global LAST_API_CHECK
+    
+    posted = get_posted_hashset()
+    new_texts = get_timeline_sync().sync(api_client)
+    posted.update(new_texts)
+    
+    # Update our last check time
+    LAST_API_CHECK = time.time()
+    return new_texts
+
+def is_posted(text):
+    """Check local records only: exact matches in the posted set, then near duplicates"""
+    return text in get_posted_hashset() or get_tweet_history().is_near_duplicate(text)
 
 def is_duplicate_tweet(text, api_client=None):
     """
     Check if a tweet is a duplicate by:
-    1. Checking local records (Tweeted_tweets.txt)
+    1. Checking local records (the indexed tweet history), including near duplicates
     2. Optionally checking Twitter API if client is provided BUT only if enough time has passed
     """
-    global RECENT_TWEETS_CACHE, LAST_API_CHECK
-    
-    # Check local records first
-    previously_tweeted = get_previously_tweeted_texts()
-    if text in previously_tweeted:
-        return True
-    
-    # Check our cached API results
-    if text in RECENT_TWEETS_CACHE:
+    # Check local records first - tweets seen through the API are cached in
+    # the same shared hash set as the local history
+    posted = get_posted_hashset()
+    if is_posted(text):
         return True
     
     # If API client is provided AND enough time has passed since last check, refresh from API
@@ -85,28 +104,10 @@ def is_duplicate_tweet(text, api_client=None):
     if api_client and (current_time - LAST_API_CHECK) > API_CHECK_INTERVAL:
         try:
             print(f"Refreshing Twitter API cache (last check was {(current_time - LAST_API_CHECK) / 60:.1f} minutes ago)")
-            # Get user ID from authenticated user
-            user_data = api_client.get_me()
-            user_id = user_data.data.id
-            
-            # Get recent tweets (up to 50 - reduced from 100 to help with rate limits)
-            recent_tweets = api_client.get_users_tweets(
-                id=user_id, 
-                max_results=50,
-                tweet_fields=['text']
-            )
-            
-            # Update our cache
-            RECENT_TWEETS_CACHE.clear()
-            if recent_tweets.data:
-                for tweet in recent_tweets.data:
-                    RECENT_TWEETS_CACHE.add(tweet.text)
-                    
-            # Update our last check time
-            LAST_API_CHECK = current_time
+            refresh_api_cache(api_client)
             
             # Check if our text is in the refreshed cache
-            if text in RECENT_TWEETS_CACHE:
+            if text in posted:
                 return True
                 
         except Exception as e:
@@ -116,58 +117,71 @@ def is_duplicate_tweet(text, api_client=None):
     
     return False
 
-def clean_queue_of_duplicates(api_client=None):
+def _queue_or_store(queue):
+    """The queue to work on: a caller's TweetQueue handle, or the shared store"""
+    return queue if queue is not None else get_queue_store()
+
+def clean_queue_of_duplicates(api_client=None, queue=None):
     """Remove any duplicate tweets from the queue - using local files only by default"""
-    global LAST_API_CHECK, RECENT_TWEETS_CACHE
-    
-    queue = load_tweet_queue()
-    previously_tweeted = get_previously_tweeted_texts()
-    
-    # Check each tweet in the queue against local records
-    original_length = len(queue)
-    queue = [tweet for tweet in queue if tweet["text"] not in previously_tweeted]
+    store = _queue_or_store(queue)
     
     # Only check against Twitter API if explicitly requested AND we need to refresh
     if api_client and (time.time() - LAST_API_CHECK) > API_CHECK_INTERVAL:
         try:
-            # Get user ID from authenticated user
-            user_data = api_client.get_me()
-            user_id = user_data.data.id
-            
-            # Get recent tweets (up to 50)
-            recent_tweets = api_client.get_users_tweets(
-                id=user_id, 
-                max_results=50,
-                tweet_fields=['text']
-            )
-            
-            # Update our cache
-            RECENT_TWEETS_CACHE.clear()
-            if recent_tweets.data:
-                RECENT_TWEETS_CACHE = {tweet.text for tweet in recent_tweets.data}
-                queue = [tweet for tweet in queue if tweet["text"] not in RECENT_TWEETS_CACHE]
-                
-            # Update our last check time
-            LAST_API_CHECK = time.time()
-                
+            refresh_api_cache(api_client)
         except Exception as e:
             print(f"Error checking Twitter API for duplicates: {e}")
             # If API check fails, we'll rely on local check only
             pass
-    # If we don't need to refresh, just use our cached results
-    elif len(RECENT_TWEETS_CACHE) > 0:
-        queue = [tweet for tweet in queue if tweet["text"] not in RECENT_TWEETS_CACHE]
     
-    # Save the cleaned queue
-    removed_count = original_length - len(queue)
+    # Drop expired tweets first so they aren't checked at all (pushes do this too)
+    expired_count = store.expire()
+    if expired_count > 0:
+        print(f"Removed {expired_count} expired tweets from queue")
+    
+    # Check each tweet in the queue against local records (and cached API results)
+    duplicate_ids = [item_id for item_id, tweet in store.items() if is_posted(tweet["text"])]
+    
+    # Remove just the duplicates - the rest of the queue isn't rewritten
+    removed_count = len(duplicate_ids)
     if removed_count > 0:
-        save_tweet_queue(queue)
+        store.remove(duplicate_ids)
         print(f"Removed {removed_count} duplicate tweets from queue")
     
     return removed_count
 
-def generate_multiple_tweets(count=5, include_trending=True):
-    """Generate multiple tweets with different personality types and return them all"""
+def generate_multiple_tweets(count=5, include_trending=True, concurrency=GENERATION_CONCURRENCY,
+                             request_timeout=OPENAI_REQUEST_TIMEOUT, target=None):
+    """
+    Generate multiple tweets with different personality types and return them all.
+    Candidates sharing a personality come from one request asking for n
+    completions. Up to `concurrency` OpenAI requests run at once, so a batch takes about as
+    long as its slowest request. Each request gives up after request_timeout
+    seconds; tweets from the requests that succeeded are still returned.
+    
+    If target is given, count is ignored and the personality allocator picks
+    how many candidates each personality gets, aiming for `target` tweets
+    that clear the score threshold with as few requests as possible.
+    """
+    jobs = _generation_jobs(count, include_trending, request_timeout, target=target)
+    
+    if concurrency <= 1:
+        results = [generate(*args) for _, generate, args in jobs]
+    else:
+        results = _generate_concurrently(jobs, concurrency, request_timeout)
+    
+    tweets = []
+    for (personality, _, _), texts in zip(jobs, results):
+        tweets.extend(_candidate_tweets(personality, texts))
+    
+    return tweets
+
+def _generation_jobs(count, include_trending, request_timeout, group=True, target=None):
+    """
+    Return the (personality, generate, args) requests for a batch of count
+    tweets: one per personality drawn, or one per tweet if group is False.
+    With a target, the allocator decides the personalities and counts.
+    """
     # All available personality types
     all_personality_types = [
         # Taylor Swift personalities
@@ -196,209 +210,302 @@ def generate_multiple_tweets(count=5, include_trending=True):
     # Or use all personalities
     personality_types = all_personality_types
     
-    tweets = []
-    
-    # Generate tweets with different personalities
-    for _ in range(count):
-        personality = random.choice(personality_types)
-        tweet = generate_tweet(personality)
-        if tweet:
-            tweets.append({
-                "text": tweet,
-                "personality": personality
-            })
-    
-    # Optionally include a trending tweet
+    # Pick a personality per tweet, then make one request per personality for
+    # all of its tweets (plus an optional trending tweet)
+    if target is not None:
+        requests_per_personality = get_personality_allocator().allocate(target, personality_types).items()
+    else:
+        drawn = [random.choice(personality_types) for _ in range(count)]
+        requests_per_personality = Counter(drawn).items() if group else [(personality, 1) for personality in drawn]
+    jobs = [
+        (personality, generate_tweets, (personality, n, request_timeout))
+        for personality, n in requests_per_personality
+    ]
     if include_trending:
-        trending_tweet = generate_trending_tweet()
-        if trending_tweet:
-            tweets.append({
-                "text": trending_tweet,
-                "personality": "TRENDING"
-            })
-    
-    return tweets
+        jobs.append(("TRENDING", generate_trending_tweets, (1, request_timeout)))
+    return jobs
 
-def score_tweet(tweet):
-    """Score a tweet based on various criteria and return the scored tweet"""
-    score = 0
-    text = tweet["text"]
-    
-    # Length score - prefer tweets between 100-240 characters
-    length = len(text)
-    if 100 <= length <= 240:
-        score += 10
-    elif length < 100:
-        score += length / 10  # Shorter tweets get lower scores
-    else:
-        score += (280 - length) / 4  # Approaching the limit lowers score
-    
-    # Length score details
-    length_score = score
-    
-    # Hashtag score - PENALIZE tweets with hashtags
-    hashtag_count = text.count('#')
-    hashtag_score = 0
-    if hashtag_count > 0:
-        hashtag_score = -(hashtag_count * 10)  # Heavily penalize hashtags
-        score += hashtag_score
-    
-    # Emoji score - some emojis are good, too many are bad
-    emoji_count = sum(1 for char in text if ord(char) > 127000)
-    emoji_score = 0
-    if 1 <= emoji_count <= 4:
-        emoji_score = 5
-        score += emoji_score
-    elif emoji_count > 4:
-        emoji_score = -((emoji_count - 4) * 2)
-        score += emoji_score
-    
-    # Capitalization for emphasis
-    caps_words = sum(1 for word in text.split() if word.isupper() and len(word) > 1)
-    caps_score = 0
-    if 1 <= caps_words <= 3:
-        caps_score = 5
-        score += caps_score
-    
-    # Irony/humor indicators
-    irony_score = 0
-    if "..." in text or "…" in text:
-        irony_score += 3  # Ellipsis often indicates irony
-    if "!" in text and "?" in text:
-        irony_score += 3  # Exclamation and question marks together often indicate humor
-    score += irony_score
-    
-    # Add score breakdown to the tweet data
-    tweet_with_score = tweet.copy()
-    tweet_with_score["score"] = score
-    tweet_with_score["score_breakdown"] = {
-        "total": score,
-        "length": {
-            "value": length,
-            "score": length_score
-        },
-        "hashtags": {
-            "count": hashtag_count,
-            "score": hashtag_score
-        },
-        "emojis": {
-            "count": emoji_count,
-            "score": emoji_score
-        },
-        "caps_words": {
-            "count": caps_words,
-            "score": caps_score
-        },
-        "irony_indicators": {
-            "score": irony_score
-        }
-    }
-    
-    return tweet_with_score
+def _candidate_tweets(personality, texts):
+    """Turn the texts one request returned into candidate tweet dicts"""
+    return [{"text": text, "personality": personality} for text in texts or [] if text]
 
-def score_and_queue_tweets(tweets, min_score=9.0):
+def _generate_concurrently(jobs, concurrency, request_timeout):
+    """Run (personality, generate, args) jobs on a bounded thread pool; returns results in order (None if failed)"""
+    if not jobs:
+        return []
+    workers = min(concurrency, len(jobs))
+    # The per-request timeout is enforced by the OpenAI client; this is only a
+    # backstop so a hung connection can't stall the batch
+    deadline = request_timeout * math.ceil(len(jobs) / workers) + 5
+    
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="generate")
+    try:
+        futures = [executor.submit(generate, *args) for _, generate, args in jobs]
+        done, not_done = wait(futures, timeout=deadline)
+        if not_done:
+            print(f"{len(not_done)} tweet generation requests timed out")
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result() if future in done else None)
+            except Exception as e:
+                print(f"Error generating tweet: {e}")
+                results.append(None)
+        return results
+    finally:
+        # Don't wait for timed-out requests to finish
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def score_and_queue_tweets(tweets, min_score=9.0, queue=None):
     """
     Score tweets and add those that meet the threshold to the queue
     Returns all scored tweets and the number of tweets added to queue
     """
-    # Load existing queue
-    queue = load_tweet_queue()
-    
-    # Track existing tweet texts to avoid duplicates
-    existing_texts = {tweet["text"] for tweet in queue}
-    
-    # Also check previously tweeted tweets
-    previously_tweeted = get_previously_tweeted_texts()
-    
-    # And check our cache of recent tweets from the API
-    global RECENT_TWEETS_CACHE
+    store = _queue_or_store(queue)
     
     # Score all tweets
-    scored_tweets = [score_tweet(tweet) for tweet in tweets]
+    scored_tweets = score_tweets(tweets)
     
-    # Add qualified tweets to the queue
-    added_count = 0
+    # Track each personality's pass rate for the allocator
+    allocator = get_personality_allocator()
     for tweet in scored_tweets:
-        # Check if the tweet meets minimum score and isn't a duplicate
-        if (tweet["score"] >= min_score and 
-            tweet["text"] not in existing_texts and
-            tweet["text"] not in previously_tweeted and
-            tweet["text"] not in RECENT_TWEETS_CACHE):
-            queue.append(tweet)
-            existing_texts.add(tweet["text"])
-            added_count += 1
-    
-    # Save updated queue
-    save_tweet_queue(queue)
+        allocator.record(tweet.get("personality"), tweet["score"] >= min_score)
+    if scored_tweets:
+        allocator.save()
+    
+    # Add qualified tweets to the queue: those that meet the minimum score and
+    # haven't been posted (local history and cached API results). The store
+    # itself rejects tweets that duplicate or nearly duplicate something already
+    # queued, so only the tweets it confirms are counted
+    qualified = [tweet for tweet in scored_tweets if tweet["score"] >= min_score and not is_posted(tweet["text"])]
+    added = store.push_many(qualified, NEAR_DUPLICATE_THRESHOLD) if qualified else []
+    queued_by_personality = Counter(
+        tweet.get("personality") for tweet, item_id in zip(qualified, added) if item_id is not None
+    )
+    added_count = sum(queued_by_personality.values())
+    
+    # Attribute queued tweets to personalities, for the cost-per-queued-tweet report
+    try:
+        metrics = get_generation_metrics()
+        for personality, count in queued_by_personality.items():
+            metrics.record_queued(personality, count)
+    except Exception as e:
+        print(f"Error recording generation metrics: {e}")
     
     return scored_tweets, added_count
 
-def get_next_tweet_from_queue(api_client=None):
-    """Get the next tweet from the queue and remove it"""
-    queue = load_tweet_queue()
-    
-    if not queue:
-        return None
-    
-    # Clean queue using only local checks to avoid API rate limits
-    clean_queue_of_duplicates(None)  # Pass None to avoid API check
-    
-    # Reload queue after cleaning
-    queue = load_tweet_queue()
-    if not queue:
-        return None
-    
-    # Get the first tweet - we trust our local checks
-    next_tweet = queue.pop(0)
-    save_tweet_queue(queue)
-    return next_tweet
+def get_next_tweet_from_queue(api_client=None, queue=None):
+    """Get the highest-scoring tweet from the queue and remove it"""
+    store = _queue_or_store(queue)
+    
+    # Pop until we find a tweet that passes our local duplicate checks -
+    # only the popped items are checked, not the whole queue
+    while True:
+        next_tweet = store.pop()
+        if next_tweet is None:
+            return None
+        if not is_posted(next_tweet["text"]):
+            return next_tweet
+        print(f"Dropped duplicate tweet from queue: {next_tweet['text']}")
+
+def claim_next_tweet(consumer=None, queue=None):
+    """
+    Claim the highest-scoring tweet for this consumer without removing it.
+    Several processes (e.g. posting accounts) can claim from one queue without
+    getting the same tweet. Call renew_queued_tweet right before posting,
+    complete_queued_tweet once it's posted, or release_queued_tweet to hand it
+    back if posting fails - all with the same consumer.
+    """
+    store = _queue_or_store(queue)
+    
+    while True:
+        claimed = store.claim(consumer)
+        if claimed is None:
+            return None
+        item_id, next_tweet = claimed
+        if not is_posted(next_tweet["text"]):
+            next_tweet["queue_id"] = item_id
+            return next_tweet
+        store.ack(item_id, consumer)
+        print(f"Dropped duplicate tweet from queue: {next_tweet['text']}")
+
+def renew_queued_tweet(tweet, consumer=None, queue=None):
+    """
+    Extend the lease on a claimed tweet. Returns False if this consumer lost
+    the claim (another consumer may be posting it), True otherwise.
+    """
+    if tweet and "queue_id" in tweet:
+        return _queue_or_store(queue).renew(tweet["queue_id"], consumer)
+    return True
+
+def complete_queued_tweet(tweet, consumer=None, queue=None):
+    """Remove a claimed tweet from the queue for good (it has been posted)"""
+    if tweet and "queue_id" in tweet:
+        if not _queue_or_store(queue).ack(tweet["queue_id"], consumer):
+            print(f"Claim on queued tweet {tweet['queue_id']} had already passed to another consumer")
+
+def release_queued_tweet(tweet, consumer=None, queue=None):
+    """Hand a claimed tweet back to the queue so it can be posted later"""
+    if tweet and "queue_id" in tweet:
+        _queue_or_store(queue).release(tweet["queue_id"], consumer)
 
-def queue_size():
+def queue_size(queue=None):
     """Return the number of tweets in the queue"""
-    queue = load_tweet_queue()
-    return len(queue)
+    return _queue_or_store(queue).size()
 
-def select_best_tweet(tweets):
+def _with_scores(tweets):
+    """Return the tweets in order, scoring (as one batch) any that aren't scored yet"""
+    scored = iter(score_tweets([tweet for tweet in tweets if "score" not in tweet]))
+    return [tweet if "score" in tweet else next(scored) for tweet in tweets]
+
+def _existing_similarity(tweets, signatures, queue=None):
     """
-    Select the best tweet based on scoring criteria
+    Return each tweet's highest similarity to a posted tweet or another queued
+    tweet (the tweet itself may already be queued, which doesn't count)
     """
-    if not tweets:
-        return None
-    
-    # Score all tweets if they aren't already scored
-    scored_tweets = []
-    for tweet in tweets:
-        if "score" not in tweet:
-            scored_tweet = score_tweet(tweet)
-            scored_tweets.append((scored_tweet["score"], scored_tweet))
-        else:
-            scored_tweets.append((tweet["score"], tweet))
-    
-    # Sort by score and return the highest-scoring tweet
-    scored_tweets.sort(reverse=True)
-    return scored_tweets[0][1]
+    queued = LSHIndex()
+    try:
+        for _, tweet in _queue_or_store(queue).items():
+            queued.add(tweet["text"], tweet["text"])
+    except Exception as e:
+        print(f"Error reading the tweet queue: {e}")
+    history = get_tweet_history()
+
+    similarities = []
+    for tweet, signature in zip(tweets, signatures):
+        matches = [similarity for text, similarity in queued.query(signature=signature) if text != tweet["text"]]
+        posted = history.find_similar(tweet["text"], threshold=0.0)
+        if posted is not None:
+            matches.append(posted[1])
+        similarities.append(max(matches, default=0.0))
+    return similarities
+
+def select_top_tweets(tweets, k=1, diversity=0.0, queue=None, min_score=None):
+    """
+    Return up to k tweets, best first, scoring any that aren't scored yet.
+    With min_score, only tweets scoring at least that are picked (if none
+    do, the highest-scoring tweets are returned as before), so diversity can
+    never promote a tweet that wouldn't have passed the quality threshold.
+    
+    With diversity 0 these are simply the k highest-scoring (heap selection;
+    equal scores keep their batch order). With diversity between 0 and 1,
+    tweets are picked one at a time by maximal marginal relevance: each pick
+    maximizes (1 - diversity) * score (as a fraction of the batch's best) minus
+    diversity * its highest similarity to a posted tweet, a queued tweet or
+    an earlier pick. So the picks are good and different from each other and
+    from what's already out there, rather than one winner and its near-clones.
+    """
+    if not tweets or k <= 0:
+        return []
+    tweets = _with_scores(tweets)
+    if min_score is not None:
+        passing = [tweet for tweet in tweets if tweet["score"] >= min_score]
+        if not passing:
+            return heapq.nlargest(k, tweets, key=lambda tweet: tweet["score"])
+        tweets = passing
+    if not diversity:
+        return heapq.nlargest(k, tweets, key=lambda tweet: tweet["score"])
+    
+    scores = [tweet["score"] for tweet in tweets]
+    scale = max(abs(score) for score in scores) or 1
+    relevance = [score / scale for score in scores]
+    signatures = [minhash_signature(tweet["text"]) for tweet in tweets]
+    redundancy = _existing_similarity(tweets, signatures, queue)
+    
+    picked = []
+    remaining = list(range(len(tweets)))
+    while remaining and len(picked) < k:
+        # max() keeps the first of equal values, so ties go to the earlier tweet
+        best = max(remaining, key=lambda i: (1 - diversity) * relevance[i] - diversity * redundancy[i])
+        remaining.remove(best)
+        picked.append(tweets[best])
+        for i in remaining:
+            redundancy[i] = max(redundancy[i], signature_similarity(signatures[i], signatures[best]))
+    return picked
+
+def select_best_tweet(tweets, diversity=0.0, queue=None, min_score=None):
+    """
+    Select the best tweet based on scoring criteria (the first of equal
+    scores). With diversity > 0, tweets similar to posted or queued ones are
+    marked down, among those scoring at least min_score (see select_top_tweets).
+    """
+    top = select_top_tweets(tweets, 1, diversity, queue, min_score)
+    return top[0] if top else None
 
 def get_optimal_tweet():
     """Generate multiple tweets and select the best one"""
     tweets = generate_multiple_tweets(count=5)
-    return select_best_tweet(tweets)
+    return select_best_tweet(tweets, SELECTION_DIVERSITY)
+
+def generate_speculatively(count=5, min_score=9.0, target=1, hedge_requests=GENERATION_HEDGE_REQUESTS,
+                           concurrency=GENERATION_CONCURRENCY, request_timeout=OPENAI_REQUEST_TIMEOUT):
+    """
+    Hedged generation for when a tweet is needed right now: send the usual
+    batch plus up to hedge_requests extra single-tweet requests (never more
+    than count), score candidates as they arrive, and return as soon as
+    `target` of them clear min_score and haven't been posted. Requests still
+    running then are ignored (queued ones are cancelled), so one slow
+    response can't hold up the fill. Returns the scored tweets received.
+    """
+    jobs = _generation_jobs(count, True, request_timeout)
+    jobs += _generation_jobs(min(hedge_requests, count), False, request_timeout, group=False)
+    
+    workers = max(1, min(concurrency, len(jobs)))
+    deadline = request_timeout * math.ceil(len(jobs) / workers) + 5
+    scored_tweets = []
+    passing = 0
+    
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hedge")
+    futures = {executor.submit(generate, *args): personality for personality, generate, args in jobs}
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            try:
+                texts = future.result()
+            except Exception as e:
+                print(f"Error generating tweet: {e}")
+                continue
+            for scored_tweet in score_tweets(_candidate_tweets(futures[future], texts)):
+                scored_tweets.append(scored_tweet)
+                if scored_tweet["score"] >= min_score and not is_posted(scored_tweet["text"]):
+                    passing += 1
+            if passing >= target:
+                break
+    except FuturesTimeoutError:
+        print("Speculative generation timed out waiting for tweets")
+    finally:
+        # Stop waiting for stragglers
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    ignored = sum(1 for future in futures if not future.done())
+    if ignored:
+        print(f"Got {passing} good tweets; ignoring {ignored} slower generation requests")
+    return scored_tweets
 
-def generate_and_queue_tweets(count=5, min_score=9.0):
+def generate_and_queue_tweets(count=5, min_score=9.0, queue=None, speculative=None):
     """
     Generate multiple tweets, score them, add qualifying ones to the queue,
-    and return the best one for immediate posting
+    and return the best one for immediate posting. With speculative
+    generation (on when GENERATION_HEDGE_REQUESTS > 0) extra requests are
+    sent and it returns as soon as a good enough tweet arrives.
     """
+    if speculative is None:
+        speculative = GENERATION_HEDGE_REQUESTS > 0
+    
     # Generate tweets
-    tweets = generate_multiple_tweets(count=count)
+    if speculative:
+        tweets = generate_speculatively(count=count, min_score=min_score)
+    else:
+        tweets = generate_multiple_tweets(count=count)
     
     if not tweets:
         return None, 0
     
     # Score and queue tweets - no API check here, just local
-    scored_tweets, added_count = score_and_queue_tweets(tweets, min_score)
+    scored_tweets, added_count = score_and_queue_tweets(tweets, min_score, queue)
     
-    # Select the best tweet for immediate posting
-    best_tweet = select_best_tweet(scored_tweets)
+    # Select the best tweet for immediate posting, preferring one unlike what's posted or
+    # queued among those that clear min_score
+    best_tweet = select_best_tweet(scored_tweets, SELECTION_DIVERSITY, queue, min_score)
     
     return best_tweet, added_count
 